@@ -1,8 +1,9 @@
 from rest_framework import serializers
 from .models import DocumentApproval, LessonMaterial, ExamAnswer, AttendanceCorrection
 from core.models import Student, Group, Lesson
+from core.serializers import SparseFieldsMixin
 
-class StudentDetailSerializer(serializers.ModelSerializer):
+class StudentDetailSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for Student details with relationships"""
     user_details = serializers.SerializerMethodField(help_text="User information including name, email, phone")
     groups = serializers.SerializerMethodField(help_text="List of groups student is enrolled in")
@@ -33,9 +34,9 @@ class StudentDetailSerializer(serializers.ModelSerializer):
         }
     
     def get_groups(self, obj):
-        return [{'id': g.id, 'name': g.name, 'subject': g.subject} for g in obj.groups.all()]
+        return [{'id': g.id, 'name': g.name, 'subject': g.subject.name if g.subject else None} for g in obj.groups.all()]
 
-class DocumentApprovalSerializer(serializers.ModelSerializer):
+class DocumentApprovalSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for document approval workflow"""
     student_name = serializers.CharField(source='student.user.get_full_name', read_only=True, help_text="Full name of student")
     approved_by_name = serializers.CharField(source='approved_by.get_full_name', read_only=True, help_text="Name of admin who approved")
@@ -46,7 +47,7 @@ class DocumentApprovalSerializer(serializers.ModelSerializer):
                   'approved_by', 'approved_by_name', 'rejection_reason', 'uploaded_at', 'approved_at']
         read_only_fields = ['uploaded_at', 'approved_at']
 
-class LessonMaterialSerializer(serializers.ModelSerializer):
+class LessonMaterialSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for lesson materials (PDFs, notes, resources)"""
     lesson_info = serializers.SerializerMethodField(help_text="Related lesson information")
     uploaded_by_name = serializers.CharField(source='uploaded_by.get_full_name', read_only=True, help_text="Teacher who uploaded")
@@ -64,7 +65,7 @@ class LessonMaterialSerializer(serializers.ModelSerializer):
             'start_time': obj.lesson.start_time,
         }
 
-class ExamAnswerSerializer(serializers.ModelSerializer):
+class ExamAnswerSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for exam answers submitted by students"""
     exam_title = serializers.CharField(source='exam.title', read_only=True, help_text="Title of exam")
     uploaded_by_name = serializers.CharField(source='uploaded_by.get_full_name', read_only=True, help_text="Student who uploaded")
@@ -74,7 +75,7 @@ class ExamAnswerSerializer(serializers.ModelSerializer):
         fields = ['id', 'exam', 'exam_title', 'file', 'uploaded_by', 'uploaded_by_name', 'uploaded_at']
         read_only_fields = ['uploaded_at']
 
-class AttendanceCorrectionSerializer(serializers.ModelSerializer):
+class AttendanceCorrectionSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for attendance corrections by admins"""
     student_name = serializers.CharField(source='original_attendance.student.user.get_full_name', read_only=True, help_text="Student name")
     corrected_by_name = serializers.CharField(source='corrected_by.get_full_name', read_only=True, help_text="Admin who corrected")
@@ -2,6 +2,7 @@ from rest_framework import viewsets, status, filters, serializers
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated,AllowAny
+from django.db import transaction
 from django.db.models import Q, Count
 from datetime import datetime, timedelta
 from .models import DocumentApproval, LessonMaterial, ExamAnswer, AttendanceCorrection
@@ -11,6 +12,9 @@ from .serializers import (
 )
 from core.models import Student, Attendance, Group, Lesson
 from auth_system.permissions import IsAdmin
+from attendance import rollup
+from core.aggregates import count_by
+from core.fetch import FetchPlan, FetchPlanMixin
 
 # Attendance uchun serializer
 class AttendanceSerializer(serializers.ModelSerializer):
@@ -19,8 +23,13 @@ class AttendanceSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class StudentManagementViewSet(viewsets.ModelViewSet):
+class StudentManagementViewSet(FetchPlanMixin, viewsets.ModelViewSet):
     serializer_class = StudentDetailSerializer
+    field_plans = {
+        'user_details': FetchPlan(select_related=['user']),
+        'groups': FetchPlan(prefetch_related=['groups__subject']),
+    }
+    fetch_plan = FetchPlan.combine(field_plans.values())
     # permission_classes = [IsAdmin]
     permission_classes = [AllowAny]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
@@ -32,16 +41,19 @@ class StudentManagementViewSet(viewsets.ModelViewSet):
         if not user.is_authenticated:
             return Student.objects.none()
         if getattr(user, 'role', None) == 'superadmin':
-            return Student.objects.all()
+            return self.fetch(Student.objects.all())
         if getattr(user, 'branch', None):
-            return Student.objects.filter(branch=user.branch)
+            return self.fetch(Student.objects.filter(branch=user.branch))
         return Student.objects.none()
 
     @action(detail=False, methods=['get'])
     def debtors(self, request):
-        students = self.get_queryset().filter(total_debt__gt=0).order_by('-total_debt')
-        serializer = self.get_serializer(students, many=True)
-        return Response(serializer.data)
+        # Served by the (branch, total_debt) index, one page at a time
+        students = self.get_queryset().filter(total_debt__gt=0).order_by('-total_debt', 'id')
+        page = self.paginate_queryset(students)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer(students, many=True).data)
 
     @action(detail=True, methods=['post'])
     def block_student(self, request, pk=None):
@@ -58,8 +70,9 @@ class StudentManagementViewSet(viewsets.ModelViewSet):
         return Response({'status': 'Student unblocked'})
 
 
-class DocumentApprovalViewSet(viewsets.ModelViewSet):
+class DocumentApprovalViewSet(FetchPlanMixin, viewsets.ModelViewSet):
     serializer_class = DocumentApprovalSerializer
+    fetch_plan = FetchPlan(select_related=['student__user', 'approved_by'])
     # permission_classes = [IsAdmin]
     permission_classes = [AllowAny]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
@@ -71,9 +84,9 @@ class DocumentApprovalViewSet(viewsets.ModelViewSet):
         if not user.is_authenticated:
             return DocumentApproval.objects.none()
         if getattr(user, 'role', None) == 'superadmin':
-            return DocumentApproval.objects.all()
+            return self.fetch(DocumentApproval.objects.all())
         if getattr(user, 'branch', None):
-            return DocumentApproval.objects.filter(student__branch=user.branch)
+            return self.fetch(DocumentApproval.objects.filter(student__branch=user.branch))
         return DocumentApproval.objects.none()
 
     @action(detail=False, methods=['get'])
@@ -127,12 +140,7 @@ class AttendanceManagementViewSet(viewsets.ReadOnlyModelViewSet):
         if group:
             query = query.filter(lesson__group__id=group)
 
-        stats = {
-            'total': query.count(),
-            'present': query.filter(status='present').count(),
-            'absent': query.filter(status='absent').count(),
-            'late': query.filter(status='late').count(),
-        }
+        stats = count_by(query, 'status', ['present', 'absent', 'late'])
         return Response(stats)
 
     @action(detail=False, methods=['get'])
@@ -169,8 +177,10 @@ class AttendanceManagementViewSet(viewsets.ReadOnlyModelViewSet):
         return Response(late_teachers)
 
 
-class LessonMaterialViewSet(viewsets.ModelViewSet):
+class LessonMaterialViewSet(FetchPlanMixin, viewsets.ModelViewSet):
     serializer_class = LessonMaterialSerializer
+    fetch_plan = FetchPlan(select_related=['lesson__group', 'uploaded_by'])
+    field_plans = {'lesson_info': FetchPlan(select_related=['lesson__group'])}
     # permission_classes = [IsAdmin]
     permission_classes = [AllowAny]
 
@@ -183,17 +193,18 @@ class LessonMaterialViewSet(viewsets.ModelViewSet):
         if not user.is_authenticated:
             return LessonMaterial.objects.none()
         if getattr(user, 'role', None) == 'superadmin':
-            return LessonMaterial.objects.all()
+            return self.fetch(LessonMaterial.objects.all())
         if getattr(user, 'branch', None):
-            return LessonMaterial.objects.filter(lesson__branch=user.branch)
+            return self.fetch(LessonMaterial.objects.filter(lesson__branch=user.branch))
         return LessonMaterial.objects.none()
 
     def perform_create(self, serializer):
         serializer.save(uploaded_by=self.request.user)
 
 
-class ExamAnswerViewSet(viewsets.ModelViewSet):
+class ExamAnswerViewSet(FetchPlanMixin, viewsets.ModelViewSet):
     serializer_class = ExamAnswerSerializer
+    fetch_plan = FetchPlan(select_related=['exam', 'uploaded_by'])
     # permission_classes = [IsAdmin]
     permission_classes = [AllowAny]
 
@@ -206,17 +217,18 @@ class ExamAnswerViewSet(viewsets.ModelViewSet):
         if not user.is_authenticated:
             return ExamAnswer.objects.none()
         if getattr(user, 'role', None) == 'superadmin':
-            return ExamAnswer.objects.all()
+            return self.fetch(ExamAnswer.objects.all())
         if getattr(user, 'branch', None):
-            return ExamAnswer.objects.filter(exam__group__branch=user.branch)
+            return self.fetch(ExamAnswer.objects.filter(exam__group__branch=user.branch))
         return ExamAnswer.objects.none()
 
     def perform_create(self, serializer):
         serializer.save(uploaded_by=self.request.user)
 
 
-class AttendanceCorrectionViewSet(viewsets.ModelViewSet):
+class AttendanceCorrectionViewSet(FetchPlanMixin, viewsets.ModelViewSet):
     serializer_class = AttendanceCorrectionSerializer
+    fetch_plan = FetchPlan(select_related=['original_attendance__student__user', 'corrected_by'])
     # permission_classes = [IsAdmin]
     permission_classes = [AllowAny]
 
@@ -228,13 +240,16 @@ class AttendanceCorrectionViewSet(viewsets.ModelViewSet):
         if not user.is_authenticated:
             return AttendanceCorrection.objects.none()
         if getattr(user, 'role', None) == 'superadmin':
-            return AttendanceCorrection.objects.all()
+            return self.fetch(AttendanceCorrection.objects.all())
         if getattr(user, 'branch', None):
-            return AttendanceCorrection.objects.filter(original_attendance__lesson__branch=user.branch)
+            return self.fetch(AttendanceCorrection.objects.filter(original_attendance__lesson__branch=user.branch))
         return AttendanceCorrection.objects.none()
 
     def perform_create(self, serializer):
-        obj = serializer.save(corrected_by=self.request.user)
-        attendance = obj.original_attendance
-        attendance.status = obj.new_status
-        attendance.save()
+        # The correction, the attendance row and its rollup commit together or not at all
+        with transaction.atomic():
+            obj = serializer.save(corrected_by=self.request.user)
+            attendance = Attendance.objects.select_for_update().get(pk=obj.original_attendance_id)
+            attendance.status = obj.new_status
+            attendance.save()
+            rollup.refresh_lessons([attendance.lesson])
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from attendance.rollup import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-group attendance rollup table from raw attendance records'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows inserted per statement')
+
+    def handle(self, *args, **options):
+        created = rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt attendance rollup: {created} rows'))
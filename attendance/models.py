@@ -0,0 +1,27 @@
+from django.db import models
+from core.models import Branch, Group, Student
+import uuid
+
+class AttendanceRollup(models.Model):
+    """Attendance counts per (group, student, day), kept current by attendance writes"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    branch = models.ForeignKey(Branch, on_delete=models.CASCADE, related_name='attendance_rollups')
+    group = models.ForeignKey(Group, on_delete=models.CASCADE, related_name='attendance_rollups')
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='attendance_rollups')
+    day = models.DateField()
+    present = models.PositiveIntegerField(default=0)
+    absent = models.PositiveIntegerField(default=0)
+    late = models.PositiveIntegerField(default=0)
+    excused = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ('group', 'student', 'day')
+        indexes = [
+            models.Index(fields=['branch', 'day']),
+            models.Index(fields=['student', 'day']),
+        ]
+    
+    def __str__(self):
+        return f"{self.group.name} - {self.student} - {self.day}"
@@ -0,0 +1,69 @@
+# attendance/rollup.py
+from functools import reduce
+from operator import or_
+from django.db import transaction
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from core.models import Attendance
+from .models import AttendanceRollup
+
+STATUSES = [value for value, _ in Attendance.STATUS_CHOICES]
+
+
+def _rollup_rows(attendance):
+    """Group raw attendance into one row per (group, student, day)"""
+    return attendance.annotate(day=TruncDate('lesson__start_time')).values(
+        'lesson__branch', 'lesson__group', 'student', 'day'
+    ).annotate(
+        total=Count('id'),
+        **{status: Count('id', filter=Q(status=status)) for status in STATUSES}
+    ).order_by()
+
+
+def _to_rollup(row):
+    return AttendanceRollup(
+        branch_id=row['lesson__branch'],
+        group_id=row['lesson__group'],
+        student_id=row['student'],
+        day=row['day'],
+        total=row['total'],
+        **{status: row[status] for status in STATUSES}
+    )
+
+
+def refresh_lessons(lessons):
+    """
+    Recompute the rollup rows touched by attendance written for ``lessons``.
+    Only the (group, day) slices of those lessons are rebuilt.
+    """
+    slices = {(lesson.group_id, timezone.localdate(lesson.start_time)) for lesson in lessons}
+    if not slices:
+        return 0
+    
+    raw_filter = reduce(or_, [Q(lesson__group_id=group_id, lesson__start_time__date=day) for group_id, day in slices])
+    rollup_filter = reduce(or_, [Q(group_id=group_id, day=day) for group_id, day in slices])
+    
+    with transaction.atomic():
+        rows = [_to_rollup(row) for row in _rollup_rows(Attendance.objects.filter(raw_filter))]
+        AttendanceRollup.objects.filter(rollup_filter).delete()
+        AttendanceRollup.objects.bulk_create(rows)
+    return len(rows)
+
+
+def rebuild(batch_size=1000):
+    """Rebuild the whole rollup table from raw attendance"""
+    created = 0
+    with transaction.atomic():
+        AttendanceRollup.objects.all().delete()
+        batch = []
+        for row in _rollup_rows(Attendance.objects.all()).iterator(chunk_size=batch_size):
+            batch.append(_to_rollup(row))
+            if len(batch) >= batch_size:
+                AttendanceRollup.objects.bulk_create(batch)
+                created += len(batch)
+                batch = []
+        if batch:
+            AttendanceRollup.objects.bulk_create(batch)
+            created += len(batch)
+    return created
@@ -1,23 +1,31 @@
 from rest_framework import serializers
 from core.models import Attendance, Lesson, Student, Group
 from datetime import datetime
+from core.serializers import SparseFieldsMixin
+
+class AttendanceRecordSerializer(serializers.Serializer):
+    student_id = serializers.UUIDField()
+    status = serializers.ChoiceField(choices=Attendance.STATUS_CHOICES)
+    homework_status = serializers.ChoiceField(choices=Attendance.HOMEWORK_CHOICES, default='missing')
+    homework_grade = serializers.IntegerField(min_value=0, max_value=10, required=False, allow_null=True)
+    comments = serializers.CharField(required=False, allow_blank=True, default='')
 
 class AttendanceSheetSerializer(serializers.Serializer):
     lesson_id = serializers.UUIDField()
-    students_attendance = serializers.ListField(
-        child=serializers.DictField(
-            child=serializers.CharField()
-        )
-    )
+    students_attendance = AttendanceRecordSerializer(many=True)
     teacher_status = serializers.ChoiceField(choices=['present', 'absent', 'late'])
 
+class AttendanceBatchSerializer(serializers.Serializer):
+    """Several lesson sheets uploaded at once (e.g. an offline teacher syncing a whole day)"""
+    sheets = AttendanceSheetSerializer(many=True, allow_empty=False)
+
 class BulkAttendanceSerializer(serializers.Serializer):
     lesson_id = serializers.UUIDField()
     attendance_records = serializers.ListField(
         child=serializers.DictField()
     )
 
-class AttendanceDetailSerializer(serializers.ModelSerializer):
+class AttendanceDetailSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     student_name = serializers.CharField(source='student.user.get_full_name', read_only=True)
     lesson_info = serializers.SerializerMethodField()
     
@@ -30,7 +38,7 @@ class AttendanceDetailSerializer(serializers.ModelSerializer):
     def get_lesson_info(self, obj):
         return {
             'group': obj.lesson.group.name,
-            'subject': obj.lesson.group.subject,
+            'subject': obj.lesson.group.subject.name if obj.lesson.group.subject else None,
             'start_time': obj.lesson.start_time,
             'teacher': obj.lesson.teacher.user.get_full_name(),
         }
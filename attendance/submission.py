@@ -0,0 +1,111 @@
+# attendance/submission.py
+from django.db import transaction
+from django.utils import timezone
+from core.cache import bump_branch, bump_branches
+from core.models import Attendance, Group, Lesson, Student
+from core.performance import record_late_teachers
+from . import rollup
+
+UPDATE_FIELDS = ['status', 'homework_status', 'homework_grade', 'comments', 'updated_at']
+
+
+class AttendanceSubmissionError(Exception):
+    def __init__(self, message, details=None):
+        super().__init__(message)
+        self.details = details or {}
+
+
+def submit_sheets(sheets):
+    """
+    Write attendance for one or more lessons with a fixed number of queries.
+    ``sheets`` are validated AttendanceSheetSerializer payloads. Every student
+    must belong to the lesson's group; otherwise nothing is written.
+    Returns ``(created, total)``.
+    """
+    records = {}
+    for sheet in sheets:
+        for record in sheet['students_attendance']:
+            # Later entries for the same lesson/student win, like repeated update_or_create calls did
+            records[(sheet['lesson_id'], record['student_id'])] = record
+    
+    lesson_ids = {sheet['lesson_id'] for sheet in sheets}
+    lessons = Lesson.objects.in_bulk(lesson_ids)
+    missing_lessons = lesson_ids - lessons.keys()
+    if missing_lessons:
+        raise AttendanceSubmissionError('Lesson not found', {'lessons': sorted(str(i) for i in missing_lessons)})
+    
+    student_ids = {student_id for _, student_id in records}
+    memberships = set(Group.students.through.objects.filter(
+        group_id__in={lesson.group_id for lesson in lessons.values()},
+        student_id__in=student_ids,
+    ).values_list('group_id', 'student_id'))
+    invalid = [
+        {'lesson_id': str(lesson_id), 'student_id': str(student_id)}
+        for lesson_id, student_id in records
+        if (lessons[lesson_id].group_id, student_id) not in memberships
+    ]
+    if invalid:
+        raise AttendanceSubmissionError('Students do not belong to the lesson group', {'students': invalid})
+    
+    now = timezone.now()
+    rows = [
+        Attendance(
+            lesson_id=lesson_id,
+            student_id=student_id,
+            status=record['status'],
+            homework_status=record.get('homework_status', 'missing'),
+            homework_grade=record.get('homework_grade'),
+            comments=record.get('comments', ''),
+            updated_at=now,
+        )
+        for (lesson_id, student_id), record in records.items()
+    ]
+    
+    with transaction.atomic():
+        _lock_lessons(lesson_ids)
+        existing = set(Attendance.objects.filter(
+            lesson_id__in=lesson_ids, student_id__in=student_ids
+        ).values_list('lesson_id', 'student_id'))
+        Attendance.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['lesson', 'student'],
+            update_fields=UPDATE_FIELDS,
+        )
+        record_late_teachers(sheets, lessons)
+        rollup.refresh_lessons(lessons.values())
+        bump_branches(lesson.branch_id for lesson in lessons.values())
+    
+    created = sum(1 for key in records if key not in existing)
+    return created, len(records)
+
+
+def _lock_lessons(lesson_ids):
+    """
+    Lock the lessons' rows until the transaction ends, so writers of the same lessons' attendance
+    run one after the other; rows are locked in id order to avoid deadlocks
+    """
+    list(Lesson.objects.select_for_update().filter(id__in=lesson_ids).order_by('id').values_list('id', flat=True))
+
+
+def mark_all_present(lesson):
+    """
+    Mark every member of the lesson's group present with a constant number of queries.
+    Existing rows are switched to 'present'; members without a row get one.
+    Returns ``(inserted, updated)``.
+    """
+    with transaction.atomic():
+        # Under the lock no other submission can add rows, so every missing student is inserted
+        _lock_lessons([lesson.id])
+        updated = Attendance.objects.filter(
+            lesson=lesson, student__groups=lesson.group_id
+        ).exclude(status='present').update(status='present', updated_at=timezone.now())
+        missing = list(Student.objects.filter(groups=lesson.group_id).exclude(
+            attendances__lesson=lesson
+        ).values_list('id', flat=True))
+        Attendance.objects.bulk_create(
+            [Attendance(lesson=lesson, student_id=student_id, status='present') for student_id in missing],
+        )
+        rollup.refresh_lessons([lesson])
+        bump_branch(lesson.branch_id)
+    return len(missing), updated
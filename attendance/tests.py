@@ -0,0 +1,187 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core.models import Organization, Branch, CustomUser, Teacher, Student, Group, Lesson, Attendance
+from admin_dashboard.models import AttendanceCorrection
+from .models import AttendanceRollup
+
+
+class AttendanceTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.organization = Organization.objects.create(name='Org', address='-', phone='1', email='org@example.com')
+        cls.branch = Branch.objects.create(organization=cls.organization, name='Main', address='-', phone='1')
+        cls.admin = CustomUser.objects.create_user(
+            username='admin', password='x', role='admin', organization=cls.organization, branch=cls.branch,
+        )
+        teacher_user = CustomUser.objects.create_user(username='teacher', password='x', role='teacher')
+        cls.teacher = Teacher.objects.create(user=teacher_user, branch=cls.branch, hourly_rate=10, group_rate=100)
+        cls.group = Group.objects.create(branch=cls.branch, name='A1', teacher=cls.teacher)
+        cls.students = [
+            Student.objects.create(
+                user=CustomUser.objects.create(username=f'student{i}', role='student'),
+                branch=cls.branch,
+            )
+            for i in range(3)
+        ]
+        cls.group.students.set(cls.students)
+        cls.lesson = Lesson.objects.create(
+            group=cls.group, teacher=cls.teacher, branch=cls.branch,
+            start_time=timezone.now() - timedelta(hours=2),
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def submit(self, statuses):
+        return self.client.post('/api/attendance/submit/submit_attendance/', {
+            'lesson_id': str(self.lesson.id),
+            'teacher_status': 'present',
+            'students_attendance': [
+                {'student_id': str(student.id), 'status': status}
+                for student, status in zip(self.students, statuses)
+            ],
+        }, format='json')
+
+
+class AttendanceRollupTestCase(AttendanceTestCase):
+    """Attendance writes keep the per-day rollup in sync"""
+
+    def rollup_counts(self):
+        return {
+            row.student_id: (row.present, row.absent, row.late, row.total)
+            for row in AttendanceRollup.objects.filter(group=self.group)
+        }
+
+    def test_submission_updates_rollup(self):
+        self.assertEqual(self.submit(['present', 'absent', 'late']).status_code, 200)
+        self.assertEqual(self.rollup_counts(), {
+            self.students[0].id: (1, 0, 0, 1),
+            self.students[1].id: (0, 1, 0, 1),
+            self.students[2].id: (0, 0, 1, 1),
+        })
+
+        self.submit(['present', 'present', 'present'])
+        self.assertEqual(set(self.rollup_counts().values()), {(1, 0, 0, 1)})
+
+    def correct(self, attendance, new_status):
+        return self.client.post('/api/admin/corrections/', {
+            'original_attendance': str(attendance.id), 'old_status': attendance.status,
+            'new_status': new_status, 'reason': '-',
+        }, format='json')
+
+    def test_corrections_update_the_rollup_in_one_transaction(self):
+        self.submit(['present', 'absent', 'late'])
+        attendance = Attendance.objects.get(student=self.students[1])
+        self.assertEqual(self.correct(attendance, 'present').status_code, 201)
+        self.assertEqual(self.rollup_counts()[self.students[1].id], (1, 0, 0, 1))
+
+        with mock.patch('attendance.rollup.refresh_lessons', side_effect=RuntimeError('rollup failed')):
+            with self.assertRaises(RuntimeError):
+                self.correct(Attendance.objects.get(pk=attendance.pk), 'late')
+        self.assertEqual(Attendance.objects.get(pk=attendance.pk).status, 'present')
+        self.assertEqual(AttendanceCorrection.objects.count(), 1)
+        self.assertEqual(self.rollup_counts()[self.students[1].id], (1, 0, 0, 1))
+
+    def test_rebuild_matches_incremental_rollup(self):
+        self.submit(['present', 'absent', 'late'])
+        incremental = self.rollup_counts()
+        AttendanceRollup.objects.all().delete()
+
+        call_command('rebuild_attendance_rollup', stdout=StringIO())
+
+        self.assertEqual(self.rollup_counts(), incremental)
+        self.assertEqual(AttendanceRollup.objects.get(student=self.students[0]).day, timezone.localdate(self.lesson.start_time))
+
+
+class BulkAttendanceSubmissionTestCase(AttendanceTestCase):
+    """submit_attendance writes whole sheets with a fixed number of queries"""
+
+    def create_lesson(self, student_count):
+        group = Group.objects.create(branch=self.branch, name=f'G{student_count}', teacher=self.teacher)
+        students = [
+            Student.objects.create(
+                user=CustomUser.objects.create(username=f'g{student_count}-{i}', role='student'),
+                branch=self.branch,
+            )
+            for i in range(student_count)
+        ]
+        group.students.set(students)
+        lesson = Lesson.objects.create(group=group, teacher=self.teacher, branch=self.branch, start_time=timezone.now())
+        return lesson, students
+
+    def sheet(self, lesson, students, status='present'):
+        return {
+            'lesson_id': str(lesson.id),
+            'teacher_status': 'present',
+            'students_attendance': [{'student_id': str(s.id), 'status': status} for s in students],
+        }
+
+    def post_sheets(self, *sheets):
+        return self.client.post('/api/attendance/submit/submit_attendance/', {'sheets': list(sheets)}, format='json')
+
+    def test_batch_of_lessons(self):
+        small, small_students = self.create_lesson(2)
+        large, large_students = self.create_lesson(5)
+
+        response = self.post_sheets(self.sheet(small, small_students), self.sheet(large, large_students, 'absent'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['lessons'], response.data['created'], response.data['total']), (2, 7, 7))
+        self.assertEqual(Attendance.objects.filter(lesson=large, status='absent').count(), 5)
+
+        response = self.post_sheets(self.sheet(large, large_students, 'late'))
+        self.assertEqual((response.data['created'], response.data['total']), (0, 5))
+        self.assertEqual(Attendance.objects.filter(lesson=large, status='late').count(), 5)
+
+    def test_query_count_does_not_grow_with_sheet_size(self):
+        small, small_students = self.create_lesson(2)
+        large, large_students = self.create_lesson(30)
+
+        with CaptureQueriesContext(connection) as small_queries:
+            self.post_sheets(self.sheet(small, small_students))
+        with CaptureQueriesContext(connection) as large_queries:
+            self.post_sheets(self.sheet(large, large_students))
+
+        self.assertEqual(len(small_queries), len(large_queries))
+
+    def test_rejects_students_outside_the_group(self):
+        lesson, students = self.create_lesson(2)
+        response = self.post_sheets(self.sheet(lesson, students + self.students[:1]))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['students'], [{'lesson_id': str(lesson.id), 'student_id': str(self.students[0].id)}])
+        self.assertFalse(Attendance.objects.filter(lesson=lesson).exists())
+
+    def test_select_all_present(self):
+        lesson, students = self.create_lesson(4)
+        self.post_sheets(self.sheet(lesson, students[:2], 'absent'))
+
+        response = self.client.post('/api/attendance/submit/select_all_present/', {'lesson': str(lesson.id)}, format='json')
+
+        self.assertEqual((response.data['inserted'], response.data['updated']), (2, 2))
+        self.assertEqual(Attendance.objects.filter(lesson=lesson, status='present').count(), 4)
+        self.assertEqual(AttendanceRollup.objects.filter(group=lesson.group, present=1).count(), 4)
+
+        # Students already marked present are neither inserted nor updated again
+        response = self.client.post('/api/attendance/submit/select_all_present/', {'lesson': str(lesson.id)}, format='json')
+        self.assertEqual((response.data['inserted'], response.data['updated']), (0, 0))
+
+    def test_select_all_present_query_count(self):
+        small, _ = self.create_lesson(2)
+        large, _ = self.create_lesson(40)
+
+        with CaptureQueriesContext(connection) as small_queries:
+            self.client.post('/api/attendance/submit/select_all_present/', {'lesson': str(small.id)}, format='json')
+        with CaptureQueriesContext(connection) as large_queries:
+            self.client.post('/api/attendance/submit/select_all_present/', {'lesson': str(large.id)}, format='json')
+
+        self.assertEqual(len(small_queries), len(large_queries))
@@ -5,9 +5,14 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from django.db.models import Count, Q
 from datetime import datetime, timedelta
+from core.fetch import FetchPlan, FetchPlanMixin
+from core.pagination import KeysetPagination
 from core.models import Attendance, Lesson, Group, Student, Teacher
-from .serializers import AttendanceSheetSerializer, BulkAttendanceSerializer, AttendanceDetailSerializer
+from .serializers import (
+    AttendanceSheetSerializer, AttendanceBatchSerializer, BulkAttendanceSerializer, AttendanceDetailSerializer
+)
 from auth_system.permissions import IsTeacher, IsAdmin
+from .submission import submit_sheets, mark_all_present, AttendanceSubmissionError
 
 class AttendanceSubmissionViewSet(viewsets.ViewSet):
     # permission_classes = [IsAuthenticated]
@@ -18,84 +23,71 @@ class AttendanceSubmissionViewSet(viewsets.ViewSet):
         if request.user.role not in ['teacher', 'admin']:
             return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
         
-        serializer = AttendanceSheetSerializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
+        if 'sheets' in request.data:
+            serializer = AttendanceBatchSerializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            sheets = serializer.validated_data['sheets']
+        else:
+            serializer = AttendanceSheetSerializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            sheets = [serializer.validated_data]
         
         try:
-            lesson = Lesson.objects.get(id=serializer.validated_data['lesson_id'])
-            
-            created_count = 0
-            for record in serializer.validated_data['students_attendance']:
-                student = Student.objects.get(id=record['student_id'])
-                
-                attendance, created = Attendance.objects.update_or_create(
-                    lesson=lesson,
-                    student=student,
-                    defaults={
-                        'status': record['status'],
-                        'homework_status': record.get('homework_status', 'missing'),
-                        'homework_grade': record.get('homework_grade'),
-                        'comments': record.get('comments', ''),
-                    }
-                )
-                
-                if created:
-                    created_count += 1
-            
-            return Response({
-                'status': 'Attendance submitted',
-                'created': created_count,
-                'total': len(serializer.validated_data['students_attendance'])
-            })
+            created_count, total = submit_sheets(sheets)
+        except AttendanceSubmissionError as e:
+            return Response({'error': str(e), **e.details}, status=status.HTTP_400_BAD_REQUEST)
         
-        except Exception as e:
-            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'status': 'Attendance submitted',
+            'lessons': len({sheet['lesson_id'] for sheet in sheets}),
+            'created': created_count,
+            'total': total
+        })
     
-    @action(detail=False, methods=['get'])
+    @action(detail=False, methods=['post'])
     def select_all_present(self, request):
-        lesson_id = request.query_params.get('lesson')
+        lesson_id = request.data.get('lesson') or request.data.get('lesson_id')
         if not lesson_id:
-            return Response({'error': 'lesson parameter required'}, status=status.HTTP_400_BAD_REQUEST)
+            return Response({'error': 'lesson is required'}, status=status.HTTP_400_BAD_REQUEST)
         
         try:
             lesson = Lesson.objects.get(id=lesson_id)
-            students = lesson.group.students.all()
-            
-            for student in students:
-                Attendance.objects.update_or_create(
-                    lesson=lesson,
-                    student=student,
-                    defaults={'status': 'present'}
-                )
-            
-            return Response({'status': f'All {students.count()} students marked present'})
         except Lesson.DoesNotExist:
             return Response({'error': 'Lesson not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        inserted, updated = mark_all_present(lesson)
+        return Response({
+            'status': 'All students marked present',
+            'inserted': inserted,
+            'updated': updated,
+        })
 
-class AttendanceViewSet(viewsets.ReadOnlyModelViewSet):
+class AttendanceViewSet(FetchPlanMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = AttendanceDetailSerializer
+    fetch_plan = FetchPlan(select_related=['student__user', 'lesson__group__subject', 'lesson__teacher__user'])
+    field_plans = {'lesson_info': FetchPlan(select_related=['lesson__group__subject', 'lesson__teacher__user'])}
     # permission_classes = [IsAuthenticated]
     permission_classes = [AllowAny]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['student__user__first_name', 'student__user__last_name']
     ordering_fields = ['submitted_at', 'status']
+    ordering = ['-submitted_at', '-id']
+    pagination_class = KeysetPagination
     
     def get_queryset(self):
         user = self.request.user
         
         if user.role == 'teacher':
-            teacher = user.teacher
-            return Attendance.objects.filter(lesson__teacher=teacher)
+            return self.fetch(Attendance.objects.filter(lesson__teacher__user=user))
         
         if user.role == 'student':
-            student = user.student
-            return Attendance.objects.filter(student=student)
+            return self.fetch(Attendance.objects.filter(student__user=user))
         
         if user.role == 'admin' and user.branch:
-            return Attendance.objects.filter(lesson__branch=user.branch)
+            return self.fetch(Attendance.objects.filter(lesson__branch=user.branch))
         
         if user.role == 'superadmin':
-            return Attendance.objects.all()
+            return self.fetch(Attendance.objects.all())
         
         return Attendance.objects.none()
     
@@ -2,20 +2,21 @@ from rest_framework import serializers
 from core.models import CustomUser, Organization, Branch
 from django.contrib.auth import authenticate
 from django.contrib.auth.models import Group
+from core.serializers import SparseFieldsMixin
 
-class OrganizationSerializer(serializers.ModelSerializer):
+class OrganizationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for Organization management"""
     class Meta:
         model = Organization
         fields = ['id', 'name', 'address', 'phone', 'email', 'logo', 'status', 'tariff', 'created_at']
 
-class BranchSerializer(serializers.ModelSerializer):
+class BranchSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for Branch management"""
     class Meta:
         model = Branch
         fields = ['id', 'organization', 'name', 'address', 'phone', 'status', 'created_at']
 
-class CustomUserSerializer(serializers.ModelSerializer):
+class CustomUserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for User with related organization and branch"""
     organization = OrganizationSerializer(read_only=True, help_text="Organization details")
     branch = BranchSerializer(read_only=True, help_text="Branch details")
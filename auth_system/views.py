@@ -4,6 +4,7 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework_simplejwt.tokens import RefreshToken
+from core.fetch import FetchPlan, FetchPlanMixin
 from core.models import CustomUser, Organization, Branch, Group
 from .serializers import (
     CustomUserSerializer, UserCreateSerializer, LoginSerializer,
@@ -67,14 +68,15 @@ class ChangePasswordView(generics.GenericAPIView):
         return Response({'message': 'Password changed successfully'})
 
 
-class OrganizationViewSet(viewsets.ModelViewSet):
+class OrganizationViewSet(FetchPlanMixin, viewsets.ModelViewSet):
     queryset = Organization.objects.all()
     serializer_class = OrganizationSerializer
     permission_classes = [AllowAny]
 
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(FetchPlanMixin, viewsets.ModelViewSet):
     serializer_class = CustomUserSerializer
+    fetch_plan = FetchPlan(select_related=['organization', 'branch'], prefetch_related=['groups'])
     permission_classes = [AllowAny]
 
     def get_queryset(self):
@@ -83,10 +85,10 @@ class UserViewSet(viewsets.ModelViewSet):
             return CustomUser.objects.none()
 
         if getattr(user, 'role', None) == 'superadmin':
-            return CustomUser.objects.all()
+            return self.fetch(CustomUser.objects.all())
 
         if getattr(user, 'organization', None):
-            return CustomUser.objects.filter(organization=user.organization)
+            return self.fetch(CustomUser.objects.filter(organization=user.organization))
 
     def perform_create(self, serializer):
         user = serializer.save()
@@ -101,7 +103,7 @@ class UserViewSet(viewsets.ModelViewSet):
             Group.objects.filter(branch=user.branch).update(teacher=user)
 
 
-class BranchViewSet(viewsets.ModelViewSet):
+class BranchViewSet(FetchPlanMixin, viewsets.ModelViewSet):
     """
     Branch Management ViewSet
     
@@ -120,15 +122,15 @@ class BranchViewSet(viewsets.ModelViewSet):
         user = self.request.user
         
         if not user or not user.is_authenticated:
-            return Branch.objects.all()  # Return all branches for unauthenticated users during testing
+            return self.fetch(Branch.objects.all())  # Return all branches for unauthenticated users during testing
         
         # Superadmin can see all branches
         if hasattr(user, 'role') and user.role == 'superadmin':
-            return Branch.objects.all()
+            return self.fetch(Branch.objects.all())
         
         # Other users see only their organization's branches
         if hasattr(user, 'organization') and user.organization:
-            return Branch.objects.filter(organization=user.organization)
+            return self.fetch(Branch.objects.filter(organization=user.organization))
         
         return Branch.objects.none()
     
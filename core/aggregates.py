@@ -0,0 +1,34 @@
+# core/aggregates.py
+from django.db.models import Count, F, Func, IntegerField, Q, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_by(queryset, field, values, total='total', count='pk', distinct=False, **extra):
+    """
+    Count the rows of ``queryset`` for each of ``values`` of ``field`` in one aggregate query.
+
+    Returns ``{value: count}`` for every value, plus the overall count under ``total``
+    (pass ``total=None`` to skip it) and any ``extra`` aggregates, e.g.
+    ``count_by(students, 'status', ['active', 'graduated'], total_debt=Sum('total_debt'))``.
+    ``count`` and ``distinct`` pick what is counted when ``field`` crosses a relation.
+    """
+    values = list(values)
+    # Values become positional aliases so they can never clash with field names
+    aggregates = {
+        f'_count_{index}': Count(count, filter=Q(**{field: value}), distinct=distinct)
+        for index, value in enumerate(values)
+    }
+    if total:
+        aggregates[total] = Count(count, distinct=distinct)
+    aggregates.update(extra)
+
+    row = queryset.aggregate(**aggregates)
+    result = {value: row.pop(f'_count_{index}') for index, value in enumerate(values)}
+    result.update(row)
+    return result
+
+
+def subquery_count(queryset):
+    """Correlated ``SELECT COUNT(*)`` subquery over ``queryset`` (filtered on an ``OuterRef``)"""
+    counted = queryset.order_by().annotate(count=Func(F('pk'), function='COUNT')).values('count')
+    return Coalesce(Subquery(counted, output_field=IntegerField()), 0)
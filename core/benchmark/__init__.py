@@ -0,0 +1,3 @@
+from .dataset import ROLES, seed
+from .runner import Endpoint, Runner, discover_endpoints
+from .explain import INDEXES, explain_plans, hot_queries
@@ -0,0 +1,201 @@
+# core/benchmark/dataset.py
+import math
+import random
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+from attendance import rollup
+from exams.importing import GradeBands
+from exams.models import Exam, ExamGradeRange, ExamResult
+from finance.models import FinanceReport, StudentPayment
+from finance.reports import rebuild_rollups
+from notifications.models import Notification, NotificationLog
+from core.models import Organization, Branch, CustomUser, Teacher, Student, Group, Lesson, Attendance
+
+ROLES = ('superadmin', 'director', 'manager', 'admin', 'teacher', 'student')
+FIRST_NAMES = ['Ali', 'Aziz', 'Dilnoza', 'Jasur', 'Kamola', 'Madina', 'Nodir', 'Sardor', 'Shahzoda', 'Umid']
+LAST_NAMES = ['Karimov', 'Rahimova', 'Tursunov', 'Usmonova', 'Valiyev', 'Yusupova', 'Zokirov']
+GRADE_RANGES = [('C', 0, 50, 'Poor'), ('B', 51, 85, 'Good'), ('A', 86, 100, 'Excellent')]
+
+
+class _BulkWriter:
+    """Buffers model instances and writes them with bulk_create in fixed-size chunks"""
+
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+        self.pending = {}
+        self.counts = {}
+
+    def add(self, obj):
+        rows = self.pending.setdefault(type(obj), [])
+        rows.append(obj)
+        if len(rows) >= self.batch_size:
+            self.flush(type(obj))
+
+    def flush(self, model=None):
+        for key in [model] if model else list(self.pending):
+            rows = self.pending.pop(key, [])
+            if rows:
+                key.objects.bulk_create(rows, batch_size=self.batch_size)
+                self.counts[key._meta.label] = self.counts.get(key._meta.label, 0) + len(rows)
+
+
+def seed(students=1000, organizations=1, branches=2, group_size=12, students_per_teacher=25,
+         lessons_per_group=8, payments_per_student=2, notifications_per_student=2, seed=0, batch_size=5000):
+    """
+    Create a synthetic dataset with ``students`` students spread over ``organizations`` x
+    ``branches`` branches. The same arguments always produce the same rows (ids included);
+    dates are relative to today so that "today"/"last 30 days" endpoints have data.
+    Returns ``(users, counts)``: one user per role and the number of rows per model.
+    """
+    # Rows are written in chunks as they are generated; foreign keys are only checked at commit
+    with transaction.atomic():
+        return _seed(students, organizations, branches, group_size, students_per_teacher,
+                     lessons_per_group, payments_per_student, notifications_per_student, seed, batch_size)
+
+
+def _seed(students, organizations, branches, group_size, students_per_teacher,
+          lessons_per_group, payments_per_student, notifications_per_student, seed, batch_size):
+    rng = random.Random(seed)
+    new_id = lambda: uuid.UUID(int=rng.getrandbits(128), version=4)
+    password = make_password(None)
+    now = timezone.now().replace(minute=0, second=0, microsecond=0)
+    writer = _BulkWriter(batch_size)
+
+    for grade, low, high, description in GRADE_RANGES:
+        ExamGradeRange.objects.get_or_create(
+            grade=grade, defaults={'min_score': low, 'max_score': high, 'description': description},
+        )
+    bands = GradeBands.load()
+
+    def user(username, role, organization=None, branch=None):
+        obj = CustomUser(
+            id=new_id(), username=username, role=role, password=password,
+            organization=organization, branch=branch,
+            first_name=rng.choice(FIRST_NAMES), last_name=rng.choice(LAST_NAMES),
+        )
+        writer.add(obj)
+        return obj
+
+    users = {'superadmin': user('bench-superadmin', 'superadmin')}
+    all_branches = []
+    for org_index in range(organizations):
+        organization = Organization(
+            id=new_id(), name=f'Organization {org_index}', address='-', phone='0', email=f'org{org_index}@example.com',
+        )
+        writer.add(organization)
+        for branch_index in range(branches):
+            all_branches.append(Branch(
+                id=new_id(), organization=organization, name=f'Branch {org_index}.{branch_index}', address='-', phone='0',
+            ))
+    for branch in all_branches:
+        writer.add(branch)
+    writer.flush(Organization)
+    writer.flush(Branch)
+
+    per_branch = max(1, students // len(all_branches))
+    receipt_counter = 0
+    for branch_index, branch in enumerate(all_branches):
+        prefix = f'bench-{branch_index}'
+        if branch_index == 0:
+            for role in ('director', 'manager', 'admin'):
+                users[role] = user(f'{prefix}-{role}', role, branch.organization, branch)
+
+        teachers = []
+        for index in range(max(1, per_branch // students_per_teacher)):
+            teacher_user = user(f'{prefix}-teacher{index}', 'teacher', branch.organization, branch)
+            teachers.append(Teacher(
+                id=new_id(), user=teacher_user, branch=branch,
+                hourly_rate=Decimal(rng.choice([50000, 70000, 90000])), group_rate=Decimal(rng.choice([400000, 600000])),
+                performance_rating=rng.randint(40, 100),
+            ))
+        branch_students = []
+        for index in range(per_branch):
+            student_user = user(f'{prefix}-student{index}', 'student', branch.organization, branch)
+            branch_students.append(Student(
+                id=new_id(), user=student_user, branch=branch,
+                status=rng.choices(['active', 'inactive', 'graduated'], weights=[85, 10, 5])[0],
+                total_debt=Decimal(rng.choice([0, 0, 0, 150000, 300000, 600000])),
+            ))
+        writer.flush(CustomUser)
+        for teacher in teachers:
+            writer.add(teacher)
+        for student in branch_students:
+            writer.add(student)
+        writer.flush()
+        if branch_index == 0:
+            users['teacher'] = teachers[0].user
+            users['student'] = branch_students[0].user
+
+        for group_index in range(math.ceil(per_branch / group_size)):
+            members = branch_students[group_index * group_size:(group_index + 1) * group_size]
+            teacher = teachers[group_index % len(teachers)]
+            group = Group(id=new_id(), branch=branch, name=f'Group {branch_index}.{group_index}', teacher=teacher)
+            writer.add(group)
+            for student in members:
+                writer.add(Group.students.through(group=group, student=student))
+
+            for lesson_index in range(lessons_per_group):
+                lesson = Lesson(
+                    id=new_id(), group=group, teacher=teacher, branch=branch,
+                    start_time=now - timedelta(days=2 * lesson_index, hours=rng.randint(0, 6)),
+                    is_cancelled=rng.random() < 0.05,
+                )
+                writer.add(lesson)
+                if lesson.is_cancelled:
+                    continue
+                for student in members:
+                    writer.add(Attendance(
+                        id=new_id(), lesson=lesson, student=student,
+                        status=rng.choices(['present', 'absent', 'late', 'excused'], weights=[80, 10, 7, 3])[0],
+                        homework_grade=rng.randint(0, 10),
+                    ))
+
+            exam = Exam(
+                id=new_id(), group=group, title=f'Exam {group_index}', subject='General',
+                exam_date=now - timedelta(days=7), total_questions=30, created_by=users['director'],
+            )
+            writer.add(exam)
+            for student in members:
+                score = rng.randint(20, 100)
+                writer.add(ExamResult(id=new_id(), exam=exam, student=student, score=score, grade=bands.grade_for(score)))
+
+        for student in branch_students:
+            for _ in range(payments_per_student):
+                receipt_counter += 1
+                status = rng.choices(['completed', 'pending', 'failed', 'refunded'], weights=[80, 12, 5, 3])[0]
+                writer.add(StudentPayment(
+                    id=new_id(), student=student, branch=branch,
+                    amount=Decimal(rng.choice([300000, 450000, 600000])),
+                    payment_method=rng.choice(['cash', 'card', 'transfer']),
+                    receipt_number=f'BENCH-{receipt_counter}', status=status,
+                    paid_at=now - timedelta(days=rng.randint(0, 90)) if status == 'completed' else None,
+                ))
+            for index in range(notifications_per_student):
+                status = rng.choices(['sent', 'failed', 'pending'], weights=[90, 7, 3])[0]
+                writer.add(Notification(
+                    user=student.user, title=f'Notice {index}', message='-', notification_type='in_app',
+                    status=status, is_read=rng.random() < 0.8,
+                ))
+                writer.add(NotificationLog(
+                    user=student.user, notification_type='in_app', recipient=student.user.username,
+                    subject=f'Notice {index}', message='-', status=status,
+                ))
+
+        for day in range(60):
+            income = Decimal(rng.randint(1, 20) * 100000)
+            teacher_payments = Decimal(rng.randint(1, 8) * 100000)
+            writer.add(FinanceReport(
+                id=new_id(), branch=branch, report_date=(now - timedelta(days=day)).date(),
+                total_student_payments=income, teacher_payments=teacher_payments,
+                profit=income - teacher_payments,
+            ))
+        writer.flush()
+
+    writer.flush()
+    rollup.rebuild()
+    rebuild_rollups(now.date() - timedelta(days=60), now.date())
+    return users, writer.counts
@@ -0,0 +1,91 @@
+# core/benchmark/explain.py
+from datetime import timedelta
+from django.apps import apps
+from django.db import connection
+from django.utils import timezone
+from exams.models import Exam, ExamResult
+from finance.models import FinanceReport, StudentPayment
+from notifications.models import Notification, NotificationLog
+from core.models import Attendance, Lesson, Student, Teacher
+
+# (model, index name) of the indexes serving the hot filter paths
+INDEXES = [
+    ('core.Attendance', 'core_attendance_student_st_idx'),
+    ('core.Lesson', 'core_lesson_branch_start_idx'),
+    ('core.Lesson', 'core_lesson_teacher_start_idx'),
+    ('finance.StudentPayment', 'finance_payment_status_idx'),
+    ('finance.StudentPayment', 'finance_payment_pending_idx'),
+    ('finance.FinanceReport', 'finance_report_type_date_idx'),
+    ('notifications.Notification', 'notif_unread_idx'),
+    ('notifications.NotificationLog', 'notif_log_status_idx'),
+    ('exams.ExamResult', 'exams_result_exam_score_idx'),
+]
+
+
+def hot_queries(users):
+    """The filters the views run most, bound to the seeded ``users``, as ``{name: queryset}``"""
+    branch = users['admin'].branch
+    teacher = Teacher.objects.get(user=users['teacher'])
+    student = Student.objects.get(user=users['student'])
+    exam = Exam.objects.filter(group__branch=branch).first()
+    now = timezone.now()
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    return {
+        'student_absences': Attendance.objects.filter(student=student, status='absent'),
+        'branch_lessons_today': Lesson.objects.filter(
+            branch=branch, start_time__gte=today, start_time__lt=today + timedelta(days=1),
+        ),
+        'teacher_upcoming_lessons': Lesson.objects.filter(
+            teacher=teacher, start_time__gte=now, is_cancelled=False,
+        ).order_by('start_time')[:10],
+        'branch_daily_income': StudentPayment.objects.filter(
+            branch=branch, status='completed', paid_at__gte=today, paid_at__lt=today + timedelta(days=1),
+        ),
+        'branch_pending_payments': StudentPayment.objects.filter(
+            branch=branch, status='pending',
+        ).order_by('-created_at')[:20],
+        'daily_reports_last_month': FinanceReport.objects.filter(
+            report_type='daily', report_date__gte=(today - timedelta(days=30)).date(), report_date__lte=today.date(),
+        ),
+        'unread_notifications': Notification.objects.filter(user=users['student'], is_read=False),
+        'failed_notification_logs': NotificationLog.objects.filter(status='failed').order_by('-created_at'),
+        'exam_ranking': ExamResult.objects.filter(exam=exam).order_by('-score'),
+    }
+
+
+def _analyze(models):
+    # Fresh statistics, so the planner sees the seeded volume rather than empty tables
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        for table in {model._meta.db_table for model in models}:
+            cursor.execute(f'ANALYZE {connection.ops.quote_name(table)}')
+
+
+def _plans(queries, analyze):
+    return {name: queryset.explain(analyze=analyze) for name, queryset in queries.items()}
+
+
+def explain_plans(queries, indexes=INDEXES, analyze=False):
+    """
+    ``{name: {'before': plan, 'after': plan}}``: every query of ``queries`` explained with
+    ``indexes`` dropped, then again once they are rebuilt. Meant for a scratch database.
+    """
+    resolved = []
+    for label, name in indexes:
+        model = apps.get_model(label)
+        resolved.append((model, next(index for index in model._meta.indexes if index.name == name)))
+    models = [model for model, _ in resolved]
+
+    with connection.schema_editor() as editor:
+        for model, index in resolved:
+            editor.remove_index(model, index)
+    _analyze(models)
+    before = _plans(queries, analyze)
+
+    with connection.schema_editor() as editor:
+        for model, index in resolved:
+            editor.add_index(model, index)
+    _analyze(models)
+    after = _plans(queries, analyze)
+    return {name: {'before': before[name], 'after': after[name]} for name in queries}
@@ -0,0 +1,176 @@
+# core/benchmark/runner.py
+import re
+import time
+import tracemalloc
+from collections import namedtuple
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, get_resolver
+from rest_framework.test import APIRequestFactory, force_authenticate
+from exams.models import Exam
+from core.models import Group, Student
+
+Endpoint = namedtuple('Endpoint', ['route', 'view', 'viewset', 'action', 'url_kwargs'])
+
+_GROUP = re.compile(r'\(\?P<(\w+)>[^)]*\)')
+
+
+def _visible(queryset, user, branch_field):
+    return queryset.filter(**{branch_field: user.branch}) if user.branch_id else queryset
+
+
+def _first(queryset):
+    value = queryset.order_by('pk').values_list('pk', flat=True).first()
+    return str(value) if value else None
+
+
+# Query parameters that actions refuse to run without, picked from the seeded rows the user can see
+PARAMS = {
+    'api/admin/attendance/student_attendance/': lambda user: {
+        'student': _first(_visible(Student.objects, user, 'branch')),
+    },
+    'api/exams/results/by_grade/': lambda user: {'exam': _first(_visible(Exam.objects, user, 'group__branch'))},
+    'api/exams/results/statistics/': lambda user: {'exam': _first(_visible(Exam.objects, user, 'group__branch'))},
+    'api/teacher/dashboard/student_attendance/': lambda user: {'group': _first(Group.objects.filter(teacher__user=user))},
+}
+
+
+def _clean(regex):
+    """``^exams/(?P<pk>[^/.]+)/$`` -> ``exams/{pk}/``"""
+    return _GROUP.sub(lambda match: '{%s}' % match.group(1), str(regex)).replace('^', '').replace('$', '')
+
+
+def _walk(patterns, prefix=''):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from _walk(pattern.url_patterns, prefix + _clean(pattern.pattern))
+        elif isinstance(pattern, URLPattern):
+            yield prefix + _clean(pattern.pattern), pattern
+
+
+def discover_endpoints(urlconf=None):
+    """
+    Every GET viewset action reachable from the URLconf. Viewsets mounted by hand with only
+    their ``list`` route (the dashboards) also contribute their list-level extra actions.
+    """
+    endpoints = {}
+    mounted = {}
+    for route, pattern in _walk(get_resolver(urlconf).url_patterns):
+        view = pattern.callback
+        actions = getattr(view, 'actions', None)
+        if not actions or 'get' not in actions or 'format' in pattern.pattern.regex.groupindex:
+            continue
+        viewset = view.cls
+        endpoints.setdefault((viewset, actions['get']), Endpoint(
+            route, view, viewset, actions['get'], tuple(pattern.pattern.regex.groupindex),
+        ))
+        if actions['get'] == 'list':
+            mounted.setdefault(viewset, route)
+
+    for viewset, route in mounted.items():
+        for extra in viewset.get_extra_actions():
+            if extra.detail or 'get' not in extra.mapping or (viewset, extra.__name__) in endpoints:
+                continue
+            endpoints[(viewset, extra.__name__)] = Endpoint(
+                f'{route}{extra.url_path}/', viewset.as_view({'get': extra.__name__}), viewset, extra.__name__, (),
+            )
+    return sorted(endpoints.values(), key=lambda endpoint: endpoint.route)
+
+
+def _percentile(values, percent):
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def _reason(response):
+    data = getattr(response, 'data', None)
+    if isinstance(data, dict):
+        return str(data.get('error') or data.get('detail') or data)
+    return response.reason_phrase
+
+
+def _first_id(data):
+    if isinstance(data, dict):
+        data = data.get('results', [])
+    if isinstance(data, list) and data and isinstance(data[0], dict):
+        return data[0].get('id')
+    return None
+
+
+class Runner:
+    """Calls endpoints as a given user and records queries, latency and peak memory"""
+
+    def __init__(self, repeat=5, warm_cache=False, params=None):
+        self.repeat = repeat
+        self.warm_cache = warm_cache
+        self.params = PARAMS if params is None else params
+        self.factory = APIRequestFactory()
+        self.first_ids = {}
+
+    def call(self, endpoint, user, kwargs, params=None):
+        path = '/' + endpoint.route.format(**kwargs)
+        request = self.factory.get(path, params)
+        force_authenticate(request, user)
+        response = endpoint.view(request, **kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        return response
+
+    def measure(self, endpoint, role, user):
+        result = {'route': endpoint.route, 'viewset': endpoint.viewset.__name__,
+                  'action': endpoint.action, 'role': role}
+        kwargs = {}
+        if endpoint.url_kwargs:
+            pk = self.first_ids.get((endpoint.viewset, role))
+            if pk is None:
+                return dict(result, status='skipped', error='No object visible to this role')
+            kwargs = {name: pk for name in endpoint.url_kwargs}
+        params = self.params[endpoint.route](user) if endpoint.route in self.params else None
+        if params and None in params.values():
+            return dict(result, status='skipped', error='No parameter value visible to this role')
+
+        # The first call warms imports and connection state; it only records the query count.
+        # Memory is traced in one extra call so tracemalloc overhead stays out of the timings.
+        timings = []
+        for run in range(self.repeat + 2):
+            if not self.warm_cache:
+                cache.clear()
+            if run == self.repeat + 1:
+                tracemalloc.start()
+            try:
+                with CaptureQueriesContext(connection) as captured:
+                    started = time.perf_counter()
+                    response = self.call(endpoint, user, kwargs, params)
+                    elapsed = time.perf_counter() - started
+            except Exception as e:
+                return dict(result, status='error', error=f'{type(e).__name__}: {e}')
+            finally:
+                if tracemalloc.is_tracing():
+                    peak = tracemalloc.get_traced_memory()[1]
+                    tracemalloc.stop()
+            if run == 0:
+                if 400 <= response.status_code < 500:
+                    # A refused request measures the refusal, not the endpoint
+                    return dict(result, status='skipped', error=f'{response.status_code}: {_reason(response)}')
+                queries = len(captured)
+                if endpoint.action == 'list':
+                    self.first_ids[(endpoint.viewset, role)] = _first_id(getattr(response, 'data', None))
+            elif run <= self.repeat:
+                timings.append(elapsed * 1000)
+
+        return dict(
+            result,
+            status=response.status_code,
+            queries=queries,
+            p50_ms=round(_percentile(timings, 50), 3),
+            p95_ms=round(_percentile(timings, 95), 3),
+            peak_memory_kb=round(peak / 1024, 1),
+        )
+
+    def run(self, endpoints, users):
+        """Measure every endpoint as every user; list actions run first so details get an id"""
+        ordered = sorted(endpoints, key=lambda endpoint: (endpoint.action != 'list', endpoint.route))
+        results = [self.measure(endpoint, role, user) for endpoint in ordered for role, user in users.items()]
+        return sorted(results, key=lambda item: (item['route'], item['role']))
@@ -0,0 +1,113 @@
+# core/cache.py
+"""
+Versioned response cache for read-heavy dashboard endpoints.
+
+Every branch, organization and the whole installation have a version token in the
+cache. Cached payloads embed the token of the scope they were computed for, so
+replacing a token (``bump_branch``) retires all payloads of that scope at once without
+having to know their keys. Tokens are random rather than counters so that an evicted
+token can never be recreated with an old value.
+"""
+import hashlib
+import uuid
+from functools import wraps
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.response import Response
+
+RESPONSE_TIMEOUT = 60 * 60
+GLOBAL_VERSION_KEY = 'dashboard:version:all'
+
+
+def _version_key(kind, pk):
+    return f'dashboard:version:{kind}:{pk}'
+
+
+def _branch_organization(branch_id):
+    from .models import Branch
+    return Branch.objects.filter(pk=branch_id).values_list('organization_id', flat=True).first()
+
+
+def bump_branch(branch_id, organization_id=None):
+    """Invalidate cached payloads of ``branch_id``, its organization and installation-wide ones"""
+    if branch_id is None:
+        return
+    if organization_id is None:
+        organization_id = _branch_organization(branch_id)
+
+    keys = [GLOBAL_VERSION_KEY, _version_key('branch', branch_id)]
+    if organization_id is not None:
+        keys.append(_version_key('organization', organization_id))
+    transaction.on_commit(lambda: cache.set_many({key: uuid.uuid4().hex for key in keys}, None))
+
+
+def bump_branches(branch_ids):
+    for branch_id in set(branch_ids):
+        bump_branch(branch_id)
+
+
+class Scope:
+    """What a cached payload depends on: a version token plus a label for the key"""
+
+    def __init__(self, label, version_key):
+        self.label = label
+        self.version_key = version_key
+
+    def version(self):
+        return cache.get_or_set(self.version_key, uuid.uuid4().hex, None)
+
+
+def organization_scope(user):
+    """Whole installation for superadmins, the organization if set, otherwise the branch"""
+    if user.role == 'superadmin':
+        return Scope('all', GLOBAL_VERSION_KEY)
+    if user.organization_id:
+        return Scope(f'organization:{user.organization_id}', _version_key('organization', user.organization_id))
+    return branch_scope(user)
+
+
+def branch_scope(user):
+    if user.branch_id:
+        return Scope(f'branch:{user.branch_id}', _version_key('branch', user.branch_id))
+    return None
+
+
+def user_scope(user):
+    """Payloads computed for one user, invalidated together with their branch"""
+    if user.branch_id:
+        return Scope(f'user:{user.id}', _version_key('branch', user.branch_id))
+    return Scope(f'user:{user.id}', GLOBAL_VERSION_KEY)
+
+
+def response_key(endpoint, scope, role, params):
+    params = '&'.join(f'{name}={value}' for name, value in sorted(params.lists()))
+    digest = hashlib.md5(params.encode()).hexdigest()
+    return f'dashboard:{endpoint}:{scope.label}:{scope.version()}:{role}:{digest}'
+
+
+def versioned_response(scope, timeout=RESPONSE_TIMEOUT):
+    """
+    Cache successful responses of a viewset action per (endpoint, scope, role, query params).
+    ``scope`` maps the requesting user to a Scope; returning None skips the cache.
+    """
+    def decorator(view_method):
+        endpoint = view_method.__qualname__
+
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            user = request.user
+            current = scope(user) if user.is_authenticated else None
+            if current is None:
+                return view_method(self, request, *args, **kwargs)
+
+            key = response_key(endpoint, current, user.role, request.query_params)
+            data = cache.get(key)
+            if data is not None:
+                return Response(data)
+
+            response = view_method(self, request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(key, response.data, timeout)
+            return response
+        return wrapper
+    return decorator
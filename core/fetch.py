@@ -0,0 +1,141 @@
+# core/fetch.py
+"""
+Fetch plans for viewsets.
+
+A plan declares what a viewset's queryset has to join, prefetch and annotate so that its
+serializer reads everything from the rows it is handed: ``select_related`` for the foreign
+keys the serializer follows, ``prefetch_related`` for many-valued relations and ``annotate``
+for per-row counts. With the plan applied a list page costs the same number of queries
+whatever its size.
+
+For sparse requests (``?fields=``/``?omit=`` on a serializer with
+``core.serializers.SparseFieldsMixin``) the plan is derived from the fields that remain: dotted
+sources and nested serializers become joins, many-to-many fields prefetches, and the row
+is narrowed with ``only()`` to the columns those fields read. SerializerMethodFields and
+annotations are opaque, so viewsets list what they need in ``field_plans``.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+
+
+class FetchPlan:
+    def __init__(self, select_related=(), prefetch_related=(), annotate=None, only=None):
+        self.select_related = tuple(select_related)
+        self.prefetch_related = tuple(prefetch_related)
+        self.annotate = dict(annotate or {})
+        # Columns to load; None loads them all
+        self.only = tuple(only) if only is not None else None
+
+    @classmethod
+    def combine(cls, plans):
+        """One plan doing everything ``plans`` do, each relation joined or prefetched once"""
+        select, prefetch, annotate, only = {}, {}, {}, None
+        for plan in plans:
+            select.update(dict.fromkeys(plan.select_related))
+            prefetch.update({getattr(lookup, 'prefetch_to', lookup): lookup for lookup in plan.prefetch_related})
+            annotate.update(plan.annotate)
+            if plan.only is not None:
+                only = (only or ()) + plan.only
+        return cls(select, prefetch.values(), annotate, only)
+
+    def apply(self, queryset):
+        if self.only is not None:
+            # Joined relations must be loaded too, or they could not be followed
+            columns = {queryset.model._meta.pk.name, *self.only}
+            columns.update(path.split('__')[0] for path in self.select_related)
+            queryset = queryset.only(*columns)
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+        if self.prefetch_related:
+            queryset = queryset.prefetch_related(*self.prefetch_related)
+        if self.annotate:
+            queryset = queryset.annotate(**self.annotate)
+        return queryset
+
+
+def _is_field(model, name):
+    try:
+        model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return False
+    return True
+
+
+def _follow(model, source):
+    """
+    ``(column, join, prefetch)`` a serializer field ``source`` reads on ``model``: the local
+    column, the forward relations to join and the many-valued relation to prefetch (or None)
+    """
+    column, relations = None, []
+    for index, name in enumerate(source.split('.')):
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            break
+        if index == 0 and field.concrete and not field.many_to_many:
+            column = name
+        if field.many_to_many or field.one_to_many:
+            return column, None, name if index == 0 else None
+        if not field.is_relation:
+            break
+        relations.append(name)
+        model = field.related_model
+    return column, '__'.join(relations) or None, None
+
+
+def sparse_plan(model, fields, field_plans=None):
+    """
+    Plan reading just the serializer ``fields`` (name -> bound field) of ``model`` rows. A plan
+    in ``field_plans`` replaces what is derived for that field and lists in ``only`` the local
+    columns it reads. Columns are not narrowed when a method field or property has no plan.
+    """
+    field_plans = field_plans or {}
+    columns, select, prefetch = set(), [], []
+    narrow = True
+    for name, field in fields.items():
+        if name in field_plans:
+            continue
+        if field.source == '*' or not _is_field(model, field.source.split('.')[0]):
+            # Method fields and properties may read any column
+            narrow = False
+            continue
+        column, join, many = _follow(model, field.source)
+        if column:
+            columns.add(column)
+        if many:
+            prefetch.append(many)
+        # A relation is joined when the field reads through it or nests a serializer for it
+        if join and ('.' in field.source or isinstance(field, serializers.BaseSerializer)):
+            select.append(join if '.' in field.source else join.split('__')[0])
+    plans = [plan for name, plan in field_plans.items() if name in fields]
+    plan = FetchPlan.combine([*plans, FetchPlan(select, prefetch)])
+    plan.only = (*columns, *(plan.only or ())) if narrow else None
+    return plan
+
+
+class FetchPlanMixin:
+    """
+    Viewset mixin. Declare ``fetch_plan`` (and optionally ``fetch_plans``, action name -> plan,
+    for actions whose serializer differs) and pass every queryset ``get_queryset`` returns
+    through ``self.fetch()``. Viewsets that only set ``queryset`` get the plan applied as is.
+    ``field_plans`` (serializer field -> plan) covers method fields and annotated counts in
+    sparse requests.
+    """
+    fetch_plan = None
+    fetch_plans = {}
+    field_plans = {}
+
+    def get_fetch_plan(self):
+        action = getattr(self, 'action', None)
+        if action not in self.fetch_plans and getattr(self, 'request', None) is not None:
+            serializer = self.get_serializer()
+            if getattr(serializer, 'is_sparse', False):
+                return sparse_plan(serializer.Meta.model, serializer.fields, self.field_plans)
+        return self.fetch_plans.get(action, self.fetch_plan)
+
+    def fetch(self, queryset):
+        plan = self.get_fetch_plan()
+        return plan.apply(queryset) if plan is not None else queryset
+
+    def get_queryset(self):
+        return self.fetch(super().get_queryset())
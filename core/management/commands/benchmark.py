@@ -0,0 +1,113 @@
+import json
+import subprocess
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+from core.benchmark import ROLES, Runner, discover_endpoints, explain_plans, hot_queries, seed
+
+
+def _revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True, text=True,
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+class Command(BaseCommand):
+    help = ('Seed a synthetic dataset into a test database and record query count, p50/p95 latency '
+            'and peak memory of every GET viewset action for every role. With --explain, print the '
+            'EXPLAIN plans of the hot filter paths without and with their indexes instead')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=1000, help='Total number of students')
+        parser.add_argument('--organizations', type=int, default=1)
+        parser.add_argument('--branches', type=int, default=2, help='Branches per organization')
+        parser.add_argument('--lessons-per-group', type=int, default=8)
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for the dataset')
+        parser.add_argument('--repeat', type=int, default=5, help='Measured calls per endpoint and role')
+        parser.add_argument('--roles', default=','.join(ROLES), help='Comma separated roles to run as')
+        parser.add_argument('--match', default='', help='Only endpoints whose route contains this text')
+        parser.add_argument('--warm-cache', action='store_true', help='Keep the cache between calls')
+        parser.add_argument('--keepdb', action='store_true', help='Reuse the test database if it exists')
+        parser.add_argument('--output', help='Write JSON here instead of stdout')
+        parser.add_argument('--explain', action='store_true', help='Compare query plans before and after the indexes')
+        parser.add_argument('--analyze', action='store_true', help='With --explain, run EXPLAIN ANALYZE')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be at least 1')
+        roles = [role.strip() for role in options['roles'].split(',') if role.strip()]
+        unknown = set(roles) - set(ROLES)
+        if unknown:
+            raise CommandError(f"Unknown roles: {', '.join(sorted(unknown))}")
+
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        try:
+            report = self.explain(options) if options['explain'] else self.benchmark(options, roles)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        payload = json.dumps(report, indent=2, default=str)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                output.write(payload)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {len(report['results'])} measurements to {options['output']}"))
+        elif options['explain']:
+            self.write_plans(report['results'])
+        else:
+            self.stdout.write(payload)
+
+    def write_plans(self, plans):
+        for name, plan in plans.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            for stage in ('before', 'after'):
+                self.stdout.write(f'  {stage}:')
+                for line in plan[stage].splitlines():
+                    self.stdout.write(f'    {line}')
+
+    def seed(self, options):
+        return seed(
+            students=options['students'], organizations=options['organizations'], branches=options['branches'],
+            lessons_per_group=options['lessons_per_group'], seed=options['seed'],
+        )
+
+    def meta(self, options):
+        return {
+            'revision': _revision(),
+            'generated_at': timezone.now().isoformat(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'students': options['students'],
+            'organizations': options['organizations'],
+            'branches': options['branches'],
+            'lessons_per_group': options['lessons_per_group'],
+            'seed': options['seed'],
+        }
+
+    def explain(self, options):
+        users, counts = self.seed(options)
+        return {
+            'meta': dict(self.meta(options), analyze=options['analyze']),
+            'rows': counts,
+            'results': explain_plans(hot_queries(users), analyze=options['analyze']),
+        }
+
+    def benchmark(self, options, roles):
+        users, counts = self.seed(options)
+        endpoints = [endpoint for endpoint in discover_endpoints() if options['match'] in endpoint.route]
+        results = Runner(repeat=options['repeat'], warm_cache=options['warm_cache']).run(
+            endpoints, {role: users[role] for role in roles},
+        )
+        return {
+            'meta': dict(self.meta(options), repeat=options['repeat'], warm_cache=options['warm_cache']),
+            'rows': counts,
+            'results': results,
+        }
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.8 on 2026-10-18 02:00
+
+from django.db import migrations
+from django.db.models import Count
+
+CORRECTIONS_TABLE = 'admin_dashboard_attendancecorrection'
+
+
+def _repoint_corrections(schema_editor, duplicate_ids, kept_id):
+    # admin_dashboard has no migrations, so its model is not in the historical registry
+    connection = schema_editor.connection
+    if CORRECTIONS_TABLE not in connection.introspection.table_names():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {connection.ops.quote_name(CORRECTIONS_TABLE)} SET original_attendance_id = %s '
+            f'WHERE original_attendance_id IN ({", ".join(["%s"] * len(duplicate_ids))})',
+            [kept_id, *duplicate_ids],
+        )
+
+
+def remove_duplicate_attendance(apps, schema_editor):
+    """
+    Keep only the latest submission for each (lesson, student) pair; corrections of the
+    removed rows are moved to the kept one
+    """
+    Attendance = apps.get_model('core', 'Attendance')
+    duplicates = Attendance.objects.values('lesson', 'student').annotate(
+        rows=Count('id')
+    ).filter(rows__gt=1)
+    for row in duplicates:
+        kept_id, *duplicate_ids = Attendance.objects.filter(
+            lesson=row['lesson'], student=row['student'],
+        ).order_by('-submitted_at').values_list('id', flat=True)
+        _repoint_corrections(schema_editor, duplicate_ids, kept_id)
+        Attendance.objects.filter(id__in=duplicate_ids).delete()
+
+
+class Migration(migrations.Migration):
+    # The unique constraint is added by the next migration: altering the table in the same
+    # transaction as these deletes fails on PostgreSQL with pending deferred FK triggers
+
+    dependencies = [
+        ('core', '0009_alter_roomschedule_unique_together_roomschedule_days_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_attendance, migrations.RunPython.noop),
+    ]
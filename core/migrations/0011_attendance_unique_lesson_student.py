@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-18 02:00
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_remove_duplicate_attendance'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='attendance',
+            unique_together={('lesson', 'student')},
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-18 02:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_student_branch_debt_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['submitted_at', 'id'], name='core_attendance_keyset_idx'),
+        ),
+    ]
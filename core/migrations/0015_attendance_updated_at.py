@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-18 03:01
+
+from django.db import migrations, models
+
+
+def backfill_updated_at(apps, schema_editor):
+    """Existing rows were last changed no earlier than they were submitted"""
+    Attendance = apps.get_model('core', 'Attendance')
+    Attendance.objects.update(updated_at=models.F('submitted_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendance',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['updated_at'], name='core_attendance_updated_idx'),
+        ),
+        # Last, so no table change follows the row updates in this transaction
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_attendance_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='student',
+            name='debt_updated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['debt_updated_at'], name='core_student_debt_updated_idx'),
+        ),
+    ]
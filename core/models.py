@@ -125,8 +125,16 @@ class Student(models.Model):
     enrollment_date = models.DateField(auto_now_add=True)
     total_paid = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     total_debt = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    # Set by finance.debts whenever total_paid or total_debt is rewritten
+    debt_updated_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['branch', 'total_debt'], name='core_student_branch_debt_idx'),
+            models.Index(fields=['debt_updated_at'], name='core_student_debt_updated_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user.full_name} (Student)"
 
@@ -187,6 +195,14 @@ class Lesson(models.Model):
     cancellation_reason = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # A branch's lessons in a period: payroll, today's lessons, pending attendance
+            models.Index(fields=['branch', 'start_time'], name='core_lesson_branch_start_idx'),
+            # A teacher's upcoming lessons
+            models.Index(fields=['teacher', 'start_time'], name='core_lesson_teacher_start_idx'),
+        ]
+
     def __str__(self):
         return f"{self.group.name} - {self.start_time}"
 
@@ -303,6 +319,19 @@ class Attendance(models.Model):
     comments = models.TextField(blank=True)
     teacher_comments = models.TextField(blank=True)
     submitted_at = models.DateTimeField(auto_now_add=True)
+    # Bulk upserts set it explicitly; auto_now only covers save()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('lesson', 'student')
+        indexes = [
+            # Rows changed since the last risk scoring run
+            models.Index(fields=['updated_at'], name='core_attendance_updated_idx'),
+            # Keyset pagination of the attendance list
+            models.Index(fields=['submitted_at', 'id'], name='core_attendance_keyset_idx'),
+            # A student's absences and attendance by status (risk scoring)
+            models.Index(fields=['student', 'status'], name='core_attendance_student_st_idx'),
+        ]
 
     def __str__(self):
         return f"{self.student.user.full_name} - {self.status}"
@@ -0,0 +1,52 @@
+# core/pagination.py
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination for large, append-mostly tables. Pages follow the view's ``ordering``
+    (e.g. ``['-created_at', '-id']``, backed by an index on the same columns) and continue
+    from the last row seen, so the last page costs the same as the first: no OFFSET scan and
+    no COUNT(*). The primary key breaks ties when the client orders by another field.
+
+    Clients that still need page numbers opt in with ``?page=``, which is served by the
+    default ``PageNumberPagination``.
+    """
+    ordering = ('-created_at', '-id')
+    page_numbers = None
+
+    def get_ordering(self, request, queryset, view):
+        self.ordering = getattr(view, 'ordering', None) or self.ordering
+        ordering = super().get_ordering(request, queryset, view)
+        if not any(field.lstrip('-') in ('id', 'pk') for field in ordering):
+            ordering += ('-id' if ordering[0].startswith('-') else 'id',)
+        return ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if PageNumberPagination.page_query_param in request.query_params:
+            self.page_numbers = PageNumberPagination()
+            page = self.page_numbers.paginate_queryset(queryset, request, view)
+            self.display_page_controls = self.page_numbers.display_page_controls
+            return page
+        names, deferred = queryset.query.deferred_loading
+        if names and not deferred:
+            # Rows narrowed with only() must still carry the columns the cursor is built from
+            ordering = self.get_ordering(request, queryset, view)
+            queryset = queryset.only(*names, *(field.lstrip('-') for field in ordering))
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.page_numbers is not None:
+            return self.page_numbers.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def to_html(self):
+        if self.page_numbers is not None:
+            return self.page_numbers.to_html()
+        return super().to_html()
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            *super().get_schema_operation_parameters(view),
+            *PageNumberPagination().get_schema_operation_parameters(view),
+        ]
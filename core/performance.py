@@ -0,0 +1,99 @@
+# core/performance.py
+"""
+Teacher performance shared by the attendance write path and the manager and director
+dashboards. Models of other apps are looked up when used, so apps depend on core and
+never on each other's dashboards.
+"""
+from django.apps import apps
+from django.db.models import Count, DecimalField, Func, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from .models import Attendance
+
+ATTENDANCE_STATUSES = [choice for choice, _ in Attendance.STATUS_CHOICES]
+EARNED_STATUSES = ['approved', 'paid']
+
+
+def _alerts():
+    return apps.get_model('manager_dashboard', 'NotificationAlert')
+
+
+def record_late_teachers(sheets, lessons):
+    """One ``teacher_late`` alert per lesson whose sheet reports the teacher as late"""
+    NotificationAlert = _alerts()
+    late = {sheet['lesson_id'] for sheet in sheets if sheet.get('teacher_status') == 'late'}
+    if not late:
+        return
+    late -= set(NotificationAlert.objects.filter(
+        alert_type='teacher_late', related_lesson_id__in=late,
+    ).values_list('related_lesson_id', flat=True))
+    NotificationAlert.objects.bulk_create([
+        NotificationAlert(
+            branch_id=lessons[lesson_id].branch_id,
+            alert_type='teacher_late',
+            related_lesson_id=lesson_id,
+            message=f'Teacher was late for the lesson at {lessons[lesson_id].start_time:%Y-%m-%d %H:%M}',
+        )
+        for lesson_id in late
+    ])
+
+
+def _late_arrivals(start):
+    """Lessons of the teacher with a ``teacher_late`` alert"""
+    alerts = _alerts().objects.filter(alert_type='teacher_late', related_lesson__teacher=OuterRef('pk'))
+    if start:
+        alerts = alerts.filter(related_lesson__start_time__gte=start)
+    counted = alerts.order_by().annotate(
+        count=Func('related_lesson', function='COUNT', template='%(function)s(DISTINCT %(expressions)s)'),
+    ).values('count')
+    return Coalesce(Subquery(counted, output_field=IntegerField()), 0)
+
+
+def _earned(start):
+    """Approved and paid salary in the period"""
+    TeacherPayment = apps.get_model('finance', 'TeacherPayment')
+    payments = TeacherPayment.objects.filter(teacher=OuterRef('pk'), status__in=EARNED_STATUSES)
+    if start:
+        payments = payments.filter(month__gte=start.date().replace(day=1))
+    summed = payments.order_by().annotate(total=Func('total_amount', function='SUM')).values('total')
+    return Coalesce(Subquery(summed, output_field=DecimalField(max_digits=12, decimal_places=2)), 0,
+                    output_field=DecimalField(max_digits=12, decimal_places=2))
+
+
+def teacher_performance(teachers, start=None):
+    """
+    Lesson, cancellation, late-arrival, attendance and earnings figures for every teacher of
+    ``teachers`` since ``start`` (all time when None), computed in a single query.
+    """
+    in_period = Q(lessons__start_time__gte=start) if start else Q()
+    attendance = {
+        status: Count('lessons__attendances', filter=in_period & Q(lessons__attendances__status=status))
+        for status in ATTENDANCE_STATUSES
+    }
+    rows = teachers.select_related('user').annotate(
+        lessons_count=Count('lessons', filter=in_period, distinct=True),
+        cancelled_count=Count('lessons', filter=in_period & Q(lessons__is_cancelled=True), distinct=True),
+        late_count=_late_arrivals(start),
+        earned_in_period=_earned(start),
+        **{f'attendance_{status}': expression for status, expression in attendance.items()},
+    ).order_by('user__last_name', 'user__first_name', 'id')
+
+    performance = []
+    for teacher in rows:
+        distribution = {status: getattr(teacher, f'attendance_{status}') for status in ATTENDANCE_STATUSES}
+        recorded = sum(distribution.values())
+        held = teacher.lessons_count - teacher.cancelled_count
+        performance.append({
+            'teacher_id': teacher.id,
+            'name': teacher.user.get_full_name(),
+            'branch_id': teacher.branch_id,
+            'rating': teacher.performance_rating,
+            'lessons': teacher.lessons_count,
+            'cancelled_lessons': teacher.cancelled_count,
+            'late_arrivals': teacher.late_count,
+            'punctuality_rate': ((held - teacher.late_count) / held * 100) if held > 0 else 100,
+            'attendance': distribution,
+            'attendance_rate': (distribution['present'] / recorded * 100) if recorded > 0 else 0,
+            'total_earned': teacher.total_earned,
+            'earned_in_period': teacher.earned_in_period,
+        })
+    return performance
@@ -0,0 +1,41 @@
+# core/serializers.py
+from rest_framework import serializers
+
+
+def _names(value):
+    return {name.strip() for name in (value or '').split(',') if name.strip()}
+
+
+def requested_fields(request):
+    """
+    ``(fields, omit)`` asked for with ``?fields=a,b`` and ``?omit=c``, as sets; ``fields`` is
+    empty when every field is wanted. Only reads apply a projection.
+    """
+    if request is None or request.method != 'GET':
+        return set(), set()
+    return _names(request.query_params.get('fields')), _names(request.query_params.get('omit'))
+
+
+class SparseFieldsMixin:
+    """
+    Serializer mixin for ``?fields=`` and ``?omit=``: fields that were not asked for are
+    dropped before serializing, so their SerializerMethodFields never run. Only the top-level
+    serializer of a response is projected; nested serializers keep their fields.
+    """
+
+    @property
+    def is_sparse(self):
+        fields, omit = requested_fields(self.context.get('request'))
+        return bool(fields or omit)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        # Nested serializers are bound to a parent before their fields are built
+        parent = getattr(self, 'parent', None)
+        if isinstance(parent, serializers.ListSerializer):
+            parent = getattr(parent, 'parent', None)
+        if parent is not None:
+            return fields
+        wanted, omit = requested_fields(self.context.get('request'))
+        keep = (set(fields) & wanted if wanted else set(fields)) - omit
+        return {name: field for name, field in fields.items() if name in keep}
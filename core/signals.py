@@ -0,0 +1,61 @@
+# core/signals.py
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from .cache import bump_branch
+from .models import Branch, Group, Lesson
+
+
+def _own_branch(instance):
+    return instance.branch_id
+
+
+def _lesson_branch(instance):
+    return Lesson.objects.filter(pk=instance.lesson_id).values_list('branch_id', flat=True).first()
+
+
+def _homework_branch(instance):
+    return Group.objects.filter(pk=instance.group_id).values_list('branch_id', flat=True).first()
+
+
+def _submission_branch(instance):
+    return Group.objects.filter(homework__id=instance.homework_id).values_list('branch_id', flat=True).first()
+
+
+# Models feeding the cached dashboard payloads, with how to find the branch they belong to.
+# Senders are lazy "app_label.Model" references so core does not import the other apps.
+DASHBOARD_SOURCES = {
+    'core.Student': _own_branch,
+    'core.Teacher': _own_branch,
+    'core.Group': _own_branch,
+    'core.Attendance': _lesson_branch,
+    'finance.FinanceReport': _own_branch,
+    'manager_dashboard.NotificationAlert': _own_branch,
+    'teacher_dashboard.Homework': _homework_branch,
+    'teacher_dashboard.HomeworkSubmission': _submission_branch,
+}
+
+
+def _receiver_for(branch_of):
+    def invalidate_dashboards(sender, instance, **kwargs):
+        bump_branch(branch_of(instance))
+    return invalidate_dashboards
+
+
+for sender, branch_of in DASHBOARD_SOURCES.items():
+    receiver = _receiver_for(branch_of)
+    post_save.connect(receiver, sender=sender, weak=False, dispatch_uid=f'dashboard-cache-save:{sender}')
+    post_delete.connect(receiver, sender=sender, weak=False, dispatch_uid=f'dashboard-cache-delete:{sender}')
+
+
+def invalidate_branch(sender, instance, **kwargs):
+    bump_branch(instance.id, instance.organization_id)
+
+
+def invalidate_group_students(sender, instance, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_branch(instance.branch_id)
+
+
+post_save.connect(invalidate_branch, sender=Branch, dispatch_uid='dashboard-cache-save:core.Branch')
+post_delete.connect(invalidate_branch, sender=Branch, dispatch_uid='dashboard-cache-delete:core.Branch')
+m2m_changed.connect(invalidate_group_students, sender=Group.students.through,
+                    dispatch_uid='dashboard-cache-group-students')
@@ -0,0 +1,394 @@
+from django.apps import apps
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+
+from datetime import timedelta
+from django.db.models import Sum
+from django.utils import timezone
+
+from admin_dashboard.views import StudentManagementViewSet
+from attendance.serializers import AttendanceDetailSerializer
+from attendance.views import AttendanceViewSet
+from auth_system.views import UserViewSet
+from exams.models import Exam, ExamResult
+from exams.views import ExamResultViewSet, ExamViewSet
+from finance.models import IncomeLead, StudentPayment
+from finance.views import StudentPaymentViewSet
+from manager_dashboard.views import ManagerDashboardViewSet
+from teacher_dashboard.models import Homework, HomeworkSubmission
+from teacher_dashboard.views import HomeworkSubmissionViewSet, HomeworkViewSet, TeacherPortfolioViewSet
+from .aggregates import count_by
+from .benchmark import INDEXES, ROLES, Runner, discover_endpoints, explain_plans, hot_queries, seed
+from .fetch import FetchPlan, sparse_plan
+from .models import Organization, Branch, CustomUser, Teacher, Student, Group, Lesson, Attendance, Subject
+
+class VersionedResponseCacheTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.organization = Organization.objects.create(name='Org', address='-', phone='1', email='org@example.com')
+        cls.branch = Branch.objects.create(organization=cls.organization, name='Main', address='-', phone='1')
+        cls.other_branch = Branch.objects.create(organization=cls.organization, name='Second', address='-', phone='1')
+        cls.director = CustomUser.objects.create(
+            username='director', role='director', organization=cls.organization, branch=cls.branch,
+        )
+        cls.manager = CustomUser.objects.create(username='manager', role='manager', branch=cls.branch)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.director)
+
+    def add_student(self, branch):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Student.objects.create(user=CustomUser.objects.create(username=f'student-{branch.name}'), branch=branch)
+
+    def manager_overview(self):
+        request = APIRequestFactory().get('/api/manager/dashboard/overview/')
+        force_authenticate(request, self.manager)
+        return ManagerDashboardViewSet.as_view({'get': 'overview'})(request).data
+
+    def test_served_from_cache_until_branch_data_changes(self):
+        self.assertEqual(self.client.get('/api/director/dashboard/').data['total_students'], 0)
+        with self.assertNumQueries(0):
+            self.client.get('/api/director/dashboard/')
+
+        self.add_student(self.other_branch)
+
+        self.assertEqual(self.client.get('/api/director/dashboard/').data['total_students'], 1)
+
+    def test_other_branch_changes_keep_branch_payloads(self):
+        self.assertEqual(self.manager_overview()['total_students'], 0)
+        self.add_student(self.other_branch)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.manager_overview()['total_students'], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Group.objects.create(branch=self.branch, name='A1')
+        self.assertEqual(self.manager_overview()['active_groups'], 1)
+
+    def test_query_params_are_part_of_the_key(self):
+        self.client.get('/api/statistics/student_statistics/')
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/statistics/student_statistics/', {'page': 2})
+        self.assertTrue(queries)
+
+
+class StatusBreakdownTestCase(TestCase):
+    """Status breakdown endpoints answer with a single conditional aggregate"""
+
+    @classmethod
+    def setUpTestData(cls):
+        organization = Organization.objects.create(name='Org', address='-', phone='1', email='org@example.com')
+        cls.branch = Branch.objects.create(organization=organization, name='Main', address='-', phone='1')
+        cls.manager = CustomUser.objects.create(
+            username='manager', role='manager', organization=organization, branch=cls.branch,
+        )
+        teacher = Teacher.objects.create(
+            user=CustomUser.objects.create(username='teacher'), branch=cls.branch, hourly_rate=10, group_rate=100,
+        )
+        group = Group.objects.create(branch=cls.branch, name='A1', teacher=teacher)
+        students = [
+            Student.objects.create(
+                user=CustomUser.objects.create(username=f'student{i}'), branch=cls.branch, status=student_status,
+                total_debt=debt,
+            )
+            for i, (student_status, debt) in enumerate([('active', 100), ('active', 50), ('graduated', 0)])
+        ]
+        lessons = [
+            Lesson.objects.create(group=group, teacher=teacher, branch=cls.branch, start_time=timezone.now(),
+                                  is_cancelled=cancelled)
+            for cancelled in (False, True)
+        ]
+        for student, attendance_status in zip(students, ['present', 'present', 'late']):
+            Attendance.objects.create(lesson=lessons[0], student=student, status=attendance_status)
+        for lead_status in ['new', 'enrolled', 'enrolled', 'rejected']:
+            IncomeLead.objects.create(branch=cls.branch, name='Lead', email='lead@example.com', phone='1',
+                                      source='website', status=lead_status)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+
+    def test_count_by(self):
+        result = count_by(Student.objects.all(), 'status', ['active', 'inactive'], total_debt=Sum('total_debt'))
+        self.assertEqual(result, {'active': 2, 'inactive': 0, 'total': 3, 'total_debt': 150})
+
+    def test_student_statistics(self):
+        with self.assertNumQueries(1):
+            data = self.client.get('/api/statistics/student_statistics/').data
+        self.assertEqual((data['total_students'], data['active'], data['graduated'], data['total_debt']), (3, 2, 1, 150))
+
+    def test_attendance_statistics(self):
+        with self.assertNumQueries(1):
+            self.client.get('/api/statistics/attendance_statistics/')
+
+    def test_conversion_stats(self):
+        with self.assertNumQueries(1):
+            data = self.client.get('/api/finance/leads/conversion_stats/').data
+        self.assertEqual((data['total_leads'], data['enrolled'], data['conversion_rate']), (4, 2, 50.0))
+
+    def test_daily_attendance(self):
+        with self.assertNumQueries(1):
+            data = self.client.get('/api/admin/attendance/daily_attendance/').data
+        self.assertEqual(data, {'present': 2, 'absent': 0, 'late': 1, 'total': 3})
+
+    def test_attendance_overview(self):
+        request = APIRequestFactory().get('/api/manager/dashboard/attendance_overview/')
+        force_authenticate(request, self.manager)
+        with self.assertNumQueries(1):
+            data = ManagerDashboardViewSet.as_view({'get': 'attendance_overview'})(request).data
+        self.assertEqual((data['total_lessons'], data['scheduled'], data['cancelled']), (2, 1, 1))
+        self.assertEqual(data['student_attendance'], [{'status': 'present', 'count': 2}, {'status': 'late', 'count': 1}])
+
+
+class BenchmarkTestCase(TestCase):
+    def test_seed_and_measure(self):
+        users, counts = seed(students=24, branches=1, lessons_per_group=2)
+        self.assertEqual(counts['core.Student'], 24)
+        self.assertEqual(set(users), set(ROLES))
+
+        endpoints = {endpoint.route: endpoint for endpoint in discover_endpoints()}
+        self.assertIn('api/director/dashboard/overview/', endpoints)
+        results = Runner(repeat=2).run(
+            [endpoints['api/statistics/student_statistics/'], endpoints['api/exams/{pk}/']],
+            {'director': users['director']},
+        )
+
+        self.assertEqual(results[0]['status'], 'skipped')
+        self.assertEqual((results[1]['status'], results[1]['queries']), (200, 1))
+        self.assertLessEqual(results[1]['p50_ms'], results[1]['p95_ms'])
+
+    def test_required_params_come_from_the_dataset_and_refusals_are_skipped(self):
+        users, _ = seed(students=24, branches=1, lessons_per_group=2)
+        endpoints = {endpoint.route: endpoint for endpoint in discover_endpoints()}
+        results = Runner(repeat=1).run(
+            [endpoints['api/exams/results/statistics/'], endpoints['api/manager/dashboard/overview/']],
+            {'superadmin': users['superadmin']},
+        )
+        by_route = {result['route']: result for result in results}
+        self.assertEqual(by_route['api/exams/results/statistics/']['status'], 200)
+        overview = by_route['api/manager/dashboard/overview/']
+        self.assertEqual((overview['status'], overview['error']), ('skipped', '400: Branch not found'))
+        self.assertNotIn('p50_ms', overview)
+
+    def test_explain_plans_before_and_after_the_indexes(self):
+        users, _ = seed(students=24, branches=1, lessons_per_group=2)
+        with connection.cursor() as cursor:
+            # Settle the seed's deferred foreign key checks so the indexes can be rebuilt
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+        plans = explain_plans(hot_queries(users))
+        self.assertEqual(set(plans), set(hot_queries(users)))
+        names = [name for _, name in INDEXES]
+        for plan in plans.values():
+            self.assertTrue(plan['before'] and plan['after'])
+            self.assertFalse([name for name in names if name in plan['before']], plan['before'])
+
+        # Which index the planner picks depends on the data; check the rebuilt indexes instead
+        with connection.cursor() as cursor:
+            for label, name in INDEXES:
+                model = apps.get_model(label)
+                index = next(index for index in model._meta.indexes if index.name == name)
+                columns = [model._meta.get_field(field.lstrip('-')).column for field in index.fields]
+                constraint = connection.introspection.get_constraints(cursor, model._meta.db_table).get(name)
+                self.assertIsNotNone(constraint, name)
+                self.assertEqual((constraint['index'], constraint['columns']), (True, columns), name)
+
+class FetchPlanTestCase(TestCase):
+    """List endpoints cost the same number of queries whatever the page holds"""
+
+    @classmethod
+    def setUpTestData(cls):
+        organization = Organization.objects.create(name='Org', address='-', phone='1', email='org@example.com')
+        cls.branch = Branch.objects.create(organization=organization, name='Main', address='-', phone='1')
+        cls.superadmin = CustomUser.objects.create(username='root', role='superadmin', organization=organization)
+        cls.teacher_user = CustomUser.objects.create(username='teacher', role='teacher', branch=cls.branch)
+        cls.teacher = Teacher.objects.create(user=cls.teacher_user, branch=cls.branch, hourly_rate=10, group_rate=100)
+        cls.subject = Subject.objects.create(organization=organization, name='Maths')
+        cls.group = Group.objects.create(branch=cls.branch, name='A1', teacher=cls.teacher, subject=cls.subject)
+
+    def add_rows(self, count):
+        for _ in range(count):
+            index = CustomUser.objects.count()
+            student = Student.objects.create(user=CustomUser.objects.create(username=f'student{index}'), branch=self.branch)
+            self.group.students.add(student)
+            lesson = Lesson.objects.create(group=self.group, teacher=self.teacher, branch=self.branch, start_time=timezone.now())
+            Attendance.objects.create(lesson=lesson, student=student, status='present')
+            StudentPayment.objects.create(
+                student=student, branch=self.branch, amount=10, payment_method='cash',
+                receipt_number=f'R{index}', approved_by=self.superadmin,
+            )
+            exam = Exam.objects.create(
+                group=self.group, title=f'Exam {index}', subject='Maths', exam_date=timezone.now(),
+                total_questions=10, created_by=self.superadmin,
+            )
+            ExamResult.objects.create(exam=exam, student=student, score=70, grade='B')
+            homework = Homework.objects.create(
+                teacher=self.teacher, group=self.group, title='Homework', description='-', due_date=timezone.now(),
+            )
+            HomeworkSubmission.objects.create(homework=homework, student=student, grade=8)
+
+    def list(self, viewset, user, **params):
+        request = APIRequestFactory().get('/', params)
+        force_authenticate(request, user=user)
+        with CaptureQueriesContext(connection) as queries:
+            response = viewset.as_view({'get': 'list'})(request)
+            response.render()
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data['results'], queries
+
+    def list_queries(self, viewset, user, **params):
+        return len(self.list(viewset, user, **params)[1])
+
+    def test_list_queries_do_not_grow_with_the_page(self):
+        cases = [
+            (AttendanceViewSet, self.superadmin),
+            (StudentPaymentViewSet, self.superadmin),
+            (ExamViewSet, self.superadmin),
+            (ExamResultViewSet, self.superadmin),
+            (HomeworkViewSet, self.teacher_user),
+            (HomeworkSubmissionViewSet, self.teacher_user),
+            (StudentManagementViewSet, self.superadmin),
+            (UserViewSet, self.superadmin),
+        ]
+        self.add_rows(2)
+        before = {viewset: self.list_queries(viewset, user) for viewset, user in cases}
+        self.add_rows(5)
+        after = {viewset: self.list_queries(viewset, user) for viewset, user in cases}
+        self.assertEqual(after, before)
+
+    def test_teachers_and_students_see_their_own_rows(self):
+        self.add_rows(3)
+        student_user = Student.objects.first().user
+        student_user.role = 'student'
+        student_user.save()
+        for viewset, user, count in [
+            (AttendanceViewSet, self.teacher_user, 3),
+            (AttendanceViewSet, student_user, 1),
+            (ExamViewSet, self.teacher_user, 3),
+            (ExamViewSet, student_user, 3),
+            (ExamResultViewSet, self.teacher_user, 3),
+            (TeacherPortfolioViewSet, self.teacher_user, 0),
+        ]:
+            rows, _ = self.list(viewset, user)
+            self.assertEqual(len(rows), count, viewset.__name__)
+
+    def test_plan_applies_joins_prefetches_and_annotations(self):
+        plan = FetchPlan(select_related=['user'], prefetch_related=['groups'], annotate={'paid': Sum('payment_records__amount')})
+        queryset = plan.apply(Student.objects.all())
+        self.assertEqual(queryset.query.select_related, {'user': {}})
+        self.assertEqual(queryset._prefetch_related_lookups, ('groups',))
+        self.assertIn('paid', queryset.query.annotations)
+
+    def test_fields_and_omit_prune_the_payload(self):
+        self.add_rows(2)
+        rows, _ = self.list(AttendanceViewSet, self.superadmin, fields='id,status,student_name')
+        self.assertEqual({tuple(sorted(row)) for row in rows}, {('id', 'status', 'student_name')})
+        rows, _ = self.list(AttendanceViewSet, self.superadmin, omit='lesson_info,comments')
+        self.assertNotIn('lesson_info', rows[0])
+        self.assertIn('teacher_comments', rows[0])
+
+    def test_sparse_lists_load_only_the_requested_columns(self):
+        self.add_rows(2)
+        _, queries = self.list(StudentPaymentViewSet, self.superadmin, fields='id,amount')
+        select = next(query['sql'] for query in queries if 'FROM "finance_studentpayment"' in query['sql']
+                      and 'COUNT(' not in query['sql'])
+        self.assertIn('"amount"', select)
+        self.assertNotIn('"receipt_number"', select)
+        self.assertNotIn('JOIN', select)
+
+    def test_sparse_plan_follows_sources(self):
+        fields = AttendanceDetailSerializer().fields
+        plan = sparse_plan(Attendance, {name: fields[name] for name in ['id', 'status', 'student_name']})
+        self.assertEqual(plan.select_related, ('student__user',))
+        self.assertEqual(set(plan.only), {'id', 'status', 'student'})
+        # A method field without a plan may read any column
+        plan = sparse_plan(Attendance, {name: fields[name] for name in ['id', 'lesson_info']})
+        self.assertIsNone(plan.only)
+        plan = sparse_plan(Attendance, {name: fields[name] for name in ['id', 'lesson_info']}, AttendanceViewSet.field_plans)
+        self.assertEqual(plan.select_related, ('lesson__group__subject', 'lesson__teacher__user'))
+
+    def test_sparse_list_queries_do_not_grow_with_the_page(self):
+        cases = [
+            (AttendanceViewSet, self.superadmin, {'fields': 'id,student_name,lesson_info'}),
+            (StudentPaymentViewSet, self.superadmin, {'omit': 'approved_by_name'}),
+            (ExamViewSet, self.superadmin, {'fields': 'id,title,results_count'}),
+            (HomeworkViewSet, self.teacher_user, {'fields': 'id,submitted_count,graded_count'}),
+            (StudentManagementViewSet, self.superadmin, {'fields': 'id,user_details,groups'}),
+        ]
+        self.add_rows(2)
+        before = [self.list_queries(viewset, user, **params) for viewset, user, params in cases]
+        self.add_rows(5)
+        after = [self.list_queries(viewset, user, **params) for viewset, user, params in cases]
+        self.assertEqual(after, before)
+
+
+class KeysetPaginationTestCase(TestCase):
+    """High-volume lists page with a cursor; ``?page=`` keeps page numbers"""
+
+    @classmethod
+    def setUpTestData(cls):
+        organization = Organization.objects.create(name='Org', address='-', phone='1', email='org@example.com')
+        branch = Branch.objects.create(organization=organization, name='Main', address='-', phone='1')
+        cls.superadmin = CustomUser.objects.create(username='root', role='superadmin', organization=organization)
+        teacher = Teacher.objects.create(
+            user=CustomUser.objects.create(username='teacher', role='teacher'), branch=branch, hourly_rate=10, group_rate=100,
+        )
+        group = Group.objects.create(branch=branch, name='A1', teacher=teacher)
+        lesson = Lesson.objects.create(group=group, teacher=teacher, branch=branch, start_time=timezone.now())
+        now = timezone.now()
+        for index in range(45):
+            student = Student.objects.create(user=CustomUser.objects.create(username=f'student{index}'), branch=branch)
+            attendance = Attendance.objects.create(lesson=lesson, student=student, status='present')
+            Attendance.objects.filter(pk=attendance.pk).update(submitted_at=now - timedelta(minutes=index))
+
+    def get(self, url='/', **params):
+        request = APIRequestFactory().get(url, params)
+        force_authenticate(request, user=self.superadmin)
+        with CaptureQueriesContext(connection) as queries:
+            response = AttendanceViewSet.as_view({'get': 'list'})(request)
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data, queries
+
+    def walk(self):
+        rows, url, params = [], '/', {'fields': 'id,submitted_at'}
+        while url:
+            page, queries = self.get(url, **params)
+            rows.extend(page['results'])
+            self.assertNotIn('count', page)
+            for query in queries:
+                self.assertNotIn('COUNT(', query['sql'])
+            yield queries[-1]['sql']
+            url, params = page['next'], {}
+        self.assertEqual(len(rows), 45)
+        self.assertEqual(len({row['id'] for row in rows}), 45)
+        keys = [(row['submitted_at'], str(row['id'])) for row in rows]
+        self.assertEqual(keys, sorted(keys, reverse=True))
+
+    def test_cursor_walks_every_row_once_without_offset_or_count(self):
+        for sql in self.walk():
+            self.assertNotIn('OFFSET', sql)
+        self.assertIn('WHERE "core_attendance"."submitted_at" <', sql)
+
+    def test_timestamp_ties_are_neither_skipped_nor_repeated(self):
+        # Three rows sharing a timestamp across the boundary of the first page
+        tied = list(Attendance.objects.order_by('-submitted_at')[18:21])
+        Attendance.objects.filter(pk__in=[row.pk for row in tied]).update(submitted_at=tied[0].submitted_at)
+        list(self.walk())
+
+    def test_sparse_rows_keep_the_cursor_columns(self):
+        first, _ = self.get(fields='id,status')
+        self.assertEqual(set(first['results'][0]), {'id', 'status'})
+        _, queries = self.get(first['next'])
+        # Rows page and the one past it; no deferred loads for the cursor
+        self.assertEqual(len(queries), 1)
+
+    def test_page_numbers_on_opt_in(self):
+        page, _ = self.get(page=3)
+        self.assertEqual(page['count'], 45)
+        self.assertEqual(len(page['results']), 5)
+        self.assertIsNone(page['next'])
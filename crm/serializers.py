@@ -1,8 +1,9 @@
 from rest_framework import serializers
 from core.models import Group, Course, Subject, Room, Teacher, RoomSchedule  # Import RoomSchedule model
+from core.serializers import SparseFieldsMixin
 
 
-class CourseSerializer(serializers.ModelSerializer):
+class CourseSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     organization_name = serializers.CharField(source='organization.name', read_only=True)
 
     class Meta:
@@ -11,14 +12,14 @@ class CourseSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
 
-class SubjectSerializer(serializers.ModelSerializer):
+class SubjectSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Subject
         fields = ['id', 'organization', 'name', 'description', 'is_active', 'created_at']
         read_only_fields = ['id', 'created_at']
 
 
-class RoomSerializer(serializers.ModelSerializer):
+class RoomSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     branch_name = serializers.CharField(source='branch.name', read_only=True)
 
     class Meta:
@@ -28,7 +29,7 @@ class RoomSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
 
-class RoomScheduleSerializer(serializers.ModelSerializer):
+class RoomScheduleSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     room_name = serializers.CharField(source='room.name', read_only=True)
     group_name = serializers.CharField(source='group.name', read_only=True)
 
@@ -53,16 +54,18 @@ class RoomScheduleSerializer(serializers.ModelSerializer):
 
 
 class TeacherSerializer(serializers.ModelSerializer):
+    user_full_name = serializers.CharField(source='user.full_name', read_only=True)
+
     class Meta:
         model = Teacher
         fields = ['id', 'user', 'user_full_name']  # Adjust fields as needed
 
 
 # update GroupSerializer to use Subject relation
-class GroupSerializer(serializers.ModelSerializer):
+class GroupSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     branch_name = serializers.CharField(source='branch.name', read_only=True)
     teacher_name = serializers.CharField(source='teacher.user.full_name', read_only=True)
-    teachers = TeacherSerializer(source='teacher_set', many=True, read_only=True)  # List of all teachers
+    teachers = serializers.SerializerMethodField()  # List of all teachers
     student_count = serializers.SerializerMethodField()
     course = serializers.PrimaryKeyRelatedField(queryset=Course.objects.all(), allow_null=True, required=False)
     course_detail = CourseSerializer(source='course', read_only=True)
@@ -90,10 +93,13 @@ class GroupSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'created_at', 'student_count']
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
+    def get_teachers(self, obj):
+        # A group has a single teacher; kept as a list for existing clients
+        return [TeacherSerializer(obj.teacher).data] if obj.teacher else []
 
     def get_student_count(self, obj):
+        if hasattr(obj, 'student_count'):
+            return obj.student_count
         return obj.students.count()
 
     def get_room_detail(self, obj):
@@ -1,4 +1,10 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from core.models import Organization, Branch, CustomUser, Teacher, Student, Group, Course, Subject, Room
+from .views import GroupViewSet
 
 
 class CourseTestCase(TestCase):
@@ -8,4 +14,48 @@ class CourseTestCase(TestCase):
 
 class GroupTestCase(TestCase):
     """Test cases for group management"""
-    pass
+
+    @classmethod
+    def setUpTestData(cls):
+        organization = Organization.objects.create(name='Org', address='-', phone='1', email='org@example.com')
+        cls.branch = Branch.objects.create(organization=organization, name='Main', address='-', phone='1')
+        cls.manager = CustomUser.objects.create(username='manager', role='manager', branch=cls.branch)
+        teacher = Teacher.objects.create(
+            user=CustomUser.objects.create(username='teacher', first_name='Ali', last_name='Valiyev', role='teacher'),
+            branch=cls.branch, hourly_rate=10, group_rate=100,
+        )
+        course = Course.objects.create(organization=organization, name='English', price=100)
+        subject = Subject.objects.create(organization=organization, name='Grammar')
+        room = Room.objects.create(organization=organization, branch=cls.branch, name='101', capacity=12)
+        for index in range(3):
+            group = Group.objects.create(
+                branch=cls.branch, name=f'G{index}', teacher=teacher, course=course, subject=subject, room=room,
+            )
+            for number in range(index + 1):
+                group.students.add(Student.objects.create(
+                    user=CustomUser.objects.create(username=f'student{index}-{number}'), branch=cls.branch,
+                ))
+
+    def get(self, **params):
+        request = APIRequestFactory().get('/api/groups/', params)
+        force_authenticate(request, user=self.manager)
+        with CaptureQueriesContext(connection) as queries:
+            response = GroupViewSet.as_view({'get': 'list'})(request)
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data['results'], len(queries)
+
+    def test_list_reads_counts_and_relations_from_the_base_query(self):
+        groups, queries = self.get(ordering='name')
+        # Page count, groups with their relations and counts, prefetched students
+        self.assertEqual(queries, 3)
+        by_name = {group['name']: group for group in groups}
+        self.assertEqual(by_name['G2']['student_count'], 3)
+        self.assertEqual(len(by_name['G2']['students']), 3)
+        self.assertEqual(by_name['G0']['teachers'][0]['user_full_name'], 'Ali Valiyev')
+        self.assertEqual(by_name['G0']['room_detail']['name'], '101')
+        self.assertEqual(by_name['G0']['course_detail']['name'], 'English')
+
+    def test_fields_projection(self):
+        groups, queries = self.get(fields='id,name')
+        self.assertEqual(queries, 2)
+        self.assertEqual({tuple(group) for group in groups}, {('id', 'name')})
@@ -3,6 +3,9 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
 from rest_framework import serializers as drf_serializers
+from django.db.models import OuterRef, Prefetch
+from core.aggregates import subquery_count
+from core.fetch import FetchPlan, FetchPlanMixin
 from core.models import Group, Course, Subject, Student, Room, RoomSchedule
 from .serializers import GroupSerializer, CourseSerializer, SubjectSerializer
 from rest_framework import serializers as drf_serializers
@@ -10,7 +13,7 @@ from .serializers import RoomSerializer, RoomScheduleSerializer
 
 
 
-class GroupViewSet(viewsets.ModelViewSet):
+class GroupViewSet(FetchPlanMixin, viewsets.ModelViewSet):
     """
     Group Management
     
@@ -28,24 +31,40 @@ class GroupViewSet(viewsets.ModelViewSet):
     queryset = Group.objects.all()
     serializer_class = GroupSerializer
     permission_classes = [AllowAny]
+    # Method fields, counts and nested serializers that read further relations
+    field_plans = {
+        'teachers': FetchPlan(select_related=['teacher__user']),
+        'course_detail': FetchPlan(select_related=['course__organization']),
+        'room_detail': FetchPlan(select_related=['room']),
+        'student_count': FetchPlan(annotate={
+            'student_count': subquery_count(Group.students.through.objects.filter(group=OuterRef('pk'))),
+        }),
+    }
+    fetch_plan = FetchPlan.combine([
+        FetchPlan(
+            select_related=['branch', 'teacher__user', 'subject'],
+            prefetch_related=[Prefetch('students', queryset=Student.objects.only('id'))],
+        ),
+        *field_plans.values(),
+    ])
     
     def get_queryset(self):
         """Filter groups by organization and branch"""
         user = self.request.user
         
         if not user or not user.is_authenticated:
-            return Group.objects.all()
+            return self.fetch(Group.objects.all())
         
         if hasattr(user, 'role') and user.role == 'superadmin':
-            return Group.objects.all()
+            return self.fetch(Group.objects.all())
         
         if hasattr(user, 'branch') and user.branch:
-            return Group.objects.filter(branch=user.branch)
+            return self.fetch(Group.objects.filter(branch=user.branch))
         
         if hasattr(user, 'organization') and user.organization:
-            return Group.objects.filter(organization=user.organization)
+            return self.fetch(Group.objects.filter(branch__organization=user.organization))
         
-        return Group.objects.all()
+        return self.fetch(Group.objects.all())
 
     def perform_create(self, serializer):
         # If authenticated and user has branch, assign it automatically
@@ -83,7 +102,8 @@ class GroupViewSet(viewsets.ModelViewSet):
 
         group.students.add(student)
         group.save()
-        serializer = self.get_serializer(group)
+        # Re-read so the annotated student count includes the new student
+        serializer = self.get_serializer(self.get_object())
         return Response({'message': 'student added', 'data': serializer.data}, status=status.HTTP_200_OK)
 
     @action(detail=True, methods=['post'])
@@ -139,21 +159,22 @@ class GroupViewSet(viewsets.ModelViewSet):
 
 
 
-class CourseViewSet(viewsets.ModelViewSet):
+class CourseViewSet(FetchPlanMixin, viewsets.ModelViewSet):
     """Simple Course API"""
     queryset = Course.objects.all()
     serializer_class = CourseSerializer
+    fetch_plan = FetchPlan(select_related=['organization'])
     permission_classes = [AllowAny]
 
     def get_queryset(self):
         user = self.request.user
         if not user or not user.is_authenticated:
-            return Course.objects.all()
+            return self.fetch(Course.objects.all())
         if hasattr(user, 'role') and user.role == 'superadmin':
-            return Course.objects.all()
+            return self.fetch(Course.objects.all())
         if hasattr(user, 'organization') and user.organization:
-            return Course.objects.filter(organization=user.organization)
-        return Course.objects.all()
+            return self.fetch(Course.objects.filter(organization=user.organization))
+        return self.fetch(Course.objects.all())
 
     def perform_create(self, serializer):
         if self.request.user.is_authenticated and hasattr(self.request.user, 'organization') and self.request.user.organization:
@@ -162,7 +183,7 @@ class CourseViewSet(viewsets.ModelViewSet):
             serializer.save()
 
 
-class SubjectViewSet(viewsets.ModelViewSet):
+class SubjectViewSet(FetchPlanMixin, viewsets.ModelViewSet):
     """Simple Subject API"""
     queryset = Subject.objects.all()
     serializer_class = SubjectSerializer
@@ -171,12 +192,12 @@ class SubjectViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         user = self.request.user
         if not user or not user.is_authenticated:
-            return Subject.objects.all()
+            return self.fetch(Subject.objects.all())
         if hasattr(user, 'role') and user.role == 'superadmin':
-            return Subject.objects.all()
+            return self.fetch(Subject.objects.all())
         if hasattr(user, 'organization') and user.organization:
-            return Subject.objects.filter(organization=user.organization)
-        return Subject.objects.all()
+            return self.fetch(Subject.objects.filter(organization=user.organization))
+        return self.fetch(Subject.objects.all())
 
     def perform_create(self, serializer):
         if self.request.user.is_authenticated and hasattr(self.request.user, 'organization') and self.request.user.organization:
@@ -186,21 +207,22 @@ class SubjectViewSet(viewsets.ModelViewSet):
     
 
 
-class RoomViewSet(viewsets.ModelViewSet):
+class RoomViewSet(FetchPlanMixin, viewsets.ModelViewSet):
     """Room API: create rooms and list rooms. For scheduling use RoomSchedule endpoints."""
     queryset = Room.objects.all()
     serializer_class = RoomSerializer
+    fetch_plan = FetchPlan(select_related=['branch'])
     permission_classes = [AllowAny]
 
     def get_queryset(self):
         user = self.request.user
         if not user or not user.is_authenticated:
-            return Room.objects.all()
+            return self.fetch(Room.objects.all())
         if hasattr(user, 'role') and user.role == 'superadmin':
-            return Room.objects.all()
+            return self.fetch(Room.objects.all())
         if hasattr(user, 'organization') and user.organization:
-            return Room.objects.filter(organization=user.organization)
-        return Room.objects.all()
+            return self.fetch(Room.objects.filter(organization=user.organization))
+        return self.fetch(Room.objects.all())
 
     def perform_create(self, serializer):
         if self.request.user.is_authenticated and hasattr(self.request.user, 'organization') and self.request.user.organization:
@@ -209,17 +231,18 @@ class RoomViewSet(viewsets.ModelViewSet):
             serializer.save()
 
 
-class RoomScheduleViewSet(viewsets.ModelViewSet):
+class RoomScheduleViewSet(FetchPlanMixin, viewsets.ModelViewSet):
     """Room schedule API: assign room schedules to groups. Payload: {room: id, group: id, day: 'mon', start_time: '10:00', end_time: '11:30'}"""
     queryset = RoomSchedule.objects.all()
     serializer_class = RoomScheduleSerializer
+    fetch_plan = FetchPlan(select_related=['room', 'group'])
     permission_classes = [AllowAny]
 
     def get_queryset(self):
         user = self.request.user
         if not user or not user.is_authenticated:
             return RoomSchedule.objects.none()
-        return RoomSchedule.objects.all()
+        return self.fetch(RoomSchedule.objects.all())
 
     def perform_create(self, serializer):
         # You may want to add validation for overlapping schedules here
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from director_dashboard.scoring import refresh_scores
+
+
+class Command(BaseCommand):
+    help = ('Recompute at-risk scores for students with new or updated attendance, exam results, '
+            'homework submissions, payments or debt since the last run, and for students whose lessons, '
+            'exams or homework crossed the scoring window. Safe to schedule every few minutes.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Rescore every student')
+        parser.add_argument('--days', type=int, default=30, help='Length of the scoring window')
+        parser.add_argument('--threshold', type=int, default=5, help='Score above which a student is at risk')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Students scored per query')
+
+    def handle(self, *args, **options):
+        scored = refresh_scores(
+            full=options['full'], days=options['days'], threshold=options['threshold'],
+            batch_size=options['batch_size'],
+        )
+        if scored is None:
+            self.stdout.write(self.style.WARNING('Another refresh is running, skipped'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Scored {scored} students'))
@@ -0,0 +1,42 @@
+from django.db import models
+from core.models import Branch, Student
+import uuid
+
+class StudentRiskScore(models.Model):
+    RISK_LEVEL_CHOICES = [
+        ('low', 'Low'),
+        ('medium', 'Medium'),
+        ('high', 'High'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    student = models.OneToOneField(Student, on_delete=models.CASCADE, related_name='risk')
+    branch = models.ForeignKey(Branch, on_delete=models.CASCADE, related_name='student_risk_scores')
+    score = models.FloatField(default=0)
+    risk_level = models.CharField(max_length=10, choices=RISK_LEVEL_CHOICES, default='low')
+    absences = models.PositiveIntegerField(default=0)
+    absence_streak = models.PositiveIntegerField(default=0)
+    has_debt = models.BooleanField(default=False)
+    declining_grades = models.BooleanField(default=False)
+    failing_exams = models.BooleanField(default=False)
+    missed_homework = models.PositiveIntegerField(default=0)
+    computed_at = models.DateTimeField()
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['branch', '-score'], name='risk_branch_score_idx'),
+            models.Index(fields=['-score'], name='risk_score_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.student} - {self.score} ({self.risk_level})"
+
+class RiskScoreWatermark(models.Model):
+    """Single row per scoring job; ``last_run_at`` is the start time of the last finished run"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    name = models.CharField(max_length=50, unique=True)
+    last_run_at = models.DateTimeField(null=True, blank=True)
+    students_scored = models.PositiveIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.name} @ {self.last_run_at}"
@@ -0,0 +1,135 @@
+# director_dashboard/risk.py
+from datetime import timedelta
+from django.db.models import (
+    Avg, BooleanField, Case, Count, Exists, ExpressionWrapper, F, FloatField, OuterRef, Q,
+    Subquery, Value, When,
+)
+from django.db.models.functions import Cast, Coalesce
+from django.utils import timezone
+from core.aggregates import subquery_count
+from core.models import Attendance
+from exams.models import ExamResult
+from teacher_dashboard.models import Homework, HomeworkSubmission
+
+EXTRAS = ('streak', 'debt', 'homework', 'exams', 'missed_homework')
+ORDERINGS = ('risk_score', '-risk_score', 'absences', '-absences', 'streak', '-streak')
+
+# Weights of the optional signals in the risk score; absences count 1 each
+STREAK_WEIGHT = 2
+DEBT_WEIGHT = 3
+DECLINING_WEIGHT = 2
+LOW_EXAMS_WEIGHT = 2
+MISSED_HOMEWORK_WEIGHT = 1
+# Homework average drop (0-10 scale) between the two halves of the window that counts as declining
+DECLINE_THRESHOLD = 1
+
+
+def parse_extras(value):
+    requested = {item.strip() for item in (value or '').split(',') if item.strip()}
+    if 'all' in requested:
+        return EXTRAS
+    return tuple(extra for extra in EXTRAS if extra in requested)
+
+
+def _absence_streak(start):
+    """Absences since the student's last non-absent lesson in the window"""
+    last_attended = Attendance.objects.filter(
+        student=OuterRef(OuterRef('pk')), lesson__start_time__gte=start,
+    ).exclude(status='absent').order_by('-lesson__start_time').values('lesson__start_time')[:1]
+    return subquery_count(Attendance.objects.filter(
+        student=OuterRef('pk'), status='absent',
+        lesson__start_time__gt=Coalesce(Subquery(last_attended), Value(start)),
+    ))
+
+
+def _exam_counts(start):
+    """Exams of the window the student failed and passed"""
+    results = ExamResult.objects.filter(student=OuterRef('pk'), exam__exam_date__gte=start)
+    return {
+        'exams_failed': subquery_count(results.filter(score__lt=F('exam__pass_score'))),
+        'exams_passed': subquery_count(results.filter(score__gte=F('exam__pass_score'))),
+    }
+
+
+def _missed_homework(start, now):
+    """Homework of the student's groups that fell due in the window without a submission"""
+    return subquery_count(Homework.objects.filter(
+        group__students=OuterRef('pk'), due_date__gte=start, due_date__lt=now,
+    ).exclude(
+        Exists(HomeworkSubmission.objects.filter(homework=OuterRef('pk'), student=OuterRef(OuterRef('pk')))),
+    ))
+
+
+def score_students(students, days=30, threshold=5, extras=()):
+    """
+    Annotate ``students`` with ``absences`` in the last ``days`` days, the signals named in
+    ``extras`` and the resulting ``risk_score``/``risk_level``, all in a single query.
+    ``risk_level`` is high above twice ``threshold``, medium above it and low otherwise.
+    """
+    now = timezone.now()
+    start = now - timedelta(days=days)
+    midpoint = now - timedelta(days=days / 2)
+    in_window = Q(attendances__lesson__start_time__gte=start)
+
+    queryset = students.annotate(
+        absences=Count('attendances', filter=in_window & Q(attendances__status='absent')),
+    )
+    score = F('absences')
+
+    if 'streak' in extras:
+        queryset = queryset.annotate(streak=_absence_streak(start))
+        score = score + F('streak') * STREAK_WEIGHT
+    if 'debt' in extras:
+        queryset = queryset.annotate(
+            has_debt=ExpressionWrapper(Q(total_debt__gt=0), output_field=BooleanField()),
+        )
+        score = score + Case(When(total_debt__gt=0, then=Value(DEBT_WEIGHT)), default=Value(0))
+    if 'homework' in extras:
+        graded = in_window & Q(attendances__homework_grade__isnull=False)
+        declining = Q(recent_grade__lte=F('earlier_grade') - DECLINE_THRESHOLD)
+        queryset = queryset.annotate(
+            earlier_grade=Avg('attendances__homework_grade', filter=graded & Q(attendances__lesson__start_time__lt=midpoint)),
+            recent_grade=Avg('attendances__homework_grade', filter=graded & Q(attendances__lesson__start_time__gte=midpoint)),
+        ).annotate(declining_grades=ExpressionWrapper(declining, output_field=BooleanField()))
+        score = score + Case(When(declining, then=Value(DECLINING_WEIGHT)), default=Value(0))
+    if 'exams' in extras:
+        failing = Q(exams_failed__gt=F('exams_passed'))
+        queryset = queryset.annotate(**_exam_counts(start)).annotate(
+            failing_exams=ExpressionWrapper(failing, output_field=BooleanField()),
+        )
+        score = score + Case(When(failing, then=Value(LOW_EXAMS_WEIGHT)), default=Value(0))
+    if 'missed_homework' in extras:
+        queryset = queryset.annotate(missed_homework=_missed_homework(start, now))
+        score = score + F('missed_homework') * MISSED_HOMEWORK_WEIGHT
+
+    return queryset.annotate(
+        risk_score=Cast(score, FloatField()),
+    ).annotate(
+        risk_level=Case(
+            When(risk_score__gt=threshold * 2, then=Value('high')),
+            When(risk_score__gt=threshold, then=Value('medium')),
+            default=Value('low'),
+        ),
+    )
+
+
+def at_risk_students(students, days=30, threshold=5, extras=(), ordering='-risk_score'):
+    """Students with more than ``threshold`` absences in the window, as scored rows"""
+    if ordering not in ORDERINGS or (ordering.lstrip('-') == 'streak' and 'streak' not in extras):
+        ordering = '-risk_score'
+
+    fields = ['id', 'user__first_name', 'user__last_name', 'absences', 'risk_score', 'risk_level']
+    if 'streak' in extras:
+        fields.append('streak')
+    if 'debt' in extras:
+        fields += ['has_debt', 'total_debt']
+    if 'homework' in extras:
+        fields += ['earlier_grade', 'recent_grade', 'declining_grades']
+    if 'exams' in extras:
+        fields.append('failing_exams')
+    if 'missed_homework' in extras:
+        fields.append('missed_homework')
+
+    return score_students(students, days, threshold, extras).filter(
+        absences__gt=threshold,
+    ).order_by(ordering, 'id').values(*fields)
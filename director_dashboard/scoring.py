@@ -0,0 +1,134 @@
+# director_dashboard/scoring.py
+from datetime import timedelta
+from django.db import transaction
+from django.utils import timezone
+from core.models import Attendance, Student
+from exams.models import ExamResult
+from finance.models import StudentPayment
+from teacher_dashboard.models import Homework, HomeworkSubmission
+from .models import RiskScoreWatermark, StudentRiskScore
+from .risk import EXTRAS, score_students
+
+JOB_NAME = 'student_risk'
+# Rows committed by transactions that started before a run may carry older timestamps
+OVERLAP = timedelta(minutes=5)
+FIELDS = {
+    'score': 'risk_score',
+    'risk_level': 'risk_level',
+    'absences': 'absences',
+    'absence_streak': 'streak',
+    'has_debt': 'has_debt',
+    'declining_grades': 'declining_grades',
+    'failing_exams': 'failing_exams',
+    'missed_homework': 'missed_homework',
+}
+
+
+def changed_students(since):
+    """
+    Ids of students with new or updated attendance, exam results, homework submissions or
+    payments, or whose debt moved (discounts, enrollment and course prices change it too)
+    """
+    sources = [
+        Attendance.objects.filter(updated_at__gte=since).values_list('student_id', flat=True),
+        ExamResult.objects.filter(updated_at__gte=since).values_list('student_id', flat=True),
+        HomeworkSubmission.objects.filter(submitted_date__gte=since).values_list('student_id', flat=True),
+        StudentPayment.objects.filter(updated_at__gte=since).values_list('student_id', flat=True),
+        Student.objects.filter(debt_updated_at__gte=since).values_list('id', flat=True),
+        Student.objects.filter(risk__isnull=True).values_list('id', flat=True),
+    ]
+    return list(sources[0].union(*sources[1:]))
+
+
+def aged_students(since, now, days):
+    """
+    Ids of students whose scores moved with time alone between ``since`` and ``now``: a lesson
+    or exam left the ``days`` window, a lesson crossed its midpoint (the homework trend) or
+    homework fell due
+    """
+    def crossed(field, offset):
+        return {f'{field}__gte': since - offset, f'{field}__lt': now - offset}
+
+    window, half = timedelta(days=days), timedelta(days=days / 2)
+    sources = [
+        Attendance.objects.filter(**crossed('lesson__start_time', window)).values_list('student_id', flat=True),
+        Attendance.objects.filter(**crossed('lesson__start_time', half)).values_list('student_id', flat=True),
+        ExamResult.objects.filter(**crossed('exam__exam_date', window)).values_list('student_id', flat=True),
+        Homework.objects.filter(**crossed('due_date', timedelta(0))).values_list('group__students', flat=True),
+        Homework.objects.filter(**crossed('due_date', window)).values_list('group__students', flat=True),
+    ]
+    return [student_id for student_id in sources[0].union(*sources[1:]) if student_id is not None]
+
+
+def _write_scores(student_ids, computed_at, days, threshold, batch_size):
+    written = 0
+    for offset in range(0, len(student_ids), batch_size):
+        rows = score_students(
+            Student.objects.filter(id__in=student_ids[offset:offset + batch_size]), days, threshold, EXTRAS,
+        ).values('id', 'branch_id', *FIELDS.values())
+        scores = [
+            StudentRiskScore(
+                student_id=row['id'], branch_id=row['branch_id'], computed_at=computed_at,
+                **{field: row[column] or 0 for field, column in FIELDS.items()},
+            )
+            for row in rows
+        ]
+        StudentRiskScore.objects.bulk_create(
+            scores,
+            update_conflicts=True,
+            unique_fields=['student'],
+            update_fields=['branch', 'computed_at', *FIELDS],
+        )
+        written += len(scores)
+    return written
+
+
+def refresh_scores(full=False, days=30, threshold=5, batch_size=1000):
+    """
+    Recompute risk scores of students whose data changed since the last run (all of them
+    when ``full`` or on the first run). Returns the number of students scored, or None when
+    another run holds the watermark lock.
+    """
+    RiskScoreWatermark.objects.get_or_create(name=JOB_NAME)
+    with transaction.atomic():
+        watermark = RiskScoreWatermark.objects.select_for_update(skip_locked=True).filter(name=JOB_NAME).first()
+        if watermark is None:
+            return None
+
+        started = timezone.now()
+        if full or watermark.last_run_at is None:
+            student_ids = list(Student.objects.values_list('id', flat=True))
+        else:
+            since = watermark.last_run_at - OVERLAP
+            student_ids = list({*changed_students(since), *aged_students(since, started, days)})
+
+        scored = _write_scores(student_ids, started, days, threshold, batch_size)
+        watermark.last_run_at = started
+        watermark.students_scored = scored
+        watermark.save(update_fields=['last_run_at', 'students_scored'])
+    return scored
+
+
+def top_scores(scores, limit=20):
+    """Highest scores first; served by the (branch, -score) and (-score) indexes"""
+    return scores.select_related('student__user').order_by('-score')[:limit]
+
+
+def score_rows(scores):
+    return [
+        {
+            'student_id': score.student_id,
+            'name': score.student.user.get_full_name(),
+            'branch_id': score.branch_id,
+            'score': score.score,
+            'risk_level': score.risk_level,
+            'absences': score.absences,
+            'absence_streak': score.absence_streak,
+            'has_debt': score.has_debt,
+            'declining_grades': score.declining_grades,
+            'failing_exams': score.failing_exams,
+            'missed_homework': score.missed_homework,
+            'computed_at': score.computed_at,
+        }
+        for score in scores
+    ]
@@ -0,0 +1,202 @@
+from datetime import date, timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from core.models import Organization, Branch, Course, CustomUser, Teacher, Student, Group, Lesson, Attendance
+from finance.models import FinanceReport
+from finance.reports import refresh_rollups
+from manager_dashboard.views import ManagerDashboardViewSet
+from attendance.submission import submit_sheets
+from .models import RiskScoreWatermark, StudentRiskScore
+from .scoring import refresh_scores
+from .views import DirectorDashboardViewSet
+
+
+class AtRiskTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        organization = Organization.objects.create(name='Org', address='-', phone='1', email='org@example.com')
+        cls.branch = branch = Branch.objects.create(organization=organization, name='Main', address='-', phone='1')
+        cls.director = CustomUser.objects.create(username='director', role='director', organization=organization)
+        teacher = Teacher.objects.create(
+            user=CustomUser.objects.create(username='teacher'), branch=branch, hourly_rate=10, group_rate=100,
+        )
+        group = Group.objects.create(branch=branch, name='A1', teacher=teacher)
+        now = timezone.now()
+        cls.lessons = lessons = [
+            Lesson.objects.create(group=group, teacher=teacher, branch=branch, start_time=now - timedelta(days=day))
+            for day in range(28, 0, -2)
+        ]
+        # Fourteen lessons, oldest first: (statuses, homework grades)
+        cls.steady = cls.create_student(branch, 'steady', ['absent'] * 7 + ['present'] * 7, [8] * 14)
+        cls.streaky = cls.create_student(branch, 'streaky', ['present'] * 3 + ['absent'] * 11, [9] * 7 + [4] * 7, debt=500)
+        cls.fine = cls.create_student(branch, 'fine', ['present'] * 12 + ['absent', 'present'], [7] * 14)
+        for student, (statuses, grades) in cls.history.items():
+            for lesson, attendance_status, grade in zip(lessons, statuses, grades):
+                Attendance.objects.create(lesson=lesson, student=student, status=attendance_status, homework_grade=grade)
+
+    @classmethod
+    def create_student(cls, branch, username, statuses, grades, debt=0):
+        cls.history = getattr(cls, 'history', {})
+        student = Student.objects.create(
+            user=CustomUser.objects.create(username=username, first_name=username.title()), branch=branch,
+            total_debt=debt,
+        )
+        cls.history[student] = (statuses, grades)
+        return student
+
+
+
+class StudentDropRateTestCase(AtRiskTestCase):
+    def get(self, **params):
+        request = APIRequestFactory().get('/api/director/dashboard/student_drop_rate/', params)
+        force_authenticate(request, self.director)
+        return DirectorDashboardViewSet.as_view({'get': 'student_drop_rate'})(request).data
+
+    def test_absences_and_risk_level(self):
+        with self.assertNumQueries(2):
+            data = self.get()
+
+        self.assertEqual(data['count'], 2)
+        self.assertEqual(
+            [(row['student_id'], row['absences'], row['risk_level']) for row in data['results']],
+            [(self.streaky.id, 11, 'high'), (self.steady.id, 7, 'medium')],
+        )
+
+    def test_extra_signals_raise_the_score(self):
+        with self.assertNumQueries(2):
+            data = self.get(extras='all', ordering='risk_score', threshold=6)
+
+        steady, streaky = data['results']
+        self.assertEqual((steady['absence_streak'], steady['has_debt'], steady['declining_grades']), (0, False, False))
+        self.assertEqual((streaky['absence_streak'], streaky['has_debt'], streaky['declining_grades']), (11, True, True))
+        self.assertEqual(streaky['risk_score'], 11 + 11 * 2 + 3 + 2)
+        self.assertEqual(steady['risk_level'], 'medium')
+
+
+class RiskScoreRefreshTestCase(AtRiskTestCase):
+    def test_incremental_refresh(self):
+        self.assertEqual(refresh_scores(), 3)
+        scores = dict(StudentRiskScore.objects.values_list('student', 'risk_level'))
+        self.assertEqual(scores, {self.streaky.id: 'high', self.steady.id: 'medium', self.fine.id: 'low'})
+
+        Attendance.objects.update(submitted_at=timezone.now() - timedelta(days=1), updated_at=timezone.now() - timedelta(days=1))
+        self.assertEqual(refresh_scores(), 0)
+
+        lesson = Lesson.objects.create(group=self.lessons[0].group, teacher=self.lessons[0].teacher,
+                                       branch=self.branch, start_time=timezone.now())
+        Attendance.objects.create(lesson=lesson, student=self.fine, status='absent')
+        out = StringIO()
+        call_command('refresh_risk_scores', stdout=out)
+        self.assertIn('Scored 1 students', out.getvalue())
+        self.assertEqual(StudentRiskScore.objects.get(student=self.fine).absences, 2)
+
+    def test_upserted_rows_are_rescored(self):
+        refresh_scores()
+        Attendance.objects.update(updated_at=timezone.now() - timedelta(days=1))
+        self.lessons[0].group.students.add(self.fine)
+        # A resubmitted sheet updates the existing row in place
+        submit_sheets([{
+            'lesson_id': self.lessons[-1].id,
+            'students_attendance': [{'student_id': self.fine.id, 'status': 'absent'}],
+        }])
+        self.assertEqual(refresh_scores(), 1)
+        self.assertEqual(StudentRiskScore.objects.get(student=self.fine).absences, 2)
+
+    def test_debt_changes_are_rescored(self):
+        refresh_scores()
+        Attendance.objects.update(updated_at=timezone.now() - timedelta(days=1))
+        # Joining a priced course writes no attendance, exam, homework or payment row
+        course = Course.objects.create(organization=self.branch.organization, name='English', price=300)
+        Group.objects.create(branch=self.branch, name='B1', course=course).students.add(self.fine)
+        self.assertEqual(refresh_scores(), 1)
+        self.assertTrue(StudentRiskScore.objects.get(student=self.fine).has_debt)
+
+    def test_scores_age_with_the_window(self):
+        refresh_scores()
+        Attendance.objects.update(updated_at=timezone.now() - timedelta(days=10))
+        # Two days since the last run: the lesson of 16 days ago crossed the middle of the window
+        RiskScoreWatermark.objects.update(last_run_at=timezone.now() - timedelta(days=2))
+        self.assertEqual(refresh_scores(), 3)
+        self.assertEqual(refresh_scores(), 0)
+
+    def test_manager_reads_top_scores(self):
+        refresh_scores()
+        manager = CustomUser.objects.create(username='manager', role='manager', branch=self.branch)
+        request = APIRequestFactory().get('/api/manager/dashboard/risk_scores/', {'limit': 2})
+        force_authenticate(request, manager)
+
+        with self.assertNumQueries(1):
+            data = ManagerDashboardViewSet.as_view({'get': 'risk_scores'})(request).data
+
+        self.assertEqual([row['student_id'] for row in data], [self.streaky.id, self.steady.id])
+
+        for limit in ('ten', '0'):
+            request = APIRequestFactory().get('/api/manager/dashboard/risk_scores/', {'limit': limit})
+            force_authenticate(request, manager)
+            self.assertEqual(ManagerDashboardViewSet.as_view({'get': 'risk_scores'})(request).status_code, 400)
+        request = APIRequestFactory().get('/api/director/dashboard/risk_scores/', {'limit': 'ten'})
+        force_authenticate(request, self.director)
+        self.assertEqual(DirectorDashboardViewSet.as_view({'get': 'risk_scores'})(request).status_code, 400)
+
+
+class MonthlyTrendsTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        organization = Organization.objects.create(name='Org', address='-', phone='1', email='org@example.com')
+        cls.director = CustomUser.objects.create(username='director', role='director', organization=organization)
+        cls.north, cls.south = [
+            Branch.objects.create(organization=organization, name=name, address='-', phone='1')
+            for name in ('North', 'South')
+        ]
+        other = Organization.objects.create(name='Other', address='-', phone='1', email='other@example.com')
+        elsewhere = Branch.objects.create(organization=other, name='Elsewhere', address='-', phone='1')
+        for branch, day, income in [(cls.north, date(2024, 1, 31), 100), (cls.north, date(2024, 3, 1), 50),
+                                    (cls.south, date(2024, 3, 15), 30), (elsewhere, date(2024, 3, 2), 999)]:
+            FinanceReport.objects.create(
+                branch=branch, report_date=day, total_student_payments=income,
+                teacher_payments=10, staff_payments=5, other_expenses=1, profit=income - 16,
+            )
+        refresh_rollups(FinanceReport.objects.values_list('branch_id', 'report_date'))
+
+    def get(self, **params):
+        request = APIRequestFactory().get('/api/director/dashboard/monthly_trends/', params)
+        force_authenticate(request, self.director)
+        return DirectorDashboardViewSet.as_view({'get': 'monthly_trends'})(request)
+
+    def test_gap_filled_months_from_one_query(self):
+        with self.assertNumQueries(1):
+            data = self.get(start='2024-01-15', end='2024-04-10').data
+
+        self.assertEqual([item['month'] for item in data], ['2024-04', '2024-03', '2024-02', '2024-01'])
+        self.assertEqual([item['income'] for item in data], [0, 80, 0, 100])
+        self.assertEqual(data[1]['expenses'], 32)
+        self.assertEqual(data[1]['profit'], 48)
+
+    def test_months_are_calendar_months(self):
+        data = self.get(months=24, end='2024-03-31').data
+        self.assertEqual(len(data), 24)
+        self.assertEqual(data[-1]['month'], '2022-04')
+
+    def test_granularity_and_branch_breakdown(self):
+        with self.assertNumQueries(1):
+            data = self.get(start='2024-01-01', end='2024-06-30', granularity='quarter', by_branch='true').data
+
+        self.assertEqual([item['period'] for item in data], ['2024-Q2', '2024-Q1'])
+        branches = {row['name']: row['income'] for row in data[1]['branches']}
+        self.assertEqual(branches, {'North': 150, 'South': 30})
+        self.assertEqual([row['income'] for row in data[0]['branches']], [0, 0])
+
+        weeks = self.get(start='2024-02-26', end='2024-03-10', granularity='week').data
+        self.assertEqual([item['period'] for item in weeks], ['2024-03-04', '2024-02-26'])
+        self.assertEqual(weeks[1]['income'], 50)
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.get(granularity='decade').status_code, 400)
+        self.assertEqual(self.get(start='2024-13-01').status_code, 400)
+        self.assertEqual(self.get(start='2024-05-01', end='2024-01-01').status_code, 400)
+        self.assertEqual(self.get(start='2000-01-01', end='2024-01-01', granularity='day').status_code, 400)
@@ -1,16 +1,25 @@
 from rest_framework import viewsets, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import IsAuthenticated,AllowAny
 from django.db.models import Q, Count, Sum, Avg
 from datetime import datetime, timedelta
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 from core.models import (
     Group, Lesson, Student, Teacher, CustomUser, Branch, Organization,
     Attendance, Payment
 )
+from finance import summary
 from finance.models import FinanceReport, TeacherPayment
+from attendance.models import AttendanceRollup
 from auth_system.permissions import IsDirector
 import json
+from core.cache import versioned_response, organization_scope
+from . import risk, scoring
+from .models import StudentRiskScore
+from core.performance import teacher_performance
 
 class DirectorDashboardViewSet(viewsets.ViewSet):
     # permission_classes = [IsDirector]
@@ -22,6 +31,7 @@ class DirectorDashboardViewSet(viewsets.ViewSet):
         return self.overview(request)
     
     @action(detail=False, methods=['get'])
+    @versioned_response(organization_scope)
     def overview(self, request):
         user = request.user
         if user.role == 'superadmin':
@@ -45,19 +55,13 @@ class DirectorDashboardViewSet(viewsets.ViewSet):
         else:
             branches = user.organization.branches.all() if user.organization else []
         
-        today = datetime.today().date()
-        month_start = today.replace(day=1)
-        
-        reports = FinanceReport.objects.filter(
-            branch__in=branches,
-            report_date__gte=month_start
-        ).aggregate(
-            total_income=Sum('total_student_payments'),
-            total_expenses=Sum('teacher_payments') + Sum('staff_payments'),
-            total_profit=Sum('profit')
-        )
-        
-        return Response(reports)
+        today = timezone.localdate()
+        totals = summary.summarize(FinanceReport.objects.filter(branch__in=branches), today.replace(day=1), today)
+        return Response({
+            'total_income': totals['income'],
+            'total_expenses': totals['teacher_payments'] + totals['staff_payments'],
+            'total_profit': totals['profit'],
+        })
     
     @action(detail=False, methods=['get'])
     def teacher_performance(self, request):
@@ -69,22 +73,9 @@ class DirectorDashboardViewSet(viewsets.ViewSet):
         else:
             teachers = Teacher.objects.filter(branch=user.branch)
         
-        performance = []
-        for teacher in teachers:
-            lessons_count = Lesson.objects.filter(teacher=teacher).count()
-            avg_attendance = Attendance.objects.filter(
-                lesson__teacher=teacher
-            ).values('status').annotate(count=Count('id'))
-            
-            performance.append({
-                'teacher_id': teacher.id,
-                'name': teacher.user.get_full_name(),
-                'lessons': lessons_count,
-                'rating': teacher.performance_rating,
-                'total_earned': teacher.total_earned,
-            })
-        
-        return Response(performance)
+        days = request.query_params.get('days')
+        start = timezone.now() - timedelta(days=int(days)) if days else None
+        return Response(teacher_performance(teachers, start))
     
     @action(detail=False, methods=['get'])
     def group_statistics(self, request):
@@ -96,21 +87,23 @@ class DirectorDashboardViewSet(viewsets.ViewSet):
         else:
             groups = Group.objects.filter(branch=user.branch)
         
+        groups = groups.select_related('subject', 'teacher__user').annotate(student_count=Count('students'))
+        rollups = {
+            row['group']: row for row in AttendanceRollup.objects.filter(group__in=groups).values('group').annotate(
+                present=Sum('present'), total=Sum('total')
+            ).order_by()
+        }
+        
         stats = []
         for group in groups:
-            student_count = group.students.count()
-            avg_attendance = Attendance.objects.filter(
-                lesson__group=group,
-                status='present'
-            ).count()
-            total_lessons = Lesson.objects.filter(group=group).count()
+            rollup = rollups.get(group.id, {'present': 0, 'total': 0})
             
             stats.append({
                 'group_id': group.id,
                 'name': group.name,
-                'subject': group.subject,
-                'students': student_count,
-                'attendance_rate': (avg_attendance / total_lessons * 100) if total_lessons > 0 else 0,
+                'subject': group.subject.name if group.subject else None,
+                'students': group.student_count,
+                'attendance_rate': (rollup['present'] / rollup['total'] * 100) if rollup['total'] > 0 else 0,
                 'teacher': group.teacher.user.get_full_name() if group.teacher else None,
             })
         
@@ -127,25 +120,64 @@ class DirectorDashboardViewSet(viewsets.ViewSet):
             students = Student.objects.filter(branch=user.branch)
         
         days_range = int(request.query_params.get('days', 30))
-        start_date = datetime.today().date() - timedelta(days=days_range)
+        threshold = int(request.query_params.get('threshold', 5))
+        extras = risk.parse_extras(request.query_params.get('extras'))
+        ordering = request.query_params.get('ordering', '-risk_score')
         
+        rows = risk.at_risk_students(students, days_range, threshold, extras, ordering)
+        paginator = PageNumberPagination()
+        page = paginator.paginate_queryset(rows, request, view=self)
         at_risk = []
-        for student in students:
-            absences = Attendance.objects.filter(
-                student=student,
-                status='absent',
-                lesson__start_time__date__gte=start_date
-            ).count()
-            
-            if absences > 5:
-                at_risk.append({
-                    'student_id': student.id,
-                    'name': student.user.get_full_name(),
-                    'absences': absences,
-                    'risk_level': 'high' if absences > 10 else 'medium'
-                })
+        for row in page:
+            item = {
+                'student_id': row['id'],
+                'name': f"{row['user__first_name']} {row['user__last_name']}".strip(),
+                'absences': row['absences'],
+                'risk_score': row['risk_score'],
+                'risk_level': row['risk_level'],
+            }
+            if 'streak' in extras:
+                item['absence_streak'] = row['streak']
+            if 'debt' in extras:
+                item['has_debt'] = row['has_debt']
+                item['total_debt'] = row['total_debt']
+            if 'homework' in extras:
+                item['homework_grade_before'] = row['earlier_grade']
+                item['homework_grade_recent'] = row['recent_grade']
+                item['declining_grades'] = bool(row['declining_grades'])
+            if 'exams' in extras:
+                item['failing_exams'] = row['failing_exams']
+            if 'missed_homework' in extras:
+                item['missed_homework'] = row['missed_homework']
+            at_risk.append(item)
+        
+        return paginator.get_paginated_response(at_risk)
+    
+    @action(detail=False, methods=['get'])
+    def risk_scores(self, request):
+        user = request.user
+        scores = StudentRiskScore.objects.all()
+        if user.role != 'superadmin':
+            if user.organization:
+                scores = scores.filter(branch__organization=user.organization)
+            else:
+                scores = scores.filter(branch=user.branch)
+        
+        branch_id = request.query_params.get('branch')
+        if branch_id:
+            scores = scores.filter(branch_id=branch_id)
+        risk_level = request.query_params.get('risk_level')
+        if risk_level:
+            scores = scores.filter(risk_level=risk_level)
         
-        return Response(at_risk)
+        try:
+            limit = int(request.query_params.get('limit', 20))
+            if limit < 1:
+                raise ValueError
+        except ValueError:
+            return Response({'error': 'limit must be a positive integer'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = min(limit, 200)
+        return Response(scoring.score_rows(scoring.top_scores(scores, limit)))
     
     @action(detail=False, methods=['post'])
     def create_branch(self, request):
@@ -183,31 +215,29 @@ class DirectorDashboardViewSet(viewsets.ViewSet):
     @action(detail=False, methods=['get'])
     def monthly_trends(self, request):
         user = request.user
-        months = int(request.query_params.get('months', 6))
-        
         if user.role == 'superadmin':
             branches = Branch.objects.all()
         else:
-            branches = user.organization.branches.all() if user.organization else []
+            branches = user.organization.branches.all() if user.organization else Branch.objects.none()
         
-        trends = []
-        for i in range(months):
-            date = datetime.today().date() - timedelta(days=30*i)
-            month_start = date.replace(day=1)
-            
-            report = FinanceReport.objects.filter(
-                branch__in=branches,
-                report_date__month=month_start.month,
-                report_date__year=month_start.year
-            ).aggregate(
-                income=Sum('total_student_payments'),
-                expenses=Sum('teacher_payments') + Sum('staff_payments'),
-                profit=Sum('profit')
+        params = request.query_params
+        by_branch = params.get('by_branch', '').lower() in ('1', 'true', 'yes')
+        try:
+            end = parse_date(params['end']) if params.get('end') else timezone.localdate()
+            if params.get('start'):
+                start = parse_date(params['start'])
+            else:
+                start = end and summary.months_back(end, max(1, int(params.get('months', 6))))
+            if start is None or end is None:
+                raise ValueError('start and end must be YYYY-MM-DD dates')
+            granularity = params.get('granularity', 'month')
+            series = summary.series(
+                FinanceReport.objects.filter(branch__in=branches), start, end, granularity, by_branch,
             )
-            
-            trends.append({
-                'month': month_start.strftime('%Y-%m'),
-                **report
-            })
-        
-        return Response(trends)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if granularity == 'month':
+            for item in series:
+                item['month'] = item['period']
+        # Newest period first
+        return Response(series[::-1])
@@ -0,0 +1,93 @@
+# exams/importing.py
+import uuid
+from bisect import bisect_right
+from django.db import transaction
+from django.utils import timezone
+from core.models import Student
+from . import stats
+from .models import ExamGradeRange, ExamResult
+
+
+class GradeBands:
+    """ExamGradeRange rows loaded once and resolved in memory by bisect"""
+    
+    def __init__(self, ranges):
+        self.ranges = sorted(ranges, key=lambda band: band.min_score)
+        self.lower_bounds = [band.min_score for band in self.ranges]
+    
+    @classmethod
+    def load(cls):
+        return cls(ExamGradeRange.objects.all())
+    
+    def grade_for(self, score):
+        index = bisect_right(self.lower_bounds, score) - 1
+        if index < 0:
+            return None
+        band = self.ranges[index]
+        return band.grade if score <= band.max_score else None
+
+
+def _parse_row(row, bands):
+    """Return ``(student_id, score, grade)`` or raise ValueError with the rejection reason"""
+    if not isinstance(row, dict):
+        raise ValueError('Malformed row')
+    try:
+        student_id = uuid.UUID(str(row.get('student_id')))
+    except ValueError:
+        raise ValueError('Invalid student_id')
+    try:
+        score = int(row.get('score'))
+    except (TypeError, ValueError):
+        raise ValueError('Invalid score')
+    if not 0 <= score <= 100:
+        raise ValueError('Score out of range')
+    grade = bands.grade_for(score)
+    if grade is None:
+        raise ValueError('No grade band for score')
+    return student_id, score, grade
+
+
+def import_results(exam, numbered_rows, bands=None):
+    """
+    Upsert ExamResult rows for ``exam`` with one student lookup and one bulk statement.
+    ``numbered_rows`` are ``(row_number, row)`` pairs where each row is a dict with
+    ``student_id`` and ``score``. Returns ``(imported, rejected)``.
+    """
+    bands = bands or GradeBands.load()
+    rejected = []
+    parsed = {}
+    
+    for index, row in numbered_rows:
+        try:
+            student_id, score, grade = _parse_row(row, bands)
+        except ValueError as e:
+            student_id = row.get('student_id') if isinstance(row, dict) else None
+            rejected.append({'row': index, 'student_id': student_id, 'reason': str(e)})
+            continue
+        if student_id in parsed:
+            rejected.append({'row': index, 'student_id': str(student_id), 'reason': 'Duplicate student in import'})
+            continue
+        parsed[student_id] = (index, score, grade)
+    
+    known = set(Student.objects.filter(id__in=parsed).values_list('id', flat=True))
+    results = []
+    now = timezone.now()
+    for student_id, (index, score, grade) in parsed.items():
+        if student_id not in known:
+            rejected.append({'row': index, 'student_id': str(student_id), 'reason': 'Student not found'})
+            continue
+        results.append(ExamResult(exam=exam, student_id=student_id, score=score, grade=grade, updated_at=now))
+    
+    with transaction.atomic():
+        ExamResult.objects.bulk_create(
+            results,
+            update_conflicts=True,
+            unique_fields=['exam', 'student'],
+            update_fields=['score', 'grade', 'updated_at'],
+            batch_size=1000,
+        )
+        if results:
+            stats.invalidate(exam.id)
+    
+    rejected.sort(key=lambda item: item['row'])
+    return len(results), rejected
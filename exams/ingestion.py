@@ -0,0 +1,150 @@
+# exams/ingestion.py
+import csv
+import io
+import os
+from itertools import islice
+from zipfile import BadZipFile
+from django.db.models import F
+from django.utils import timezone
+from .importing import GradeBands, import_results
+from .models import ExamUpload
+
+BATCH_SIZE = 500
+MAX_STORED_ERRORS = 500
+REQUIRED_COLUMNS = ('student_id', 'score')
+# Larger files are left to ``ingest_exam_uploads`` instead of being imported inside a request
+INLINE_MAX_BYTES = 2 * 1024 * 1024
+READ_ERRORS = (OSError, ValueError, csv.Error, BadZipFile)
+
+
+class IngestionError(Exception):
+    """Raised when an upload cannot be read at all (wrong format, missing columns)"""
+
+
+class UploadBusy(Exception):
+    """Raised when another worker is already processing the upload"""
+
+
+def queue_upload(upload):
+    """Put ``upload`` back to ``pending`` for the command; False if it is being processed"""
+    return bool(ExamUpload.objects.filter(pk=upload.pk).exclude(status='processing').update(status='pending'))
+
+
+def runs_inline(upload):
+    try:
+        return upload.file.size <= INLINE_MAX_BYTES
+    except OSError:
+        return True
+
+
+def _csv_rows(file):
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    try:
+        yield from csv.reader(text)
+    finally:
+        text.detach()
+
+
+def _xlsx_rows(file):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise IngestionError('openpyxl is required to read .xlsx uploads')
+
+    # read_only mode streams rows from the sheet XML instead of building the whole workbook
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        yield from workbook.active.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def _reader_for(upload):
+    extension = os.path.splitext(upload.file.name)[1].lower()
+    if extension == '.csv':
+        return _csv_rows
+    if extension == '.xlsx':
+        return _xlsx_rows
+    raise IngestionError(f'Unsupported file type: {extension or upload.file_format}')
+
+
+def _cell(value):
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return '' if value is None else str(value).strip()
+
+
+def read_rows(upload):
+    """
+    Yield ``(row_number, {'student_id': ..., 'score': ...})`` from the uploaded file one row
+    at a time. The first row is the header; row numbers match the spreadsheet (header is 1).
+    """
+    rows = _reader_for(upload)(upload.file)
+    try:
+        header = [_cell(value).lower() for value in next(rows, ())]
+        missing = [column for column in REQUIRED_COLUMNS if column not in header]
+        if missing:
+            raise IngestionError(f"Missing columns: {', '.join(missing)}")
+        positions = {column: header.index(column) for column in REQUIRED_COLUMNS}
+
+        for row_number, values in enumerate(rows, start=2):
+            values = [_cell(value) for value in values]
+            if not any(values):
+                continue
+            yield row_number, {
+                column: values[position] if position < len(values) else ''
+                for column, position in positions.items()
+            }
+    finally:
+        rows.close()
+
+
+def ingest_upload(upload, batch_size=BATCH_SIZE):
+    """
+    Stream ``upload`` into ExamResult upserts ``batch_size`` rows at a time. Each batch is
+    committed on its own and the counters on the upload are bumped after it, so progress
+    is visible while a large file is still being processed. Only the first
+    MAX_STORED_ERRORS rejections are kept on the record; ``rows_rejected`` counts them all.
+
+    The upload is claimed with a conditional update, so two workers never import the same
+    file; UploadBusy is raised when it is already processing. Any error marks it failed.
+    """
+    uploads = ExamUpload.objects.filter(pk=upload.pk)
+    claimed = uploads.exclude(status='processing').update(
+        status='processing', rows_processed=0, rows_imported=0, rows_rejected=0,
+        errors=[], processed_at=None,
+    )
+    if not claimed:
+        raise UploadBusy('Upload is already being processed')
+    bands = GradeBands.load()
+    errors = []
+
+    try:
+        upload.file.open('rb')
+        rows = read_rows(upload)
+        try:
+            while True:
+                batch = list(islice(rows, batch_size))
+                if not batch:
+                    break
+                imported, rejected = import_results(upload.exam, batch, bands=bands)
+                errors.extend(rejected[:MAX_STORED_ERRORS - len(errors)])
+                uploads.update(
+                    rows_processed=F('rows_processed') + len(batch),
+                    rows_imported=F('rows_imported') + imported,
+                    rows_rejected=F('rows_rejected') + len(rejected),
+                    errors=errors,
+                )
+        finally:
+            rows.close()
+            upload.file.close()
+    except Exception as e:
+        uploads.update(status='failed', errors=errors + [{'row': None, 'student_id': None, 'reason': str(e)}],
+                       processed_at=timezone.now())
+        if not isinstance(e, (IngestionError, *READ_ERRORS)):
+            raise
+    else:
+        uploads.update(status='completed', processed_at=timezone.now())
+
+    upload.refresh_from_db()
+    return upload
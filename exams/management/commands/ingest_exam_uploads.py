@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from exams.ingestion import BATCH_SIZE, UploadBusy, ingest_upload
+from exams.models import ExamUpload
+
+
+class Command(BaseCommand):
+    help = 'Stream pending exam result uploads (.xlsx/.csv) into ExamResult rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('upload_ids', nargs='*', help='Process only these uploads (any status)')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Rows upserted per batch')
+
+    def handle(self, *args, **options):
+        if options['upload_ids']:
+            uploads = ExamUpload.objects.filter(id__in=options['upload_ids'])
+        else:
+            uploads = ExamUpload.objects.filter(status='pending', file_format__in=['excel', 'csv'])
+
+        for upload in uploads.select_related('exam').order_by('uploaded_at'):
+            try:
+                upload = ingest_upload(upload, batch_size=options['batch_size'])
+            except UploadBusy:
+                self.stdout.write(self.style.WARNING(f'{upload.id}: already being processed, skipped'))
+                continue
+            message = (f'{upload.id}: {upload.status}, {upload.rows_imported} imported, '
+                       f'{upload.rows_rejected} rejected')
+            style = self.style.SUCCESS if upload.status == 'completed' else self.style.ERROR
+            self.stdout.write(style(message))
@@ -47,22 +47,44 @@ class ExamResult(models.Model):
         choices=ExamGradeRange._meta.get_field('grade').choices
     )
     submitted_at = models.DateTimeField(auto_now_add=True)
+    # Bulk upserts set it explicitly; auto_now only covers save()
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         unique_together = ('exam', 'student')
+        indexes = [
+            # Results changed since the last risk scoring run
+            models.Index(fields=['updated_at'], name='exams_result_updated_idx'),
+            # An exam's results by score: ranking, pass/fail counts, averages
+            models.Index(fields=['exam', '-score'], name='exams_result_exam_score_idx'),
+        ]
     
     def __str__(self):
         return f"{self.student.user.get_full_name()} - {self.exam.title}: {self.score}"
 
 class ExamUpload(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     exam = models.ForeignKey(Exam, on_delete=models.CASCADE, related_name='uploaded_files')
     file = models.FileField(upload_to='exams/%Y/%m/%d/')
     file_format = models.CharField(max_length=20, choices=[
         ('excel', 'Excel'),
+        ('csv', 'CSV'),
         ('word', 'Word'),
         ('pdf', 'PDF'),
     ])
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    rows_processed = models.PositiveIntegerField(default=0)
+    rows_imported = models.PositiveIntegerField(default=0)
+    rows_rejected = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
     uploaded_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True)
     
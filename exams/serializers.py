@@ -1,13 +1,14 @@
 from rest_framework import serializers
 from .models import Exam, ExamResult, ExamUpload, ExamGradeRange
 from core.models import Group
+from core.serializers import SparseFieldsMixin
 
-class ExamGradeRangeSerializer(serializers.ModelSerializer):
+class ExamGradeRangeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = ExamGradeRange
         fields = ['id', 'grade', 'min_score', 'max_score', 'description']
 
-class ExamSerializer(serializers.ModelSerializer):
+class ExamSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     group_name = serializers.CharField(source='group.name', read_only=True)
     created_by_name = serializers.CharField(source='created_by.get_full_name', read_only=True)
     results_count = serializers.SerializerMethodField()
@@ -20,9 +21,11 @@ class ExamSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at']
     
     def get_results_count(self, obj):
+        if hasattr(obj, 'results_count'):
+            return obj.results_count
         return obj.results.count()
 
-class ExamResultSerializer(serializers.ModelSerializer):
+class ExamResultSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     student_name = serializers.CharField(source='student.user.get_full_name', read_only=True)
     exam_title = serializers.CharField(source='exam.title', read_only=True)
     
@@ -31,16 +34,19 @@ class ExamResultSerializer(serializers.ModelSerializer):
         fields = ['id', 'exam', 'exam_title', 'student', 'student_name', 'score', 'grade', 'submitted_at']
         read_only_fields = ['submitted_at']
 
-class ExamUploadSerializer(serializers.ModelSerializer):
+class ExamUploadSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     exam_title = serializers.CharField(source='exam.title', read_only=True)
     uploaded_by_name = serializers.CharField(source='uploaded_by.get_full_name', read_only=True)
     
     class Meta:
         model = ExamUpload
-        fields = ['id', 'exam', 'exam_title', 'file', 'file_format', 'uploaded_at', 'uploaded_by', 'uploaded_by_name']
-        read_only_fields = ['uploaded_at']
+        fields = ['id', 'exam', 'exam_title', 'file', 'file_format', 'status', 'rows_processed',
+                  'rows_imported', 'rows_rejected', 'errors', 'processed_at', 'uploaded_at',
+                  'uploaded_by', 'uploaded_by_name']
+        read_only_fields = ['status', 'rows_processed', 'rows_imported', 'rows_rejected',
+                            'errors', 'processed_at', 'uploaded_at']
 
-class ExamDetailedSerializer(serializers.ModelSerializer):
+class ExamDetailedSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     results = ExamResultSerializer(many=True, read_only=True)
     uploaded_files = ExamUploadSerializer(many=True, read_only=True)
     group_name = serializers.CharField(source='group.name', read_only=True)
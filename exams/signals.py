@@ -0,0 +1,17 @@
+# exams/signals.py
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from . import stats
+from .models import Exam, ExamResult
+
+
+@receiver([post_save, post_delete], sender=ExamResult)
+def invalidate_result_statistics(sender, instance, **kwargs):
+    stats.invalidate(instance.exam_id)
+
+
+@receiver(post_save, sender=Exam)
+def invalidate_exam_statistics(sender, instance, created, **kwargs):
+    # pass_score drives the passed/failed split
+    if not created:
+        stats.invalidate(instance.id)
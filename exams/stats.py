@@ -0,0 +1,77 @@
+# exams/stats.py
+import uuid
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Aggregate, Avg, Count, F, FloatField, Max, Min, Q, StdDev
+from .models import ExamGradeRange
+
+EXTRAS = ('median', 'stddev', 'histogram')
+CACHE_TIMEOUT = 60 * 60
+
+
+class Median(Aggregate):
+    """PostgreSQL ``percentile_cont(0.5)`` ordered-set aggregate"""
+    function = 'PERCENTILE_CONT'
+    name = 'Median'
+    template = '%(function)s(0.5) WITHIN GROUP (ORDER BY %(expressions)s)'
+    output_field = FloatField()
+
+
+def parse_extras(value):
+    """Parse ``?extras=median,stddev`` (or ``all``) into a sorted tuple of known extras"""
+    requested = {item.strip() for item in (value or '').split(',') if item.strip()}
+    if 'all' in requested:
+        return EXTRAS
+    return tuple(extra for extra in EXTRAS if extra in requested)
+
+
+def compute_statistics(results, extras=()):
+    """Every statistic for an exam's ``results`` queryset in a single aggregate query"""
+    grades = [grade for grade, _ in ExamGradeRange.GRADE_CHOICES]
+    aggregates = {
+        'total_students': Count('id'),
+        'average_score': Avg('score'),
+        'highest_score': Max('score'),
+        'lowest_score': Min('score'),
+        'passed': Count('id', filter=Q(score__gte=F('exam__pass_score'))),
+        'failed': Count('id', filter=Q(score__lt=F('exam__pass_score'))),
+    }
+    if 'median' in extras:
+        aggregates['median_score'] = Median('score')
+    if 'stddev' in extras:
+        aggregates['std_dev'] = StdDev('score')
+    if 'histogram' in extras:
+        for grade in grades:
+            aggregates[f'grade_{grade}'] = Count('id', filter=Q(grade=grade))
+
+    row = results.aggregate(**aggregates)
+    stats = {
+        'total_students': row['total_students'],
+        'average_score': row['average_score'] or 0,
+        'highest_score': row['highest_score'] or 0,
+        'lowest_score': row['lowest_score'] or 0,
+        'passed': row['passed'],
+        'failed': row['failed'],
+    }
+    if 'median' in extras:
+        stats['median_score'] = row['median_score'] or 0
+    if 'stddev' in extras:
+        stats['std_dev'] = row['std_dev'] or 0
+    if 'histogram' in extras:
+        stats['grade_histogram'] = {grade: row[f'grade_{grade}'] for grade in grades}
+    return stats
+
+
+def _version_key(exam_id):
+    return f'exams:statistics:{exam_id}:version'
+
+
+def cache_key(exam_id, scope, extras):
+    """Cache key for one exam's statistics; changes whenever the exam's results change"""
+    version = cache.get_or_set(_version_key(exam_id), uuid.uuid4().hex, None)
+    return f"exams:statistics:{exam_id}:{version}:{scope}:{','.join(extras)}"
+
+
+def invalidate(exam_id):
+    """Drop every cached statistics payload of ``exam_id`` once the current transaction commits"""
+    transaction.on_commit(lambda: cache.set(_version_key(exam_id), uuid.uuid4().hex, None))
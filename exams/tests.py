@@ -0,0 +1,186 @@
+import io
+import tempfile
+import uuid
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core.models import Organization, Branch, CustomUser, Student, Group
+from .importing import GradeBands
+from . import ingestion
+from .ingestion import UploadBusy, ingest_upload
+from .models import Exam, ExamGradeRange, ExamResult, ExamUpload
+
+
+class ExamTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        organization = Organization.objects.create(name='Org', address='-', phone='1', email='org@example.com')
+        cls.branch = Branch.objects.create(organization=organization, name='Main', address='-', phone='1')
+        cls.director = CustomUser.objects.create_user(
+            username='director', password='x', role='director', organization=organization, branch=cls.branch,
+        )
+        for grade, low, high in [('C', 0, 50), ('B', 51, 85), ('A', 86, 100)]:
+            ExamGradeRange.objects.create(grade=grade, min_score=low, max_score=high, description=grade)
+        cls.group = Group.objects.create(branch=cls.branch, name='A1')
+        cls.students = [
+            Student.objects.create(user=CustomUser.objects.create(username=f'student{i}', role='student'), branch=cls.branch)
+            for i in range(4)
+        ]
+        cls.exam = Exam.objects.create(
+            group=cls.group, title='Final', subject='Math', exam_date=timezone.now(), total_questions=10,
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.director)
+
+
+class ExamResultImportTestCase(ExamTestCase):
+    def test_grade_bands_bisect(self):
+        bands = GradeBands.load()
+        self.assertEqual([bands.grade_for(score) for score in (0, 50, 51, 85, 86, 100)], ['C', 'C', 'B', 'B', 'A', 'A'])
+        self.assertIsNone(GradeBands([ExamGradeRange(grade='A', min_score=60, max_score=70)]).grade_for(75))
+
+    def test_bulk_import_upserts_and_reports_rejections(self):
+        ExamResult.objects.create(exam=self.exam, student=self.students[0], score=10, grade='C')
+        unknown = uuid.uuid4()
+
+        with self.assertNumQueries(6):
+            response = self.client.post('/api/exams/results/bulk_import/', {
+                'exam_id': str(self.exam.id),
+                'results': [
+                    {'student_id': str(self.students[0].id), 'score': 90},
+                    {'student_id': str(self.students[1].id), 'score': 60},
+                    {'student_id': str(self.students[1].id), 'score': 70},
+                    {'student_id': str(unknown), 'score': 40},
+                    {'student_id': str(self.students[2].id), 'score': 'abc'},
+                    {'student_id': str(self.students[3].id), 'score': 101},
+                ],
+            }, format='json')
+
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(
+            [(item['row'], item['reason']) for item in response.data['rejected']],
+            [(2, 'Duplicate student in import'), (3, 'Student not found'), (4, 'Invalid score'), (5, 'Score out of range')],
+        )
+        self.assertEqual(
+            dict(ExamResult.objects.values_list('student', 'grade')),
+            {self.students[0].id: 'A', self.students[1].id: 'B'},
+        )
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ExamUploadIngestionTestCase(ExamTestCase):
+    def create_upload(self, name, content):
+        return ExamUpload.objects.create(
+            exam=self.exam, file=SimpleUploadedFile(name, content), file_format='csv', uploaded_by=self.director,
+        )
+
+    def test_csv_is_imported_in_batches_with_progress(self):
+        lines = ['Student_ID,Score']
+        lines += [f'{student.id},{score}' for student, score in zip(self.students, (95, 60, 30))]
+        lines += ['', 'not-a-uuid,50', f'{self.students[3].id},abc']
+        upload = self.create_upload('results.csv', '\n'.join(lines).encode())
+
+        upload = ingest_upload(upload, batch_size=2)
+
+        self.assertEqual(upload.status, 'completed')
+        self.assertEqual((upload.rows_processed, upload.rows_imported, upload.rows_rejected), (5, 3, 2))
+        self.assertEqual([(error['row'], error['reason']) for error in upload.errors],
+                         [(6, 'Invalid student_id'), (7, 'Invalid score')])
+        self.assertEqual(
+            sorted(ExamResult.objects.values_list('grade', flat=True)), ['A', 'B', 'C'],
+        )
+
+    def test_xlsx_is_streamed(self):
+        from openpyxl import Workbook
+
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet()
+        sheet.append(['score', 'student_id'])
+        sheet.append([88.0, str(self.students[0].id)])
+        buffer = io.BytesIO()
+        workbook.save(buffer)
+        upload = self.create_upload('results.xlsx', buffer.getvalue())
+
+        response = self.client.post(f'/api/exams/uploads/{upload.id}/process/')
+
+        self.assertEqual(response.data['status'], 'completed')
+        self.assertEqual(ExamResult.objects.get().grade, 'A')
+
+    def test_missing_columns_fail_the_upload(self):
+        upload = ingest_upload(self.create_upload('results.csv', b'id,points\n1,2\n'))
+
+        self.assertEqual(upload.status, 'failed')
+        self.assertEqual(upload.errors[0]['reason'], 'Missing columns: student_id, score')
+
+    def test_an_upload_is_processed_by_one_worker_at_a_time(self):
+        upload = self.create_upload('results.csv', f'student_id,score\n{self.students[0].id},90\n'.encode())
+        ExamUpload.objects.filter(pk=upload.pk).update(status='processing', rows_imported=7)
+
+        with self.assertRaises(UploadBusy):
+            ingest_upload(upload)
+        response = self.client.post(f'/api/exams/uploads/{upload.id}/process/')
+        self.assertEqual(response.status_code, 409)
+        upload.refresh_from_db()
+        self.assertEqual((upload.status, upload.rows_imported), ('processing', 7))
+        self.assertFalse(ExamResult.objects.exists())
+
+    def test_unexpected_errors_fail_the_upload_so_it_can_be_retried(self):
+        upload = self.create_upload('results.csv', f'student_id,score\n{self.students[0].id},90\n'.encode())
+        with mock.patch.object(ingestion, 'import_results', side_effect=DatabaseError('connection lost')):
+            with self.assertRaises(DatabaseError):
+                ingest_upload(upload)
+        upload.refresh_from_db()
+        self.assertEqual((upload.status, upload.errors[-1]['reason']), ('failed', 'connection lost'))
+
+        self.assertEqual(ingest_upload(upload).status, 'completed')
+
+    def test_large_files_are_left_to_the_command(self):
+        upload = self.create_upload('results.csv', f'student_id,score\n{self.students[0].id},90\n'.encode())
+        with mock.patch.object(ingestion, 'INLINE_MAX_BYTES', 10):
+            response = self.client.post(f'/api/exams/uploads/{upload.id}/process/')
+        self.assertEqual((response.status_code, response.data['status']), (202, 'pending'))
+        self.assertFalse(ExamResult.objects.exists())
+
+        call_command('ingest_exam_uploads', stdout=io.StringIO())
+        upload.refresh_from_db()
+        self.assertEqual((upload.status, upload.rows_imported), ('completed', 1))
+
+
+class ExamStatisticsTestCase(ExamTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        for student, score, grade in zip(self.students, (95, 70, 40, 20), 'ABCC'):
+            ExamResult.objects.create(exam=self.exam, student=student, score=score, grade=grade)
+
+    def get_statistics(self, **params):
+        return self.client.get('/api/exams/results/statistics/', {'exam': str(self.exam.id), **params}).data
+
+    def test_single_query_with_extras(self):
+        with self.assertNumQueries(1):
+            data = self.get_statistics(extras='all')
+
+        self.assertEqual((data['total_students'], data['passed'], data['failed']), (4, 2, 2))
+        self.assertEqual((data['highest_score'], data['lowest_score'], data['average_score']), (95, 20, 56.25))
+        self.assertEqual(data['median_score'], 55.0)
+        self.assertAlmostEqual(data['std_dev'], 28.586, places=3)
+        self.assertEqual(data['grade_histogram'], {'A': 1, 'B': 1, 'C': 2})
+
+    def test_cached_until_results_change(self):
+        self.get_statistics()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_statistics()['passed'], 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ExamResult.objects.filter(student=self.students[2]).get().delete()
+
+        self.assertEqual(self.get_statistics()['total_students'], 3)
@@ -3,9 +3,16 @@ from rest_framework import viewsets, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from django.db.models import Count, Q, Case, When, F, Avg, Max, Min
+from django.db.models import Count, Q, Case, When, F, Avg, Max, Min, OuterRef
+from django.core.cache import cache
 from datetime import datetime
+import uuid
+from core.aggregates import subquery_count
+from core.fetch import FetchPlan, FetchPlanMixin
 from .models import Exam, ExamResult, ExamUpload, ExamGradeRange
+from .importing import import_results
+from .ingestion import ingest_upload, queue_upload, runs_inline, UploadBusy
+from . import stats
 from .serializers import (
     ExamSerializer, ExamResultSerializer, ExamUploadSerializer,
     ExamDetailedSerializer, ExamGradeRangeSerializer
@@ -13,8 +20,19 @@ from .serializers import (
 from core.models import Group, Student
 from auth_system.permissions import IsDirector, IsAdmin
 
-class ExamViewSet(viewsets.ModelViewSet):
+class ExamViewSet(FetchPlanMixin, viewsets.ModelViewSet):
     serializer_class = ExamSerializer
+    field_plans = {
+        'results_count': FetchPlan(annotate={
+            'results_count': subquery_count(ExamResult.objects.filter(exam=OuterRef('pk'))),
+        }),
+    }
+    fetch_plan = FetchPlan.combine([FetchPlan(select_related=['group', 'created_by']), *field_plans.values()])
+    fetch_plans = {
+        'detailed': FetchPlan(select_related=['group'], prefetch_related=[
+            'results__student__user', 'uploaded_files__uploaded_by',
+        ]),
+    }
     permission_classes = [IsAuthenticated]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['title', 'subject', 'group__name']
@@ -24,16 +42,16 @@ class ExamViewSet(viewsets.ModelViewSet):
         user = self.request.user
         
         if user.role == 'superadmin':
-            return Exam.objects.all()
+            return self.fetch(Exam.objects.all())
         
         if user.role in ['director', 'manager', 'admin'] and user.branch:
-            return Exam.objects.filter(group__branch=user.branch)
+            return self.fetch(Exam.objects.filter(group__branch=user.branch))
         
         if user.role == 'teacher':
-            return Exam.objects.filter(group__teacher=user.teacher)
+            return self.fetch(Exam.objects.filter(group__teacher__user=user))
         
         if user.role == 'student':
-            return Exam.objects.filter(group__in=user.student.groups.all())
+            return self.fetch(Exam.objects.filter(group__students__user=user))
         
         return Exam.objects.none()
     
@@ -46,8 +64,9 @@ class ExamViewSet(viewsets.ModelViewSet):
         serializer = ExamDetailedSerializer(exam)
         return Response(serializer.data)
 
-class ExamResultViewSet(viewsets.ModelViewSet):
+class ExamResultViewSet(FetchPlanMixin, viewsets.ModelViewSet):
     serializer_class = ExamResultSerializer
+    fetch_plan = FetchPlan(select_related=['student__user', 'exam'])
     permission_classes = [IsAuthenticated]
     permission_classes = [AllowAny]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
@@ -58,16 +77,16 @@ class ExamResultViewSet(viewsets.ModelViewSet):
         user = self.request.user
         
         if user.role == 'superadmin':
-            return ExamResult.objects.all()
+            return self.fetch(ExamResult.objects.all())
         
         if user.role in ['director', 'manager', 'admin'] and user.branch:
-            return ExamResult.objects.filter(exam__group__branch=user.branch)
+            return self.fetch(ExamResult.objects.filter(exam__group__branch=user.branch))
         
         if user.role == 'teacher':
-            return ExamResult.objects.filter(exam__group__teacher=user.teacher)
+            return self.fetch(ExamResult.objects.filter(exam__group__teacher__user=user))
         
         if user.role == 'student':
-            return ExamResult.objects.filter(student__user=user)
+            return self.fetch(ExamResult.objects.filter(student__user=user))
         
         return ExamResult.objects.none()
     
@@ -81,31 +100,11 @@ class ExamResultViewSet(viewsets.ModelViewSet):
         
         try:
             exam = Exam.objects.get(id=exam_id)
-            created_count = 0
-            
-            for result_data in results_data:
-                try:
-                    student = Student.objects.get(id=result_data['student_id'])
-                    score = result_data['score']
-                    
-                    grade_range = ExamGradeRange.objects.filter(
-                        min_score__lte=score,
-                        max_score__gte=score
-                    ).first()
-                    
-                    if grade_range:
-                        ExamResult.objects.update_or_create(
-                            exam=exam,
-                            student=student,
-                            defaults={'score': score, 'grade': grade_range.grade}
-                        )
-                        created_count += 1
-                except Student.DoesNotExist:
-                    continue
-            
-            return Response({'status': 'imported', 'count': created_count})
         except Exam.DoesNotExist:
             return Response({'error': 'Exam not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        imported, rejected = import_results(exam, enumerate(results_data))
+        return Response({'status': 'imported', 'count': imported, 'rejected': rejected})
     
     @action(detail=False, methods=['get'])
     def by_grade(self, request):
@@ -121,22 +120,32 @@ class ExamResultViewSet(viewsets.ModelViewSet):
         exam_id = request.query_params.get('exam')
         if not exam_id:
             return Response({'error': 'exam parameter required'}, status=status.HTTP_400_BAD_REQUEST)
-        
-        results = self.get_queryset().filter(exam__id=exam_id)
-        
-        stats = {
-            'total_students': results.count(),
-            'average_score': results.aggregate(avg=Avg('score'))['avg'] or 0,
-            'highest_score': results.aggregate(max=Max('score'))['max'] or 0,
-            'lowest_score': results.aggregate(min=Min('score'))['min'] or 0,
-            'passed': results.filter(score__gte=F('exam__pass_score')).count(),
-            'failed': results.filter(score__lt=F('exam__pass_score')).count(),
-        }
-        
-        return Response(stats)
+        try:
+            exam_id = uuid.UUID(exam_id)
+        except ValueError:
+            return Response({'error': 'Invalid exam id'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        extras = stats.parse_extras(request.query_params.get('extras'))
+        key = stats.cache_key(exam_id, self._statistics_scope(), extras)
+        data = cache.get(key)
+        if data is None:
+            data = stats.compute_statistics(self.get_queryset().filter(exam__id=exam_id), extras)
+            cache.set(key, data, stats.CACHE_TIMEOUT)
+        
+        return Response(data)
+    
+    def _statistics_scope(self):
+        """Part of the cache key that captures which results get_queryset exposes to this user"""
+        user = self.request.user
+        if user.role == 'superadmin':
+            return 'all'
+        if user.role in ['director', 'manager', 'admin'] and user.branch:
+            return f'branch:{user.branch_id}'
+        return f'user:{user.id}'
 
-class ExamUploadViewSet(viewsets.ModelViewSet):
+class ExamUploadViewSet(FetchPlanMixin, viewsets.ModelViewSet):
     serializer_class = ExamUploadSerializer
+    fetch_plan = FetchPlan(select_related=['exam', 'uploaded_by'])
     # permission_classes = [IsAdmin]
     permission_classes = [AllowAny]
     filter_backends = [filters.OrderingFilter]
@@ -145,10 +154,29 @@ class ExamUploadViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         user = self.request.user
         if user.role == 'superadmin':
-            return ExamUpload.objects.all()
+            return self.fetch(ExamUpload.objects.all())
         if user.branch:
-            return ExamUpload.objects.filter(exam__group__branch=user.branch)
+            return self.fetch(ExamUpload.objects.filter(exam__group__branch=user.branch))
         return ExamUpload.objects.none()
     
     def perform_create(self, serializer):
         serializer.save(uploaded_by=self.request.user)
+    
+    @action(detail=True, methods=['post'])
+    def process(self, request, pk=None):
+        if request.user.role not in ['director', 'admin']:
+            return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+        
+        upload = self.get_object()
+        if not runs_inline(upload):
+            if not queue_upload(upload):
+                return Response({'error': 'Upload is already being processed'}, status=status.HTTP_409_CONFLICT)
+            upload.refresh_from_db()
+            return Response(ExamUploadSerializer(upload, context={'request': request}).data,
+                            status=status.HTTP_202_ACCEPTED)
+        
+        try:
+            upload = ingest_upload(upload)
+        except UploadBusy as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+        return Response(ExamUploadSerializer(upload, context={'request': request}).data)
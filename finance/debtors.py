@@ -0,0 +1,85 @@
+# finance/debtors.py
+import csv
+from datetime import timedelta
+from django.db.models import Count, DateField, F, Max, Q, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from .debts import PAID_STATUS
+
+# Bucket -> (fewest, most) days since the last completed payment; None is open-ended
+AGING_BUCKETS = {
+    '0_30': (0, 30),
+    '31_60': (31, 60),
+    '61_90': (61, 90),
+    '90_plus': (91, None),
+}
+CSV_COLUMNS = [
+    'student_id', 'first_name', 'last_name', 'phone', 'parent_phone', 'branch',
+    'total_paid', 'total_debt', 'last_payment', 'days_since_payment', 'aging_bucket',
+]
+CHUNK_SIZE = 2000
+
+
+def debtors(students):
+    """
+    Students of ``students`` who owe money, with ``last_payment``: the day of their last
+    completed payment, or their enrollment day when they never paid.
+    """
+    return students.filter(total_debt__gt=0).annotate(
+        last_payment=Coalesce(
+            TruncDate(Max('payment_records__paid_at', filter=Q(payment_records__status=PAID_STATUS))),
+            F('enrollment_date'),
+            output_field=DateField(),
+        ),
+    )
+
+
+def _bucket_filter(today, fewest, most):
+    since = Q(last_payment__lte=today - timedelta(days=fewest))
+    return since & Q(last_payment__gte=today - timedelta(days=most)) if most is not None else since
+
+
+def aging_report(students, today):
+    """Count and debt of the debtors in ``students``, in total and per aging bucket, in one query"""
+    rows = debtors(students)
+    # Aliases must not reuse column names: they would shadow them in the outer query
+    aggregates = {'count': Count('id'), 'debt': Sum('total_debt')}
+    for bucket, (fewest, most) in AGING_BUCKETS.items():
+        matches = _bucket_filter(today, fewest, most)
+        aggregates[f'{bucket}_count'] = Count('id', filter=matches)
+        aggregates[f'{bucket}_debt'] = Sum('total_debt', filter=matches)
+    totals = rows.aggregate(**aggregates)
+    return {
+        'count': totals['count'],
+        'total_debt': totals['debt'] or 0,
+        'aging': {
+            bucket: {'count': totals[f'{bucket}_count'], 'total_debt': totals[f'{bucket}_debt'] or 0}
+            for bucket in AGING_BUCKETS
+        },
+    }
+
+
+def bucket_of(days):
+    for bucket, (fewest, most) in AGING_BUCKETS.items():
+        if days >= fewest and (most is None or days <= most):
+            return bucket
+    return None
+
+
+class Echo:
+    """File-like object whose ``write`` hands the line back, so csv rows can be streamed"""
+
+    def write(self, value):
+        return value
+
+
+def csv_rows(students, today, chunk_size=CHUNK_SIZE):
+    """Header and one CSV line per debtor, largest debt first, read ``chunk_size`` rows at a time"""
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_COLUMNS)
+    rows = debtors(students).order_by('-total_debt', 'id').values_list(
+        'id', 'user__first_name', 'user__last_name', 'user__phone', 'parent_phone', 'branch__name',
+        'total_paid', 'total_debt', 'last_payment',
+    )
+    for *student, last_payment in rows.iterator(chunk_size=chunk_size):
+        days = (today - last_payment).days
+        yield writer.writerow([*student, last_payment, days, bucket_of(days)])
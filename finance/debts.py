@@ -0,0 +1,153 @@
+# finance/debts.py
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import DecimalField, F, Func, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Least
+from django.utils import timezone
+from core.cache import bump_branches
+from core.models import Group, Student
+from .models import PaymentDiscount, StudentCharge, StudentPayment
+
+# Payments that count as money received from the student
+PAID_STATUS = 'completed'
+MONEY = DecimalField(max_digits=12, decimal_places=2)
+BATCH_SIZE = 2000
+
+
+class DebtError(Exception):
+    pass
+
+
+def _sum(queryset, field):
+    summed = queryset.order_by().annotate(total=Func(field, function='SUM')).values('total')
+    return Coalesce(Subquery(summed), Value(Decimal(0)), output_field=MONEY)
+
+
+def charges():
+    """Course fees billed to the student, including groups they have since left"""
+    return _sum(StudentCharge.objects.filter(student=OuterRef('pk')), 'amount')
+
+
+def charge_enrolled(reprice=False, **enrollments):
+    """
+    Bill the enrollments matching ``enrollments`` (lookups on the group membership table)
+    their group's course price, in one statement. Missing charges are created; with
+    ``reprice`` existing ones also take the current price. Returns the students billed.
+    """
+    rows = Group.students.through.objects.filter(**enrollments).values_list(
+        'student_id', 'group_id', 'group__branch_id', 'group__course__price',
+    )
+    charges = [
+        StudentCharge(student_id=student_id, group_id=group_id, branch_id=branch_id, amount=price or 0)
+        for student_id, group_id, branch_id, price in rows
+    ]
+    if reprice:
+        StudentCharge.objects.bulk_create(
+            charges, update_conflicts=True, unique_fields=['student', 'group'], update_fields=['amount'],
+        )
+    else:
+        StudentCharge.objects.bulk_create(charges, ignore_conflicts=True)
+    return {charge.student_id for charge in charges}
+
+
+def paid():
+    return _sum(StudentPayment.objects.filter(student=OuterRef('pk'), status=PAID_STATUS), 'amount')
+
+
+def debt():
+    """
+    What the student owes: billed course charges less percentage discounts (capped at 100%),
+    fixed discounts and completed payments. Negative values are credit.
+    """
+    discounts = PaymentDiscount.objects.filter(student=OuterRef('pk'))
+    percent = Least(_sum(discounts.filter(discount_type='percentage'), 'value'), Value(Decimal(100)))
+    return (
+        charges() * (Value(Decimal(100)) - percent) / Value(Decimal(100))
+        - _sum(discounts.filter(discount_type='fixed'), 'value')
+        - paid()
+    )
+
+
+def _invalidate(students):
+    """The F() updates below send no post_save: retire the dashboards of the students' branches"""
+    branch_ids = set(students.order_by().values_list('branch_id', flat=True).distinct())
+    transaction.on_commit(lambda: bump_branches(branch_ids))
+
+
+def recompute(students):
+    """Rewrite ``total_paid`` and ``total_debt`` of ``students`` from the sources, in one UPDATE"""
+    updated = students.update(total_paid=paid(), total_debt=debt(), debt_updated_at=timezone.now())
+    _invalidate(students)
+    return updated
+
+
+def recompute_ids(student_ids):
+    student_ids = {student_id for student_id in student_ids if student_id}
+    if not student_ids:
+        return 0
+    return recompute(Student.objects.filter(id__in=student_ids))
+
+
+def recompute_all(batch_size=BATCH_SIZE):
+    """
+    Recompute every student in batches, first billing enrollments that have no charge yet;
+    returns the number of students whose totals changed
+    """
+    changed = 0
+    ids = list(Student.objects.order_by('id').values_list('id', flat=True))
+    for offset in range(0, len(ids), batch_size):
+        batch = Student.objects.filter(id__in=ids[offset:offset + batch_size])
+        with transaction.atomic():
+            charge_enrolled(student_id__in=ids[offset:offset + batch_size])
+            totals = ('id', 'total_paid', 'total_debt')
+            before = set(batch.values_list(*totals))
+            recompute(batch)
+            changed += len(set(batch.values_list(*totals)) - before)
+    return changed
+
+
+def apply_payment(student_id, amount):
+    """Money received (positive) or given back (negative), applied with F() updates"""
+    if student_id and amount:
+        students = Student.objects.filter(id=student_id)
+        students.update(
+            total_paid=F('total_paid') + amount, total_debt=F('total_debt') - amount, debt_updated_at=timezone.now(),
+        )
+        _invalidate(students)
+
+
+def apply_fixed_discount(student_id, amount):
+    if student_id and amount:
+        students = Student.objects.filter(id=student_id)
+        students.update(total_debt=F('total_debt') - amount, debt_updated_at=timezone.now())
+        _invalidate(students)
+
+
+def approve_payment(payment_id, user=None):
+    """
+    Complete a pending payment. The row is locked and re-checked first, so two approvals
+    cannot both count it, and the totals move in the same transaction as the status.
+    """
+    with transaction.atomic():
+        payment = StudentPayment.objects.select_for_update().get(pk=payment_id)
+        if payment.status != 'pending':
+            raise DebtError('Payment is not pending')
+        payment.status = PAID_STATUS
+        payment.approved_by = user
+        payment.paid_at = timezone.now()
+        payment.save()
+    return payment
+
+
+def counted_payment(instance):
+    """``(student_id, amount)`` a payment contributes to ``total_paid``; reads loaded values only"""
+    values = instance.__dict__
+    if values.get('status') != PAID_STATUS or values.get('amount') is None:
+        return values.get('student_id'), Decimal(0)
+    return values.get('student_id'), Decimal(values['amount'])
+
+
+def discount_state(instance):
+    values = instance.__dict__
+    return values.get('student_id'), values.get('discount_type'), values.get('value')
+
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from finance.reports import BATCH_SIZE, backfill, process_dirty, rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = ('Build daily, weekly and monthly finance reports for the days whose payments changed '
+            'since the last run. Safe to schedule every few minutes.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backfill', nargs=2, metavar=('START', 'END'),
+                            help='Rebuild every day between two YYYY-MM-DD dates instead of the queued days')
+        parser.add_argument('--rollups-only', action='store_true',
+                            help='With --backfill, only re-sum weekly and monthly rows from the existing daily rows')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Days built per transaction')
+
+    def handle(self, *args, **options):
+        if options['backfill']:
+            try:
+                start, end = (parse_date(value) for value in options['backfill'])
+            except ValueError as e:
+                raise CommandError(e)
+            if start is None or end is None or start > end:
+                raise CommandError('--backfill expects START and END dates, START not after END')
+            if options['rollups_only']:
+                written = rebuild_rollups(start, end)
+                self.stdout.write(self.style.SUCCESS(f'Rebuilt {written} weekly and monthly reports'))
+                return
+            built = backfill(start, end, batch_size=options['batch_size'])
+        else:
+            built = process_dirty(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Built finance reports for {built} branch days'))
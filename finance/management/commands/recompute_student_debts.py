@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from finance.debts import BATCH_SIZE, recompute_all
+
+
+class Command(BaseCommand):
+    help = ('Recompute every student\'s total_paid and total_debt from completed payments, '
+            'discounts and their course charges, billing enrollments that have no charge yet.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                            help='Students recomputed per transaction')
+
+    def handle(self, *args, **options):
+        changed = recompute_all(options['batch_size'])
+        if changed:
+            self.stdout.write(self.style.WARNING(f'Repaired drift on {changed} students'))
+        else:
+            self.stdout.write(self.style.SUCCESS('All student balances were up to date'))
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+from finance.wallets import post_missing, reconcile, repair_totals, teachers_without_wallet
+
+
+class Command(BaseCommand):
+    help = ('Check every teacher wallet against its ledger and the ledger against approved and '
+            'paid salary payments. Fails when something does not add up.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true',
+                            help='Post missing ledger lines for approved/paid payments and reset wallet '
+                                 'totals to the ledger')
+
+    def handle(self, *args, **options):
+        unopened = teachers_without_wallet()
+        mismatches = reconcile()
+        for teacher_id in unopened:
+            self.stdout.write(f'Teacher {teacher_id}: approved salary but no wallet')
+        for row in mismatches:
+            self.stdout.write(
+                f"Wallet {row['id']} (teacher {row['teacher_id']}): {', '.join(row['problems'])}; "
+                f"balance {row['balance']} vs ledger {row['ledger_balance']}, "
+                f"earned {row['total_earned']}/{row['ledger_earned']}/{row['expected_earned']}, "
+                f"paid {row['total_paid']}/{row['ledger_paid']}/{row['expected_paid']} (wallet/ledger/payments)"
+            )
+
+        problems = len(unopened) + len(mismatches)
+        if not problems:
+            self.stdout.write(self.style.SUCCESS('All wallets reconcile'))
+            return
+        if not options['fix']:
+            raise CommandError(f'{problems} wallets do not reconcile')
+
+        for teacher_id in unopened:
+            post_missing(teacher_id)
+        for row in mismatches:
+            if 'ledger differs from payments' in row['problems']:
+                post_missing(row['teacher_id'])
+            repair_totals(row['id'])
+        remaining = reconcile()
+        if remaining:
+            raise CommandError(f'{len(remaining)} wallets still do not reconcile; their ledger has lines '
+                               f'for payments that are no longer approved or paid')
+        self.stdout.write(self.style.SUCCESS(f'Repaired {problems} wallets'))
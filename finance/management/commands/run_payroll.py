@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.models import Branch
+from finance.payroll import PayrollError, parse_month, run_payroll
+
+
+class Command(BaseCommand):
+    help = ("Compute teachers' monthly salary payments from their non-cancelled lessons and "
+            "upsert them. Approved and paid payments are left alone.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--month', required=True, help='Month to compute, YYYY-MM')
+        parser.add_argument('--branch', action='append', dest='branches',
+                            help='Branch id; repeat for several branches (default: all branches)')
+        parser.add_argument('--dry-run', action='store_true', help='Only print what would change')
+
+    def handle(self, *args, **options):
+        try:
+            month = parse_month(options['month'])
+        except PayrollError as e:
+            raise CommandError(e)
+        branches = Branch.objects.order_by('name')
+        if options['branches']:
+            branches = branches.filter(id__in=options['branches'])
+
+        for branch in branches:
+            result = run_payroll(branch.id, month, dry_run=options['dry_run'])
+            self.stdout.write(
+                f"{branch.name}: {result['created']} created, {result['updated']} updated, "
+                f"{result['unchanged']} unchanged, {result['locked']} locked"
+            )
+            for teacher in result['teachers']:
+                if teacher['action'] == 'unchanged':
+                    continue
+                changes = ', '.join(
+                    f"{field} {change['old']} -> {change['new']}" for field, change in teacher['changes'].items()
+                )
+                self.stdout.write(f"  {teacher['action']} {teacher['teacher_name'] or teacher['teacher_id']}: {changes}")
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('Dry run, nothing was written'))
@@ -1,6 +1,7 @@
 from django.db import models
-from core.models import Teacher, Student, Branch, CustomUser
-from django.db.models import Sum
+from core.models import Teacher, Student, Branch, CustomUser, Group
+from django.db.models import Q, Sum
+from django.utils import timezone
 import uuid
 
 class FinanceReport(models.Model):
@@ -33,6 +34,23 @@ class FinanceReport(models.Model):
     class Meta:
         unique_together = ('branch', 'report_date', 'report_type')
         ordering = ['-report_date']
+        indexes = [
+            # Reports of one type over a period across branches; the unique key serves one branch
+            models.Index(fields=['report_type', 'report_date'], name='finance_report_type_date_idx'),
+        ]
+
+class FinanceDirtyDay(models.Model):
+    """A branch day whose daily FinanceReport must be rebuilt; filled by payment signals"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    branch = models.ForeignKey(Branch, on_delete=models.CASCADE, related_name='finance_dirty_days')
+    day = models.DateField()
+    marked_at = models.DateTimeField()
+    
+    def __str__(self):
+        return f"{self.branch_id} - {self.day}"
+    
+    class Meta:
+        unique_together = ('branch', 'day')
 
 class StudentPayment(models.Model):
     PAYMENT_METHOD_CHOICES = [
@@ -68,6 +86,16 @@ class StudentPayment(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination of a branch's payments
+            models.Index(fields=['branch', 'created_at', 'id'], name='finance_payment_keyset_idx'),
+            # A branch's completed payments in a period: daily income, debtor last payments
+            models.Index(fields=['branch', 'status', 'paid_at'], name='finance_payment_status_idx'),
+            # Payments waiting for approval, newest first
+            models.Index(
+                fields=['branch', '-created_at'], condition=Q(status='pending'), name='finance_payment_pending_idx',
+            ),
+        ]
 
 class TeacherPayment(models.Model):
     STATUS_CHOICES = [
@@ -152,15 +180,39 @@ class Wallet(models.Model):
     total_pending = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     updated_at = models.DateTimeField(auto_now=True)
     
-    def update_balance(self):
-        total_payments = self.teacher.salary_payments.filter(status='paid').aggregate(Sum('total_amount'))['total_amount__sum'] or 0
-        self.total_paid = total_payments
-        self.balance = self.total_earned - self.total_paid
-        self.save()
-    
     def __str__(self):
         return f"Wallet - {self.teacher.user.get_full_name()}"
 
+class WalletEntry(models.Model):
+    """
+    Append-only ledger line. Earnings are credited when a salary payment is approved and
+    payouts debited when it is paid. ``amount`` is signed, so a wallet's balance is the sum of
+    its entries; ``balance_after`` is the balance once the line was applied.
+    """
+    ENTRY_TYPE_CHOICES = [
+        ('earning', 'Earning'),
+        ('payout', 'Payout'),
+        ('adjustment', 'Adjustment'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    wallet = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name='entries')
+    payment = models.ForeignKey(TeacherPayment, on_delete=models.PROTECT, null=True, blank=True, related_name='wallet_entries')
+    entry_type = models.CharField(max_length=20, choices=ENTRY_TYPE_CHOICES)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    balance_after = models.DecimalField(max_digits=10, decimal_places=2)
+    created_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True, related_name='wallet_entries')
+    note = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.entry_type} {self.amount} - {self.wallet_id}"
+    
+    class Meta:
+        # A salary payment is credited and paid out at most once
+        unique_together = ('payment', 'entry_type')
+        ordering = ['-created_at']
+
 class PaymentDiscount(models.Model):
     DISCOUNT_TYPE_CHOICES = [
         ('percentage', 'Percentage'),
@@ -179,6 +231,25 @@ class PaymentDiscount(models.Model):
     def __str__(self):
         return f"Discount for {self.student.user.get_full_name()}"
 
+class StudentCharge(models.Model):
+    """
+    The course fee a student is billed for a group: created when they join, repriced while
+    they stay, and kept when they leave so what they already owed does not disappear
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='charges')
+    group = models.ForeignKey(Group, on_delete=models.SET_NULL, null=True, related_name='student_charges')
+    branch = models.ForeignKey(Branch, on_delete=models.CASCADE)
+    amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    charged_on = models.DateField(default=timezone.localdate)
+    
+    def __str__(self):
+        return f"{self.student_id} - {self.group_id}: {self.amount}"
+    
+    class Meta:
+        # One charge per enrollment; rejoining a group does not bill it again
+        unique_together = ('student', 'group')
+
 class IncomeLead(models.Model):
     SOURCE_CHOICES = [
         ('instagram', 'Instagram'),
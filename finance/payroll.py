@@ -0,0 +1,125 @@
+# finance/payroll.py
+from datetime import datetime, time
+from decimal import ROUND_HALF_UP, Decimal
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+from core.models import Lesson
+from .models import TeacherPayment
+from .summary import next_period
+
+AMOUNT_FIELDS = ['hourly_amount', 'group_amount', 'total_amount']
+CENT = Decimal('0.01')
+# Diff action -> counter in the run summary
+SUMMARY_KEYS = {'create': 'created', 'update': 'updated', 'unchanged': 'unchanged', 'locked': 'locked'}
+
+
+class PayrollError(ValueError):
+    pass
+
+
+def parse_month(value):
+    """``YYYY-MM`` (or any ``YYYY-MM-DD`` in it) -> first day of that month"""
+    for pattern in ('%Y-%m', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(str(value), pattern).date().replace(day=1)
+        except ValueError:
+            continue
+    raise PayrollError('month must be YYYY-MM')
+
+
+def _bounds(month):
+    start = timezone.make_aware(datetime.combine(month, time.min))
+    return start, timezone.make_aware(datetime.combine(next_period(month, 'month'), time.min))
+
+
+def teaching_load(branch_id, month):
+    """Taught minutes, distinct groups and rates per teacher for the month, in one grouped query"""
+    start, end = _bounds(month)
+    return {
+        row['teacher']: row for row in Lesson.objects.filter(
+            branch_id=branch_id, start_time__gte=start, start_time__lt=end, is_cancelled=False,
+        ).values(
+            'teacher', 'teacher__hourly_rate', 'teacher__group_rate',
+            'teacher__user__first_name', 'teacher__user__last_name',
+        ).annotate(
+            minutes=Sum('duration_minutes'), groups=Count('group', distinct=True),
+        ).order_by()
+    }
+
+
+def _amounts(load, bonus, penalty):
+    if load is None:
+        hourly = group = Decimal(0)
+    else:
+        hourly = (Decimal(load['minutes']) / 60 * load['teacher__hourly_rate']).quantize(CENT, ROUND_HALF_UP)
+        group = (load['groups'] * load['teacher__group_rate']).quantize(CENT, ROUND_HALF_UP)
+    return {'hourly_amount': hourly, 'group_amount': group, 'total_amount': hourly + group + bonus - penalty}
+
+
+def run_payroll(branch_id, month, dry_run=False):
+    """
+    Compute every teacher's hourly and group amounts for ``month`` from their non-cancelled
+    lessons in the branch and upsert the TeacherPayment rows in bulk. Bonus and penalty are
+    kept; payments that are no longer pending are never changed. With ``dry_run`` nothing is
+    written and the result only describes what would change.
+    """
+    month = parse_month(month)
+    with transaction.atomic():
+        load = teaching_load(branch_id, month)
+        existing = TeacherPayment.objects.filter(branch_id=branch_id, month=month).select_related('teacher__user')
+        if not dry_run:
+            existing = existing.select_for_update(of=('self',))
+        existing = {payment.teacher_id: payment for payment in existing}
+
+        teachers = []
+        rows = []
+        counts = dict.fromkeys(SUMMARY_KEYS.values(), 0)
+        for teacher_id in load.keys() | existing.keys():
+            payment = existing.get(teacher_id)
+            lessons = load.get(teacher_id)
+            new = _amounts(lessons, payment.bonus if payment else 0, payment.penalty if payment else 0)
+            if payment is None:
+                action = 'create'
+                changes = {field: {'old': None, 'new': new[field]} for field in AMOUNT_FIELDS}
+            else:
+                changes = {
+                    field: {'old': getattr(payment, field), 'new': new[field]}
+                    for field in AMOUNT_FIELDS if getattr(payment, field) != new[field]
+                }
+                action = 'locked' if changes and payment.status != 'pending' else 'update' if changes else 'unchanged'
+            counts[SUMMARY_KEYS[action]] += 1
+            if action in ('create', 'update'):
+                rows.append(TeacherPayment(
+                    teacher_id=teacher_id, branch_id=branch_id, month=month, **new,
+                    bonus=payment.bonus if payment else 0, penalty=payment.penalty if payment else 0,
+                ))
+            if lessons:
+                name = f"{lessons['teacher__user__first_name']} {lessons['teacher__user__last_name']}".strip()
+            else:
+                name = payment.teacher.user.get_full_name()
+            teachers.append({
+                'teacher_id': teacher_id,
+                'teacher_name': name,
+                'action': action,
+                'lesson_minutes': lessons['minutes'] if lessons else 0,
+                'groups': lessons['groups'] if lessons else 0,
+                'changes': changes,
+            })
+
+        if rows and not dry_run:
+            TeacherPayment.objects.bulk_create(
+                rows,
+                update_conflicts=True,
+                unique_fields=['teacher', 'branch', 'month'],
+                update_fields=[*AMOUNT_FIELDS, 'updated_at'],
+            )
+
+    teachers.sort(key=lambda item: (item['teacher_name'], str(item['teacher_id'])))
+    return {
+        'branch_id': branch_id,
+        'month': month,
+        'dry_run': dry_run,
+        **counts,
+        'teachers': teachers,
+    }
@@ -0,0 +1,185 @@
+# finance/reports.py
+from collections import defaultdict
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+from django.db import transaction
+from django.db.models import F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from core.cache import bump_branches
+from .models import FinanceDirtyDay, FinanceReport, StaffPayment, StudentPayment, TeacherPayment
+from .summary import GRANULARITIES, next_period, period_start
+
+# FinanceReport column <- (model, rows that count, day the money moved, amount)
+SOURCES = {
+    'total_student_payments': (StudentPayment, Q(status='completed'), TruncDate('paid_at'), 'amount'),
+    'teacher_payments': (TeacherPayment, Q(status='paid'), F('paid_date'), 'total_amount'),
+    'staff_payments': (StaffPayment, Q(status='paid'), F('paid_date'), 'total_amount'),
+}
+# other_expenses is entered by hand; it is kept and summed but never computed
+TOTALS = [*SOURCES, 'other_expenses', 'profit']
+# Rollup report type -> period it covers
+ROLLUPS = {'weekly': 'week', 'monthly': 'month'}
+BATCH_SIZE = 500
+
+
+def report_day(instance):
+    """``(branch_id, day)`` a payment counts towards, or None; reads loaded values only"""
+    values = instance.__dict__
+    if isinstance(instance, StudentPayment):
+        day = values.get('paid_at') and timezone.localdate(values['paid_at'])
+    else:
+        day = values.get('paid_date')
+    branch_id = values.get('branch_id')
+    return (branch_id, day) if branch_id and day else None
+
+
+def mark_days(slices):
+    """Queue ``(branch_id, day)`` pairs for the next build; re-marking refreshes ``marked_at``"""
+    now = timezone.now()
+    rows = [FinanceDirtyDay(branch_id=branch_id, day=day, marked_at=now) for branch_id, day in set(slices)]
+    if rows:
+        FinanceDirtyDay.objects.bulk_create(
+            rows, update_conflicts=True, unique_fields=['branch', 'day'], update_fields=['marked_at'],
+        )
+    return len(rows)
+
+
+def _slice_filter(slices, branch='branch_id', day='day'):
+    days = defaultdict(set)
+    for branch_id, value in slices:
+        days[branch_id].add(value)
+    return reduce(or_, [Q(**{branch: branch_id, f'{day}__in': values}) for branch_id, values in days.items()])
+
+
+def _daily_totals(slices):
+    """Money moved per (branch, day) of ``slices``, one grouped query per source"""
+    totals = defaultdict(lambda: dict.fromkeys(SOURCES, Decimal(0)))
+    for column, (model, counted, day, amount) in SOURCES.items():
+        rows = model.objects.filter(counted).annotate(day=day).filter(
+            _slice_filter(slices),
+        ).values('branch_id', 'day').annotate(total=Sum(amount)).order_by()
+        for row in rows:
+            totals[(row['branch_id'], row['day'])][column] = row['total']
+    return totals
+
+
+def _upsert(reports):
+    FinanceReport.objects.bulk_create(
+        reports,
+        update_conflicts=True,
+        unique_fields=['branch', 'report_date', 'report_type'],
+        update_fields=[*TOTALS, 'updated_at'],
+    )
+
+
+def _period_runs(slices, unit):
+    """
+    ``(branch_id, first, end)`` date ranges covering the ``unit`` periods that contain
+    ``slices``: one per run of consecutive periods, so untouched periods in between are skipped
+    """
+    periods = sorted({(branch_id, period_start(day, unit)) for branch_id, day in slices})
+    runs = []
+    for branch_id, start in periods:
+        if runs and runs[-1][0] == branch_id and runs[-1][2] == start:
+            runs[-1][2] = next_period(start, unit)
+        else:
+            runs.append([branch_id, start, next_period(start, unit)])
+    return runs
+
+
+def refresh_rollups(slices):
+    """Rebuild the weekly and monthly rows covering ``slices`` by summing their daily rows"""
+    slices = set(slices)
+    written = 0
+    for report_type, unit in ROLLUPS.items() if slices else ():
+        covered = reduce(or_, [
+            Q(branch_id=branch_id, report_date__gte=first, report_date__lt=end)
+            for branch_id, first, end in _period_runs(slices, unit)
+        ])
+        rows = FinanceReport.objects.filter(covered, report_type='daily').annotate(
+            period=GRANULARITIES[unit]('report_date'),
+        ).values('branch_id', 'period').annotate(**{column: Sum(column) for column in TOTALS}).order_by()
+        reports = [
+            FinanceReport(
+                branch_id=row['branch_id'], report_date=row['period'], report_type=report_type,
+                **{column: row[column] for column in TOTALS},
+            )
+            for row in rows
+        ]
+        _upsert(reports)
+        written += len(reports)
+    return written
+
+
+def build_days(slices):
+    """
+    Recompute the daily FinanceReport of every ``(branch_id, day)`` in ``slices`` from the raw
+    payments, then the weekly and monthly rows containing them, with a constant number of
+    queries. Returns the number of daily rows written.
+    """
+    slices = set(slices)
+    if not slices:
+        return 0
+    totals = _daily_totals(slices)
+    other_expenses = {
+        (branch_id, day): value for branch_id, day, value in FinanceReport.objects.filter(
+            _slice_filter(slices, day='report_date'), report_type='daily',
+        ).values_list('branch_id', 'report_date', 'other_expenses')
+    }
+
+    reports = []
+    for branch_id, day in slices:
+        moved = totals.get((branch_id, day), dict.fromkeys(SOURCES, Decimal(0)))
+        other = other_expenses.get((branch_id, day), Decimal(0))
+        reports.append(FinanceReport(
+            branch_id=branch_id, report_date=day, report_type='daily', other_expenses=other,
+            profit=moved['total_student_payments'] - moved['teacher_payments'] - moved['staff_payments'] - other,
+            **moved,
+        ))
+    with transaction.atomic():
+        _upsert(reports)
+        refresh_rollups(slices)
+        bump_branches(branch_id for branch_id, _ in slices)
+    return len(reports)
+
+
+def process_dirty(batch_size=BATCH_SIZE):
+    """
+    Build the reports of every queued day, ``batch_size`` days per transaction. Queue rows are
+    locked while their day is built, so concurrent runs skip them and payments written meanwhile
+    queue the day again. Returns the number of days built.
+    """
+    built = 0
+    while True:
+        with transaction.atomic():
+            dirty = list(FinanceDirtyDay.objects.select_for_update(skip_locked=True).order_by('day')[:batch_size])
+            if not dirty:
+                return built
+            built += build_days((row.branch_id, row.day) for row in dirty)
+            FinanceDirtyDay.objects.filter(id__in=[row.id for row in dirty]).delete()
+
+
+def backfill(start, end, batch_size=BATCH_SIZE):
+    """Build every day between ``start`` and ``end`` that has payments or an existing report"""
+    sources = [
+        model.objects.filter(counted).annotate(day=day).filter(day__gte=start, day__lte=end).values_list('branch_id', 'day')
+        for model, counted, day, _ in SOURCES.values()
+    ]
+    sources.append(FinanceReport.objects.filter(
+        report_type='daily', report_date__gte=start, report_date__lte=end,
+    ).values_list('branch_id', 'report_date'))
+    slices = sorted(set(sources[0].union(*sources[1:])), key=lambda item: item[1])
+    for offset in range(0, len(slices), batch_size):
+        build_days(slices[offset:offset + batch_size])
+    return len(slices)
+
+
+def rebuild_rollups(start, end):
+    """Re-sum the weekly and monthly rows between ``start`` and ``end`` from the existing daily rows"""
+    slices = FinanceReport.objects.filter(
+        report_type='daily', report_date__gte=start, report_date__lte=end,
+    ).values_list('branch_id', 'report_date').distinct()
+    with transaction.atomic():
+        return refresh_rollups(slices)
@@ -1,11 +1,12 @@
 from rest_framework import serializers
 from .models import (
     FinanceReport, StudentPayment, TeacherPayment, StaffPayment,
-    Wallet, PaymentDiscount, IncomeLead
+    Wallet, WalletEntry, PaymentDiscount, IncomeLead
 )
 from core.models import Teacher
+from core.serializers import SparseFieldsMixin
 
-class FinanceReportSerializer(serializers.ModelSerializer):
+class FinanceReportSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     branch_name = serializers.CharField(source='branch.name', read_only=True)
     
     class Meta:
@@ -15,7 +16,7 @@ class FinanceReportSerializer(serializers.ModelSerializer):
                   'other_expenses', 'profit', 'created_at', 'updated_at']
         read_only_fields = ['created_at', 'updated_at', 'profit']
 
-class StudentPaymentSerializer(serializers.ModelSerializer):
+class StudentPaymentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     student_name = serializers.CharField(source='student.user.get_full_name', read_only=True)
     approved_by_name = serializers.CharField(source='approved_by.get_full_name', read_only=True)
     
@@ -26,7 +27,7 @@ class StudentPaymentSerializer(serializers.ModelSerializer):
                   'notes', 'paid_at', 'created_at', 'updated_at']
         read_only_fields = ['created_at', 'updated_at']
 
-class TeacherPaymentSerializer(serializers.ModelSerializer):
+class TeacherPaymentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     teacher_name = serializers.CharField(source='teacher.user.get_full_name', read_only=True)
     approved_by_name = serializers.CharField(source='approved_by.get_full_name', read_only=True)
     
@@ -36,9 +37,9 @@ class TeacherPaymentSerializer(serializers.ModelSerializer):
                   'group_amount', 'bonus', 'penalty', 'total_amount', 'status',
                   'approved_by', 'approved_by_name', 'paid_date', 'payment_method',
                   'notes', 'created_at', 'updated_at']
-        read_only_fields = ['total_amount', 'created_at', 'updated_at']
+        read_only_fields = ['total_amount', 'status', 'approved_by', 'paid_date', 'created_at', 'updated_at']
 
-class StaffPaymentSerializer(serializers.ModelSerializer):
+class StaffPaymentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     staff_name = serializers.CharField(source='staff_member.get_full_name', read_only=True)
     
     class Meta:
@@ -47,7 +48,7 @@ class StaffPaymentSerializer(serializers.ModelSerializer):
                   'salary', 'bonus', 'penalty', 'total_amount', 'status', 'paid_date', 'created_at']
         read_only_fields = ['total_amount', 'created_at']
 
-class WalletSerializer(serializers.ModelSerializer):
+class WalletSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     teacher_name = serializers.CharField(source='teacher.user.get_full_name', read_only=True)
     
     class Meta:
@@ -56,7 +57,16 @@ class WalletSerializer(serializers.ModelSerializer):
                   'total_paid', 'total_pending', 'updated_at']
         read_only_fields = ['balance', 'total_earned', 'total_paid', 'total_pending', 'updated_at']
 
-class PaymentDiscountSerializer(serializers.ModelSerializer):
+class WalletEntrySerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    payment_month = serializers.DateField(source='payment.month', read_only=True, default=None)
+    
+    class Meta:
+        model = WalletEntry
+        fields = ['id', 'entry_type', 'amount', 'balance_after', 'payment', 'payment_month',
+                  'note', 'created_by', 'created_at']
+        read_only_fields = fields
+
+class PaymentDiscountSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     student_name = serializers.CharField(source='student.user.get_full_name', read_only=True)
     applied_by_name = serializers.CharField(source='applied_by.get_full_name', read_only=True)
     
@@ -66,7 +76,7 @@ class PaymentDiscountSerializer(serializers.ModelSerializer):
                   'reason', 'applied_by', 'applied_by_name', 'created_at']
         read_only_fields = ['created_at']
 
-class IncomeLeadSerializer(serializers.ModelSerializer):
+class IncomeLeadSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     converted_student_name = serializers.CharField(source='converted_student.user.get_full_name', read_only=True)
     branch_name = serializers.CharField(source='branch.name', read_only=True)
     
@@ -0,0 +1,111 @@
+# finance/signals.py
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save
+from core.models import Course, Group
+from . import debts, reports
+from .models import PaymentDiscount, StaffPayment, StudentPayment, TeacherPayment
+
+
+def remember_report_day(sender, instance, **kwargs):
+    # The day a payment counted towards when loaded, so moving it also rebuilds the old day
+    instance._report_day = reports.report_day(instance)
+
+
+def queue_saved_payment(sender, instance, **kwargs):
+    current = reports.report_day(instance)
+    reports.mark_days(day for day in (instance._report_day, current) if day)
+    instance._report_day = current
+
+
+def queue_deleted_payment(sender, instance, **kwargs):
+    reports.mark_days(day for day in (instance._report_day, reports.report_day(instance)) if day)
+
+
+for model in (StudentPayment, TeacherPayment, StaffPayment):
+    label = model._meta.label
+    post_init.connect(remember_report_day, sender=model, dispatch_uid=f'finance-report-init:{label}')
+    post_save.connect(queue_saved_payment, sender=model, dispatch_uid=f'finance-report-save:{label}')
+    post_delete.connect(queue_deleted_payment, sender=model, dispatch_uid=f'finance-report-delete:{label}')
+
+
+# ---- Student.total_paid / total_debt ----
+
+def remember_payment(sender, instance, **kwargs):
+    instance._counted_payment = debts.counted_payment(instance)
+
+
+def apply_saved_payment(sender, instance, created=False, **kwargs):
+    current = debts.counted_payment(instance)
+    old_student, old_amount = (None, 0) if created else instance._counted_payment
+    if old_student == current[0]:
+        debts.apply_payment(current[0], current[1] - old_amount)
+    else:
+        debts.apply_payment(old_student, -old_amount)
+        debts.apply_payment(*current)
+    instance._counted_payment = current
+
+
+def apply_deleted_payment(sender, instance, **kwargs):
+    student_id, amount = instance._counted_payment
+    debts.apply_payment(student_id, -amount)
+
+
+def remember_discount(sender, instance, **kwargs):
+    instance._discount_state = debts.discount_state(instance)
+
+
+def apply_saved_discount(sender, instance, created=False, **kwargs):
+    current = debts.discount_state(instance)
+    if created and instance.discount_type == 'fixed':
+        debts.apply_fixed_discount(instance.student_id, instance.value)
+    elif created or current != instance._discount_state:
+        # Percentage discounts scale the course charges, so the debt is recomputed
+        debts.recompute_ids([instance._discount_state[0], instance.student_id])
+    instance._discount_state = current
+
+
+def apply_deleted_discount(sender, instance, **kwargs):
+    debts.recompute_ids([instance._discount_state[0], instance.student_id])
+
+
+def apply_enrollment(sender, instance, action, reverse, model, pk_set, **kwargs):
+    # Leaving a group keeps its charge, so only joining moves the debt
+    if action != 'post_add' or not pk_set:
+        return
+    if reverse:
+        billed = debts.charge_enrolled(student_id=instance.pk, group_id__in=pk_set)
+    else:
+        billed = debts.charge_enrolled(group_id=instance.pk, student_id__in=pk_set)
+    debts.recompute_ids(billed)
+
+
+def remember_course(sender, instance, **kwargs):
+    instance._course_id = instance.__dict__.get('course_id')
+
+
+def reprice_group(sender, instance, created=False, **kwargs):
+    if not created and instance.course_id != instance._course_id:
+        debts.recompute_ids(debts.charge_enrolled(reprice=True, group_id=instance.pk))
+    instance._course_id = instance.course_id
+
+
+def remember_price(sender, instance, **kwargs):
+    instance._price = instance.__dict__.get('price')
+
+
+def reprice_course(sender, instance, created=False, **kwargs):
+    if not created and instance.price != instance._price:
+        debts.recompute_ids(debts.charge_enrolled(reprice=True, group__course_id=instance.pk))
+    instance._price = instance.price
+
+
+post_init.connect(remember_payment, sender=StudentPayment, dispatch_uid='student-debt-payment-init')
+post_save.connect(apply_saved_payment, sender=StudentPayment, dispatch_uid='student-debt-payment-save')
+post_delete.connect(apply_deleted_payment, sender=StudentPayment, dispatch_uid='student-debt-payment-delete')
+post_init.connect(remember_discount, sender=PaymentDiscount, dispatch_uid='student-debt-discount-init')
+post_save.connect(apply_saved_discount, sender=PaymentDiscount, dispatch_uid='student-debt-discount-save')
+post_delete.connect(apply_deleted_discount, sender=PaymentDiscount, dispatch_uid='student-debt-discount-delete')
+m2m_changed.connect(apply_enrollment, sender=Group.students.through, dispatch_uid='student-debt-enrollment')
+post_init.connect(remember_course, sender=Group, dispatch_uid='student-debt-group-init')
+post_save.connect(reprice_group, sender=Group, dispatch_uid='student-debt-group-save')
+post_init.connect(remember_price, sender=Course, dispatch_uid='student-debt-course-init')
+post_save.connect(reprice_course, sender=Course, dispatch_uid='student-debt-course-save')
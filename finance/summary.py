@@ -0,0 +1,159 @@
+# finance/summary.py
+from datetime import timedelta
+from decimal import Decimal
+from django.db.models import F, Q, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncQuarter, TruncWeek, TruncYear
+
+GRANULARITIES = {
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+    'quarter': TruncQuarter,
+    'year': TruncYear,
+}
+LABELS = {
+    'day': lambda period: period.isoformat(),
+    'week': lambda period: period.isoformat(),
+    'month': lambda period: period.strftime('%Y-%m'),
+    'quarter': lambda period: f'{period.year}-Q{(period.month - 1) // 3 + 1}',
+    'year': lambda period: str(period.year),
+}
+# Rollup rows that nest inside each granularity; totals over a range use monthly rows
+ROLLUP_FOR = {'day': None, 'week': 'weekly', 'month': 'monthly', 'quarter': 'monthly', 'year': 'monthly', None: 'monthly'}
+# Response key -> aggregate. Queries alias each one as ``<key>_total`` (see ALIASES) so no
+# alias matches a column that another aggregate adds up.
+AMOUNTS = {
+    'expenses': Sum(F('teacher_payments') + F('staff_payments') + F('other_expenses')),
+    'income': Sum('total_student_payments'),
+    'teacher_payments': Sum('teacher_payments'),
+    'staff_payments': Sum('staff_payments'),
+    'other_expenses': Sum('other_expenses'),
+    'profit': Sum('profit'),
+}
+ALIASES = {name: f'{name}_total' for name in AMOUNTS}
+ZERO = dict.fromkeys(AMOUNTS, Decimal(0))
+MAX_PERIODS = 1000
+
+
+class SummaryError(ValueError):
+    pass
+
+
+def period_start(day, granularity):
+    """First day of the ``granularity`` bucket containing ``day``, as the database truncates it"""
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    if granularity == 'quarter':
+        return day.replace(month=(day.month - 1) // 3 * 3 + 1, day=1)
+    if granularity == 'year':
+        return day.replace(month=1, day=1)
+    return day
+
+
+def next_period(period, granularity):
+    if granularity == 'day':
+        return period + timedelta(days=1)
+    if granularity == 'week':
+        return period + timedelta(days=7)
+    step = {'month': 1, 'quarter': 3, 'year': 12}[granularity]
+    month = period.month - 1 + step
+    return period.replace(year=period.year + month // 12, month=month % 12 + 1)
+
+
+def periods(start, end, granularity):
+    """Every bucket from the one containing ``start`` to the one containing ``end``"""
+    if granularity not in GRANULARITIES:
+        raise SummaryError(f'granularity must be one of: {", ".join(GRANULARITIES)}')
+    if start > end:
+        raise SummaryError('start must not be after end')
+    result = []
+    period = period_start(start, granularity)
+    while period <= end:
+        result.append(period)
+        if len(result) > MAX_PERIODS:
+            raise SummaryError(f'The range spans more than {MAX_PERIODS} periods')
+        period = next_period(period, granularity)
+    return result
+
+
+def months_back(today, months):
+    """First day of the month ``months - 1`` calendar months before ``today``"""
+    month = today.year * 12 + today.month - 1 - (months - 1)
+    return today.replace(year=month // 12, month=month % 12 + 1, day=1)
+
+
+def _aggregates():
+    return {ALIASES[name]: aggregate for name, aggregate in AMOUNTS.items()}
+
+
+def _amounts(row):
+    """The response keys of an aggregated ``row``, with missing totals as zero"""
+    return {name: row[alias] if row[alias] is not None else Decimal(0) for name, alias in ALIASES.items()}
+
+
+def covering_rows(start, end, rollup='monthly'):
+    """
+    Filter selecting report rows that add up to exactly ``start``..``end``: ``rollup`` rows for
+    the whole weeks or months inside the range and daily rows only for the partial edges.
+    """
+    daily = Q(report_type='daily')
+    if rollup is None:
+        return daily & Q(report_date__gte=start, report_date__lte=end)
+    unit = 'week' if rollup == 'weekly' else 'month'
+    first = period_start(start, unit)
+    if first < start:
+        first = next_period(first, unit)
+    last = period_start(end + timedelta(days=1), unit)
+    if first >= last:
+        return daily & Q(report_date__gte=start, report_date__lte=end)
+    return (
+        Q(report_type=rollup, report_date__gte=first, report_date__lt=last)
+        | daily & Q(report_date__gte=start, report_date__lt=first)
+        | daily & Q(report_date__gte=last, report_date__lte=end)
+    )
+
+
+def summarize(reports, start, end):
+    """Income, expense and profit totals of ``reports`` between ``start`` and ``end``, in one query"""
+    if start > end:
+        raise SummaryError('start must not be after end')
+    return _amounts(reports.filter(covering_rows(start, end)).aggregate(**_aggregates()))
+
+
+def series(reports, start, end, granularity='month', by_branch=False):
+    """
+    Totals of ``reports`` per ``granularity`` bucket between ``start`` and ``end``, oldest
+    first, from one grouped query over the rollups. Buckets without reports are zero. With
+    ``by_branch`` each bucket also lists the branches that have reports anywhere in the range.
+    """
+    buckets = periods(start, end, granularity)
+    keys = ['period', 'branch', 'branch__name'] if by_branch else ['period']
+    rows = reports.filter(covering_rows(start, end, ROLLUP_FOR[granularity])).annotate(
+        period=GRANULARITIES[granularity]('report_date'),
+    ).values(*keys).annotate(**_aggregates()).order_by(*keys)
+
+    totals = {}
+    branches = {}
+    per_branch = {}
+    for row in rows:
+        values = _amounts(row)
+        total = totals.setdefault(row['period'], dict(ZERO))
+        for name, value in values.items():
+            total[name] += value
+        if by_branch:
+            branches[row['branch']] = row['branch__name']
+            per_branch[(row['period'], row['branch'])] = values
+
+    label = LABELS[granularity]
+    result = []
+    for period in buckets:
+        item = {'period': label(period), 'period_start': period, **totals.get(period, ZERO)}
+        if by_branch:
+            item['branches'] = [
+                {'branch_id': branch_id, 'name': name, **per_branch.get((period, branch_id), ZERO)}
+                for branch_id, name in sorted(branches.items(), key=lambda branch: branch[1])
+            ]
+        result.append(item)
+    return result
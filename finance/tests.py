@@ -0,0 +1,511 @@
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from core.models import Organization, Branch, Course, CustomUser, Teacher, Student, Group, Lesson
+from .models import (
+    FinanceDirtyDay, FinanceReport, PaymentDiscount, StaffPayment, StudentCharge, StudentPayment, TeacherPayment, Wallet,
+    WalletEntry,
+)
+from . import debts
+from .reports import build_days, process_dirty, refresh_rollups
+from .summary import covering_rows, summarize
+from .views import FinanceReportViewSet, StudentPaymentViewSet, TeacherPaymentViewSet, WalletViewSet
+from .payroll import run_payroll
+from .wallets import reconcile
+
+
+def local(year, month, day, hour=12):
+    return timezone.make_aware(datetime(year, month, day, hour))
+
+
+class FinanceReportBuilderTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        organization = Organization.objects.create(name='Org', address='-', phone='1', email='org@example.com')
+        cls.branch = Branch.objects.create(organization=organization, name='Main', address='-', phone='1')
+        cls.teacher = Teacher.objects.create(
+            user=CustomUser.objects.create(username='teacher', role='teacher'), branch=cls.branch,
+            hourly_rate=10, group_rate=100,
+        )
+        cls.student = Student.objects.create(user=CustomUser.objects.create(username='student'), branch=cls.branch)
+        cls.staff = CustomUser.objects.create(username='staff', role='admin')
+
+    def pay(self, receipt, amount, paid_at, status='completed'):
+        return StudentPayment.objects.create(
+            student=self.student, branch=self.branch, amount=amount, payment_method='cash',
+            receipt_number=receipt, status=status, paid_at=paid_at,
+        )
+
+    def report(self, report_date, report_type='daily'):
+        return FinanceReport.objects.get(branch=self.branch, report_date=report_date, report_type=report_type)
+
+    def test_payments_queue_their_day(self):
+        payment = self.pay('R1', 100, local(2024, 3, 4))
+        self.pay('R2', 50, None, status='pending')
+        self.assertEqual(list(FinanceDirtyDay.objects.values_list('day', flat=True)), [date(2024, 3, 4)])
+
+        payment.paid_at = local(2024, 3, 6)
+        payment.save()
+        self.assertEqual(sorted(FinanceDirtyDay.objects.values_list('day', flat=True)),
+                         [date(2024, 3, 4), date(2024, 3, 6)])
+
+    def test_daily_reports_and_rollups(self):
+        self.pay('R1', 100, local(2024, 3, 4))
+        self.pay('R2', 40, local(2024, 3, 5))
+        self.pay('R3', 999, local(2024, 3, 5), status='refunded')
+        TeacherPayment.objects.create(teacher=self.teacher, branch=self.branch, month=date(2024, 3, 1),
+                                      total_amount=30, status='paid', paid_date=date(2024, 3, 5))
+        StaffPayment.objects.create(staff_member=self.staff, branch=self.branch, month=date(2024, 3, 1),
+                                    position='admin', salary=20, total_amount=20, status='paid', paid_date=date(2024, 3, 11))
+        FinanceReport.objects.create(branch=self.branch, report_date=date(2024, 3, 5), other_expenses=5)
+
+        self.assertEqual(process_dirty(), 3)
+
+        day = self.report(date(2024, 3, 5))
+        self.assertEqual((day.total_student_payments, day.teacher_payments, day.other_expenses, day.profit),
+                         (40, 30, 5, 5))
+        week = self.report(date(2024, 3, 4), 'weekly')
+        self.assertEqual((week.total_student_payments, week.profit), (140, 105))
+        self.assertEqual(self.report(date(2024, 3, 11), 'weekly').profit, -20)
+        month = self.report(date(2024, 3, 1), 'monthly')
+        self.assertEqual((month.total_student_payments, month.staff_payments, month.profit), (140, 20, 85))
+        self.assertFalse(FinanceDirtyDay.objects.exists())
+
+    def test_only_changed_days_are_rebuilt(self):
+        payment = self.pay('R1', 100, local(2024, 3, 4))
+        self.pay('R2', 60, local(2024, 3, 20))
+        process_dirty()
+
+        payment.status = 'refunded'
+        payment.save()
+        self.assertEqual(process_dirty(), 1)
+        self.assertEqual(self.report(date(2024, 3, 4)).total_student_payments, 0)
+        self.assertEqual(self.report(date(2024, 3, 1), 'monthly').total_student_payments, 60)
+        self.assertEqual(process_dirty(), 0)
+
+    def test_backfill_command(self):
+        self.pay('R1', 100, local(2024, 1, 31))
+        self.pay('R2', 70, local(2024, 2, 1))
+        FinanceDirtyDay.objects.all().delete()
+
+        out = StringIO()
+        call_command('build_finance_reports', backfill=['2024-01-01', '2024-01-31'], stdout=out)
+        self.assertIn('for 1 branch days', out.getvalue())
+        self.assertEqual(self.report(date(2024, 1, 1), 'monthly').total_student_payments, Decimal(100))
+        self.assertFalse(FinanceReport.objects.filter(report_date__gte=date(2024, 2, 1)).exists())
+
+    def test_rollups_skip_untouched_periods_between_dirty_days(self):
+        for day in (date(2024, 1, 10), date(2024, 2, 14), date(2024, 3, 6)):
+            FinanceReport.objects.create(branch=self.branch, report_date=day, total_student_payments=10, profit=10)
+        refresh_rollups([(self.branch.id, date(2024, 2, 14))])
+        FinanceReport.objects.filter(report_date=date(2024, 2, 14), report_type='daily').update(total_student_payments=99)
+
+        self.assertEqual(refresh_rollups([(self.branch.id, date(2024, 1, 10)), (self.branch.id, date(2024, 3, 6))]), 4)
+        self.assertEqual(self.report(date(2024, 2, 1), 'monthly').total_student_payments, 10)
+        self.assertEqual(self.report(date(2024, 3, 1), 'monthly').total_student_payments, 10)
+        self.assertEqual(self.report(date(2024, 2, 12), 'weekly').total_student_payments, 10)
+
+    def test_build_days_keeps_manual_expenses(self):
+        FinanceReport.objects.create(branch=self.branch, report_date=date(2024, 3, 4), other_expenses=12)
+        build_days([(self.branch.id, date(2024, 3, 4))])
+        self.assertEqual(self.report(date(2024, 3, 4)).profit, -12)
+
+
+class FinanceSummaryTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.organization = Organization.objects.create(name='Org', address='-', phone='1', email='org@example.com')
+        cls.north, cls.south = [
+            Branch.objects.create(organization=cls.organization, name=name, address='-', phone='1')
+            for name in ('North', 'South')
+        ]
+        other = Organization.objects.create(name='Other', address='-', phone='1', email='other@example.com')
+        cls.elsewhere = Branch.objects.create(organization=other, name='Elsewhere', address='-', phone='1')
+        cls.director = CustomUser.objects.create(username='director', role='director', organization=cls.organization)
+        cls.manager = CustomUser.objects.create(username='manager', role='manager', branch=cls.north)
+        cls.superadmin = CustomUser.objects.create(username='root', role='superadmin')
+        # 10 income every day of 2023 and 2024 for both branches of the organization, 1 elsewhere
+        days = [date(2023, 1, 1) + timedelta(days=offset) for offset in range(731)]
+        FinanceReport.objects.bulk_create([
+            FinanceReport(branch=branch, report_date=day, total_student_payments=income, teacher_payments=2,
+                          profit=income - 2)
+            for branch, income in ((cls.north, 10), (cls.south, 10), (cls.elsewhere, 1)) for day in days
+        ])
+        refresh_rollups((branch.id, day) for branch in (cls.north, cls.south, cls.elsewhere) for day in days)
+
+    def get(self, user, **params):
+        request = APIRequestFactory().get('/api/finance/reports/summary/', params)
+        force_authenticate(request, user)
+        return FinanceReportViewSet.as_view({'get': 'summary'})(request)
+
+    def test_whole_months_come_from_rollups(self):
+        rows = FinanceReport.objects.filter(covering_rows(date(2023, 1, 15), date(2024, 12, 3)))
+        self.assertEqual(
+            set(rows.values_list('report_type', flat=True).distinct()), {'daily', 'monthly'},
+        )
+        # 17 + 3 edge days and 22 whole months per branch
+        self.assertEqual(rows.filter(branch=self.north).count(), 17 + 3 + 22)
+        totals = summarize(FinanceReport.objects.filter(branch=self.north), date(2023, 1, 15), date(2024, 12, 3))
+        self.assertEqual(totals['income'], 10 * ((date(2024, 12, 3) - date(2023, 1, 15)).days + 1))
+        self.assertEqual(totals['expenses'], 2 * ((date(2024, 12, 3) - date(2023, 1, 15)).days + 1))
+
+    def test_scopes(self):
+        params = {'start': '2024-02-01', 'end': '2024-02-29'}
+        self.assertEqual(self.get(self.manager, **params).data['totals']['income'], 290)
+        self.assertEqual(self.get(self.director, **params).data['totals']['income'], 580)
+        self.assertEqual(self.get(self.director, scope='branch', branch=str(self.south.id), **params).data['totals']['income'], 290)
+        self.assertEqual(self.get(self.director, scope='branch', branch=str(self.elsewhere.id), **params).status_code, 404)
+        self.assertEqual(self.get(self.director, scope='all', **params).status_code, 403)
+        self.assertEqual(self.get(self.superadmin, scope='all', **params).data['totals']['income'], 609)
+
+    def test_series_with_granularity(self):
+        with self.assertNumQueries(2):
+            data = self.get(self.manager, start='2023-11-20', end='2024-03-10', granularity='quarter').data
+        self.assertEqual([item['period'] for item in data['series']], ['2023-Q4', '2024-Q1'])
+        self.assertEqual([item['income'] for item in data['series']], [420, 700])
+
+        weeks = self.get(self.manager, start='2024-01-03', end='2024-01-14', granularity='week').data['series']
+        self.assertEqual([item['income'] for item in weeks], [50, 70])
+        # Grouped aggregates do not pick up each other's aliases
+        self.assertEqual([(item['expenses'], item['teacher_payments']) for item in weeks], [(10, 10), (14, 14)])
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.get(self.manager, granularity='decade').status_code, 400)
+        self.assertEqual(self.get(self.manager, start='2024-03-01', end='2024-02-01').status_code, 400)
+        self.assertEqual(self.get(self.manager, scope='planet').status_code, 400)
+
+
+class WalletLedgerTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        organization = Organization.objects.create(name='Org', address='-', phone='1', email='org@example.com')
+        cls.branch = Branch.objects.create(organization=organization, name='Main', address='-', phone='1')
+        cls.manager = CustomUser.objects.create(username='manager', role='manager', organization=organization, branch=cls.branch)
+        cls.teacher = Teacher.objects.create(
+            user=CustomUser.objects.create(username='teacher', role='teacher'), branch=cls.branch,
+            hourly_rate=10, group_rate=100,
+        )
+
+    def setUp(self):
+        self.payments = [
+            TeacherPayment.objects.create(teacher=self.teacher, branch=self.branch, month=date(2024, month, 1),
+                                          total_amount=amount)
+            for month, amount in ((1, 300), (2, 500))
+        ]
+
+    def post(self, action, payment):
+        request = APIRequestFactory().post(f'/api/finance/teacher-payments/{payment.id}/{action}/')
+        force_authenticate(request, self.manager)
+        return TeacherPaymentViewSet.as_view({'post': action})(request, pk=payment.id)
+
+    def wallet(self):
+        return Wallet.objects.get(teacher=self.teacher)
+
+    def test_approve_then_pay(self):
+        self.post('approve', self.payments[0])
+        self.post('approve', self.payments[1])
+        wallet = self.wallet()
+        self.assertEqual((wallet.balance, wallet.total_earned, wallet.total_pending), (800, 800, 800))
+
+        self.assertEqual(self.post('mark_paid', self.payments[0]).status_code, 200)
+        wallet = self.wallet()
+        self.assertEqual((wallet.balance, wallet.total_paid, wallet.total_pending), (500, 300, 500))
+        self.assertEqual(
+            list(WalletEntry.objects.order_by('created_at').values_list('entry_type', 'amount', 'balance_after')),
+            [('earning', 300, 300), ('earning', 500, 800), ('payout', -300, 500)],
+        )
+
+    def test_paying_twice_is_rejected(self):
+        self.assertEqual(self.post('mark_paid', self.payments[0]).status_code, 200)
+        response = self.post('mark_paid', self.payments[0])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(WalletEntry.objects.filter(entry_type='payout').count(), 1)
+        self.assertEqual((self.wallet().balance, self.wallet().total_paid), (0, 300))
+        self.payments[0].refresh_from_db()
+        self.assertEqual(self.payments[0].paid_date, timezone.localdate())
+
+    def test_status_changes_only_through_the_actions(self):
+        request = APIRequestFactory().patch(
+            f'/api/finance/teacher-payments/{self.payments[0].id}/',
+            {'status': 'paid', 'paid_date': '2024-01-31', 'approved_by': str(self.manager.id), 'bonus': 5},
+            format='json',
+        )
+        force_authenticate(request, self.manager)
+        response = TeacherPaymentViewSet.as_view({'patch': 'partial_update'})(request, pk=self.payments[0].id)
+        self.assertEqual(response.status_code, 200)
+        self.payments[0].refresh_from_db()
+        self.assertEqual((self.payments[0].status, self.payments[0].paid_date, self.payments[0].approved_by),
+                         ('pending', None, None))
+        self.assertEqual(self.payments[0].bonus, 5)
+        self.assertFalse(Wallet.objects.exists())
+
+    def test_reads_do_not_write(self):
+        self.post('mark_paid', self.payments[0])
+        wallet = self.wallet()
+        request = APIRequestFactory().get(f'/api/finance/wallets/{wallet.id}/balance/')
+        force_authenticate(request, self.manager)
+        with CaptureQueriesContext(connection) as queries:
+            response = WalletViewSet.as_view({'get': 'balance'})(request, pk=wallet.id)
+        self.assertEqual(response.data['total_paid'], '300.00')
+        self.assertTrue(all(query['sql'].startswith('SELECT') for query in queries))
+
+    def test_reconcile_command(self):
+        self.post('mark_paid', self.payments[0])
+        call_command('reconcile_wallets', stdout=StringIO())
+        self.assertEqual(reconcile(), [])
+
+        Wallet.objects.update(balance=999)
+        TeacherPayment.objects.filter(pk=self.payments[1].pk).update(status='approved')
+        with self.assertRaises(CommandError):
+            call_command('reconcile_wallets', stdout=StringIO())
+        self.assertEqual(reconcile()[0]['problems'], [
+            'balance differs from ledger', 'ledger differs from payments',
+        ])
+
+        out = StringIO()
+        call_command('reconcile_wallets', fix=True, stdout=out)
+        self.assertIn('Repaired 1 wallets', out.getvalue())
+        wallet = self.wallet()
+        self.assertEqual((wallet.balance, wallet.total_earned, wallet.total_paid), (500, 800, 300))
+
+
+class PayrollTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        organization = Organization.objects.create(name='Org', address='-', phone='1', email='org@example.com')
+        cls.branch = Branch.objects.create(organization=organization, name='Main', address='-', phone='1')
+        cls.busy, cls.approved, cls.idle = [
+            Teacher.objects.create(
+                user=CustomUser.objects.create(username=name, role='teacher', first_name=name.title()),
+                branch=cls.branch, hourly_rate=100, group_rate=1000,
+            )
+            for name in ('busy', 'approved', 'idle')
+        ]
+        groups = [Group.objects.create(branch=cls.branch, name=f'G{i}', teacher=cls.busy) for i in range(2)]
+        for group, day, minutes, cancelled in [(groups[0], 4, 90, False), (groups[0], 11, 90, False),
+                                               (groups[1], 12, 90, False), (groups[1], 13, 90, True)]:
+            Lesson.objects.create(group=group, teacher=cls.busy, branch=cls.branch, start_time=local(2024, 3, day),
+                                  duration_minutes=minutes, is_cancelled=cancelled)
+        Lesson.objects.create(group=groups[0], teacher=cls.busy, branch=cls.branch, start_time=local(2024, 2, 28))
+        Lesson.objects.create(group=groups[0], teacher=cls.approved, branch=cls.branch, start_time=local(2024, 3, 5))
+        TeacherPayment.objects.create(teacher=cls.approved, branch=cls.branch, month=date(2024, 3, 1),
+                                      hourly_amount=1, total_amount=1, status='approved')
+        TeacherPayment.objects.create(teacher=cls.idle, branch=cls.branch, month=date(2024, 3, 1),
+                                      hourly_amount=300, bonus=50, total_amount=350)
+
+    def payment(self, teacher):
+        return TeacherPayment.objects.get(teacher=teacher, month=date(2024, 3, 1))
+
+    def test_dry_run_writes_nothing(self):
+        result = run_payroll(self.branch.id, '2024-03', dry_run=True)
+        self.assertEqual((result['created'], result['updated'], result['locked']), (1, 1, 1))
+        actions = {item['teacher_id']: item for item in result['teachers']}
+        self.assertEqual(actions[self.busy.id]['changes']['total_amount'], {'old': None, 'new': Decimal('2450.00')})
+        self.assertEqual(actions[self.idle.id]['changes']['total_amount'], {'old': Decimal('350.00'), 'new': 50})
+        self.assertFalse(TeacherPayment.objects.filter(teacher=self.busy).exists())
+
+    def test_run_upserts_in_bulk(self):
+        with CaptureQueriesContext(connection) as queries:
+            run_payroll(self.branch.id, '2024-03')
+        self.assertLessEqual(len([query for query in queries if 'SAVEPOINT' not in query['sql']]), 3)
+
+        busy = self.payment(self.busy)
+        self.assertEqual((busy.hourly_amount, busy.group_amount, busy.total_amount, busy.status),
+                         (450, 2000, 2450, 'pending'))
+        idle = self.payment(self.idle)
+        self.assertEqual((idle.hourly_amount, idle.bonus, idle.total_amount), (0, 50, 50))
+        self.assertEqual(self.payment(self.approved).total_amount, 1)
+
+        again = run_payroll(self.branch.id, '2024-03')
+        self.assertEqual((again['created'], again['updated'], again['unchanged']), (0, 0, 2))
+
+    def test_command(self):
+        out = StringIO()
+        call_command('run_payroll', month='2024-03', dry_run=True, stdout=out)
+        self.assertIn('Main: 1 created, 1 updated, 0 unchanged, 1 locked', out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('run_payroll', month='March', stdout=StringIO())
+
+
+class StudentDebtTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        organization = Organization.objects.create(name='Org', address='-', phone='1', email='org@example.com')
+        cls.branch = Branch.objects.create(organization=organization, name='Main', address='-', phone='1')
+        cls.other_branch = Branch.objects.create(organization=organization, name='Other', address='-', phone='2')
+        cls.manager = CustomUser.objects.create(username='manager', role='manager', branch=cls.branch)
+        cls.course = Course.objects.create(organization=organization, name='English', price=1000)
+        cls.group = Group.objects.create(branch=cls.branch, course=cls.course, name='A1')
+        cls.student = Student.objects.create(user=CustomUser.objects.create(username='student'), branch=cls.branch)
+        cls.other = Student.objects.create(user=CustomUser.objects.create(username='other'), branch=cls.other_branch)
+
+    def totals(self, student=None):
+        student = Student.objects.get(pk=(student or self.student).pk)
+        return student.total_paid, student.total_debt
+
+    def pay(self, receipt, amount, status='completed'):
+        return StudentPayment.objects.create(
+            student=self.student, branch=self.branch, amount=amount, payment_method='cash',
+            receipt_number=receipt, status=status, paid_at=timezone.now(),
+        )
+
+    def discount(self, discount_type, value):
+        return PaymentDiscount.objects.create(
+            student=self.student, branch=self.branch, discount_type=discount_type, value=value, reason='-',
+        )
+
+    def test_enrollment_and_course_price_charge_the_student(self):
+        self.group.students.add(self.student)
+        self.assertEqual(self.totals(), (0, 1000))
+        self.course.price = 1200
+        self.course.save()
+        self.assertEqual(self.totals(), (0, 1200))
+        self.group.course = None
+        self.group.save()
+        self.assertEqual(self.totals(), (0, 0))
+        self.group.course = self.course
+        self.group.save()
+        self.assertEqual(self.totals(), (0, 1200))
+
+    def test_leaving_a_group_keeps_its_charge(self):
+        self.group.students.add(self.student)
+        self.pay('D1', 1000)
+        self.assertEqual(self.totals(), (1000, 0))
+        self.student.groups.clear()
+        self.assertEqual(self.totals(), (1000, 0))
+        # Neither a later price change nor rejoining bills the student again
+        self.course.price = 1500
+        self.course.save()
+        self.group.students.add(self.student)
+        self.assertEqual(self.totals(), (1000, 0))
+        self.group.delete()
+        self.assertEqual(self.totals(), (1000, 0))
+        self.assertEqual(list(StudentCharge.objects.values_list('group', 'amount')), [(None, 1000)])
+
+    def test_payments_move_paid_and_debt(self):
+        self.group.students.add(self.student)
+        payment = self.pay('D1', 300, status='pending')
+        self.assertEqual(self.totals(), (0, 1000))
+        payment.status = 'completed'
+        payment.save()
+        self.assertEqual(self.totals(), (300, 700))
+        payment.amount = 400
+        payment.save()
+        self.assertEqual(self.totals(), (400, 600))
+        payment.status = 'refunded'
+        payment.save()
+        self.assertEqual(self.totals(), (0, 1000))
+        self.pay('D2', 250).delete()
+        self.assertEqual(self.totals(), (0, 1000))
+
+    def test_discounts(self):
+        self.group.students.add(self.student)
+        fixed = self.discount('fixed', 100)
+        self.assertEqual(self.totals(), (0, 900))
+        percentage = self.discount('percentage', 20)
+        self.assertEqual(self.totals(), (0, 700))
+        percentage.value = 150
+        percentage.save()
+        self.assertEqual(self.totals(), (0, -100))
+        percentage.delete()
+        fixed.delete()
+        self.assertEqual(self.totals(), (0, 1000))
+
+    def test_recompute_command_repairs_drift(self):
+        self.group.students.add(self.student)
+        self.pay('D1', 300)
+        Student.objects.filter(pk=self.student.pk).update(total_paid=0, total_debt=5)
+        # Enrollments from before charges were recorded are billed by the repair
+        StudentCharge.objects.all().delete()
+        out = StringIO()
+        call_command('recompute_student_debts', stdout=out)
+        self.assertIn('1 students', out.getvalue())
+        self.assertEqual(self.totals(), (300, 700))
+        self.assertEqual(self.totals(self.other), (0, 0))
+
+    def payment_view(self, method, action, payment, data=None):
+        request = getattr(APIRequestFactory(), method)(f'/api/finance/student-payments/{payment.id}/', data, format='json')
+        force_authenticate(request, self.manager)
+        return StudentPaymentViewSet.as_view({method: action})(request, pk=payment.id)
+
+    def test_approval_counts_the_payment_once(self):
+        self.group.students.add(self.student)
+        payment = self.pay('D1', 300, status='pending')
+        # Both requests loaded the payment while it was still pending
+        self.assertEqual(self.payment_view('post', 'approve', payment).status_code, 200)
+        self.assertEqual(self.payment_view('post', 'approve', payment).status_code, 400)
+        with self.assertRaises(debts.DebtError):
+            debts.approve_payment(payment.pk)
+        self.assertEqual(self.totals(), (300, 700))
+
+        # Edits take the delta from the stored row, not from the copy the request started with
+        self.assertEqual(self.payment_view('patch', 'partial_update', payment, {'amount': '400'}).status_code, 200)
+        self.assertEqual(self.totals(), (400, 600))
+        self.assertEqual(self.payment_view('delete', 'destroy', payment).status_code, 204)
+        self.assertEqual(self.totals(), (0, 1000))
+
+    def test_direct_updates_invalidate_the_branch_dashboards(self):
+        def version(branch):
+            return cache.get(f'dashboard:version:branch:{branch.id}')
+
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            debts.recompute_ids([self.other.id])
+        self.assertIsNotNone(version(self.other_branch))
+        self.assertIsNone(version(self.branch))
+
+        for change in (lambda: debts.apply_payment(self.student.id, 10),
+                       lambda: debts.apply_fixed_discount(self.student.id, 10)):
+            before = version(self.branch)
+            with self.captureOnCommitCallbacks(execute=True):
+                change()
+            self.assertNotEqual(version(self.branch), before)
+
+    def debtors(self, user, action='debtors', **params):
+        request = APIRequestFactory().get('/api/finance/student-payments/debtors/', params)
+        force_authenticate(request, user=user)
+        return StudentPaymentViewSet.as_view({'get': action})(request)
+
+    def test_debtors_are_scoped_and_aged(self):
+        self.group.students.add(self.student)
+        self.pay('D1', 100)
+        StudentPayment.objects.filter(receipt_number='D1').update(paid_at=timezone.now() - timedelta(days=45))
+        late = Student.objects.create(user=CustomUser.objects.create(username='late'), branch=self.branch)
+        Student.objects.filter(pk=late.pk).update(total_debt=70, enrollment_date=timezone.localdate() - timedelta(days=200))
+        Student.objects.filter(pk=self.other.pk).update(total_debt=50)
+
+        with self.assertNumQueries(2):  # the branch lookup and one aggregate
+            response = self.debtors(self.manager)
+        self.assertEqual(response.data['scope'], 'branch')
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(response.data['total_debt'], Decimal('970'))
+        self.assertEqual(response.data['aging'], {
+            '0_30': {'count': 0, 'total_debt': 0},
+            '31_60': {'count': 1, 'total_debt': Decimal('900')},
+            '61_90': {'count': 0, 'total_debt': 0},
+            '90_plus': {'count': 1, 'total_debt': Decimal('70')},
+        })
+        self.assertEqual(self.debtors(self.manager, scope='all').status_code, 403)
+
+        superadmin = CustomUser.objects.create(username='root', role='superadmin')
+        self.assertEqual(self.debtors(superadmin, scope='all').data['count'], 3)
+
+    def test_debtors_export_streams_csv(self):
+        self.group.students.add(self.student)
+        response = self.debtors(self.manager, action='debtors_export')
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(',')[:2], ['student_id', 'first_name'])
+        self.assertEqual(len(lines), 2)
+        row = lines[1].split(',')
+        self.assertEqual(row[0], str(self.student.pk))
+        self.assertEqual((row[7], row[9], row[10]), ('1000.00', '0', '0_30'))
@@ -1,9 +1,14 @@
 from rest_framework import viewsets, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated,AllowAny
-from django.db.models import Sum, Q
+from rest_framework.permissions import IsAuthenticated,AllowAny, SAFE_METHODS
+from django.db.models import Count, Sum, Q
+from django.http import StreamingHttpResponse
 from datetime import datetime, timedelta
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 from .models import (
     FinanceReport, StudentPayment, TeacherPayment, StaffPayment,
     Wallet, PaymentDiscount, IncomeLead
@@ -11,12 +16,47 @@ from .models import (
 from .serializers import (
     FinanceReportSerializer, StudentPaymentSerializer, TeacherPaymentSerializer,
     StaffPaymentSerializer, WalletSerializer, PaymentDiscountSerializer,
-    IncomeLeadSerializer
+    IncomeLeadSerializer, WalletEntrySerializer
 )
 from auth_system.permissions import IsDirector, IsManager, IsAdmin
+from core.aggregates import count_by
+from core.fetch import FetchPlan, FetchPlanMixin
+from core.pagination import KeysetPagination
+from core.models import Branch, Student
+from . import debtors, debts, payroll, summary, wallets
 
-class FinanceReportViewSet(viewsets.ReadOnlyModelViewSet):
+def scope_by_branch(request, queryset, verb):
+    """
+    ``queryset`` (of a model with a ``branch``) narrowed to the requested ``scope``, or an error
+    response when the user may not see it. ``verb`` names the action in the 403 message.
+    """
+    user = request.user
+    params = request.query_params
+    scope = params.get('scope') or ('branch' if user.branch_id else 'organization' if user.organization_id else 'all')
+    if scope == 'all':
+        if user.role != 'superadmin':
+            return scope, Response({'error': f'Only superadmins can {verb} all branches'}, status=status.HTTP_403_FORBIDDEN)
+        return scope, queryset
+    if scope == 'organization':
+        organization_id = params.get('organization') if user.role == 'superadmin' else user.organization_id
+        if not organization_id:
+            return scope, Response({'error': 'Organization not found'}, status=status.HTTP_400_BAD_REQUEST)
+        return scope, queryset.filter(branch__organization_id=organization_id)
+    if scope == 'branch':
+        branches = Branch.objects.all()
+        if user.role != 'superadmin':
+            branches = branches.filter(organization_id=user.organization_id) if user.organization_id else branches.filter(id=user.branch_id)
+        try:
+            branch = branches.get(id=params.get('branch') or user.branch_id)
+        except (Branch.DoesNotExist, ValidationError):
+            return scope, Response({'error': 'Branch not found'}, status=status.HTTP_404_NOT_FOUND)
+        return scope, queryset.filter(branch=branch)
+    return scope, Response({'error': 'scope must be branch, organization or all'}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class FinanceReportViewSet(FetchPlanMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = FinanceReportSerializer
+    fetch_plan = FetchPlan(select_related=['branch'])
     # permission_classes = [IsDirector]
     permission_classes = [AllowAny]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
@@ -26,58 +66,108 @@ class FinanceReportViewSet(viewsets.ReadOnlyModelViewSet):
     def get_queryset(self):
         user = self.request.user
         if user.role == 'superadmin':
-            return FinanceReport.objects.all()
+            return self.fetch(FinanceReport.objects.all())
         if user.branch:
-            return FinanceReport.objects.filter(branch=user.branch)
+            return self.fetch(FinanceReport.objects.filter(branch=user.branch))
         return FinanceReport.objects.none()
     
     @action(detail=False, methods=['get'])
     def daily_report(self, request):
         today = datetime.today().date()
-        reports = self.get_queryset().filter(report_date=today)
+        reports = self.get_queryset().filter(report_type='daily', report_date=today)
         serializer = self.get_serializer(reports, many=True)
         return Response(serializer.data)
     
     @action(detail=False, methods=['get'])
     def weekly_report(self, request):
-        today = datetime.today().date()
-        week_start = today - timedelta(days=today.weekday())
-        reports = self.get_queryset().filter(report_date__gte=week_start, report_date__lte=today)
-        total = reports.aggregate(
-            total_payments=Sum('total_student_payments'),
-            teacher_payments=Sum('teacher_payments'),
-            profit=Sum('profit')
-        )
-        return Response(total)
+        today = timezone.localdate()
+        totals = summary.summarize(self.get_queryset(), today - timedelta(days=today.weekday()), today)
+        return Response({
+            'total_payments': totals['income'],
+            'teacher_payments': totals['teacher_payments'],
+            'profit': totals['profit'],
+        })
     
     @action(detail=False, methods=['get'])
     def monthly_report(self, request):
-        today = datetime.today().date()
-        month_start = today.replace(day=1)
-        reports = self.get_queryset().filter(report_date__gte=month_start, report_date__lte=today)
-        total = reports.aggregate(
-            total_payments=Sum('total_student_payments'),
-            teacher_payments=Sum('teacher_payments'),
-            staff_payments=Sum('staff_payments'),
-            expenses=Sum('other_expenses'),
-            profit=Sum('profit')
-        )
-        return Response(total)
+        today = timezone.localdate()
+        totals = summary.summarize(self.get_queryset(), today.replace(day=1), today)
+        return Response({
+            'total_payments': totals['income'],
+            'teacher_payments': totals['teacher_payments'],
+            'staff_payments': totals['staff_payments'],
+            'expenses': totals['other_expenses'],
+            'profit': totals['profit'],
+        })
+    
+    @action(detail=False, methods=['get'])
+    def summary(self, request):
+        scope, reports = scope_by_branch(request, FinanceReport.objects.all(), 'summarize')
+        if isinstance(reports, Response):
+            return reports
+        
+        params = request.query_params
+        granularity = params.get('granularity')
+        today = timezone.localdate()
+        try:
+            start = parse_date(params['start']) if params.get('start') else today.replace(day=1)
+            end = parse_date(params['end']) if params.get('end') else today
+            if start is None or end is None:
+                raise summary.SummaryError('start and end must be YYYY-MM-DD dates')
+            data = {'scope': scope, 'start': start, 'end': end, 'granularity': granularity}
+            if granularity:
+                data['series'] = summary.series(reports, start, end, granularity)
+                # The series covers the same range, so the totals need no second query
+                data['totals'] = {
+                    name: sum((item[name] for item in data['series']), summary.ZERO[name]) for name in summary.AMOUNTS
+                }
+            else:
+                data['totals'] = summary.summarize(reports, start, end)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(data)
+
+class LockedWritesMixin:
+    """
+    Creates, updates and deletes run in one transaction with the row locked, so the debt
+    signals take their delta from the stored row and apply it in the same commit
+    """
+
+    def get_object(self):
+        instance = super().get_object()
+        if self.request.method in SAFE_METHODS:
+            return instance
+        return type(instance).objects.select_for_update().get(pk=instance.pk)
+
+    def create(self, request, *args, **kwargs):
+        with transaction.atomic():
+            return super().create(request, *args, **kwargs)
+
+    def update(self, request, *args, **kwargs):
+        with transaction.atomic():
+            return super().update(request, *args, **kwargs)
+
+    def destroy(self, request, *args, **kwargs):
+        with transaction.atomic():
+            return super().destroy(request, *args, **kwargs)
 
-class StudentPaymentViewSet(viewsets.ModelViewSet):
+class StudentPaymentViewSet(LockedWritesMixin, FetchPlanMixin, viewsets.ModelViewSet):
     serializer_class = StudentPaymentSerializer
+    fetch_plan = FetchPlan(select_related=['student__user', 'approved_by'])
     # permission_classes = [IsAdmin]
     permission_classes = [AllowAny]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['student__user__first_name', 'student__user__last_name', 'receipt_number']
     ordering_fields = ['created_at', 'amount']
+    ordering = ['-created_at', '-id']
+    pagination_class = KeysetPagination
     
     def get_queryset(self):
         user = self.request.user
         if user.role == 'superadmin':
-            return StudentPayment.objects.all()
+            return self.fetch(StudentPayment.objects.all())
         if user.branch:
-            return StudentPayment.objects.filter(branch=user.branch)
+            return self.fetch(StudentPayment.objects.filter(branch=user.branch))
         return StudentPayment.objects.none()
     
     @action(detail=False, methods=['get'])
@@ -97,26 +187,34 @@ class StudentPaymentViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def debtors(self, request):
-        from core.models import Student
-        debtors = Student.objects.filter(total_debt__gt=0)
-        return Response({
-            'count': debtors.count(),
-            'total_debt': debtors.aggregate(Sum('total_debt'))
-        })
+        scope, students = scope_by_branch(request, Student.objects.all(), 'list debtors of')
+        if isinstance(students, Response):
+            return students
+        today = timezone.localdate()
+        return Response({'scope': scope, 'as_of': today, **debtors.aging_report(students, today)})
+    
+    @action(detail=False, methods=['get'], url_path='debtors/export')
+    def debtors_export(self, request):
+        scope, students = scope_by_branch(request, Student.objects.all(), 'export debtors of')
+        if isinstance(students, Response):
+            return students
+        today = timezone.localdate()
+        response = StreamingHttpResponse(debtors.csv_rows(students, today), content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="debtors-{today.isoformat()}.csv"'
+        return response
     
     @action(detail=['post'], methods=['post'])
     def approve(self, request, pk=None):
         payment = self.get_object()
-        if payment.status != 'pending':
-            return Response({'error': 'Payment is not pending'}, status=status.HTTP_400_BAD_REQUEST)
-        payment.status = 'completed'
-        payment.approved_by = request.user
-        payment.paid_at = datetime.now()
-        payment.save()
+        try:
+            debts.approve_payment(payment.pk, user=request.user if request.user.is_authenticated else None)
+        except debts.DebtError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         return Response({'status': 'Payment approved'})
 
-class TeacherPaymentViewSet(viewsets.ModelViewSet):
+class TeacherPaymentViewSet(FetchPlanMixin, viewsets.ModelViewSet):
     serializer_class = TeacherPaymentSerializer
+    fetch_plan = FetchPlan(select_related=['teacher__user', 'approved_by'])
     # permission_classes = [IsDirector]
     permission_classes = [AllowAny]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
@@ -126,9 +224,9 @@ class TeacherPaymentViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         user = self.request.user
         if user.role == 'superadmin':
-            return TeacherPayment.objects.all()
+            return self.fetch(TeacherPayment.objects.all())
         if user.branch:
-            return TeacherPayment.objects.filter(branch=user.branch)
+            return self.fetch(TeacherPayment.objects.filter(branch=user.branch))
         return TeacherPayment.objects.none()
     
     @action(detail=False, methods=['get'])
@@ -138,25 +236,40 @@ class TeacherPaymentViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(payments, many=True)
         return Response({'count': payments.count(), 'total': total, 'payments': serializer.data})
     
+    @action(detail=False, methods=['post'])
+    def payroll(self, request):
+        user = request.user
+        branch_id = request.data.get('branch') if user.role == 'superadmin' else user.branch_id
+        if not branch_id or not Branch.objects.filter(id=branch_id).exists():
+            return Response({'error': 'Branch not found'}, status=status.HTTP_404_NOT_FOUND)
+        dry_run = str(request.data.get('dry_run', '')).lower() in ('1', 'true', 'yes')
+        try:
+            result = payroll.run_payroll(branch_id, request.data.get('month', ''), dry_run=dry_run)
+        except payroll.PayrollError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result, status=status.HTTP_200_OK if dry_run else status.HTTP_201_CREATED)
+    
     @action(detail=['post'], methods=['post'])
     def approve(self, request, pk=None):
         payment = self.get_object()
-        payment.status = 'approved'
-        payment.approved_by = request.user
-        payment.save()
+        try:
+            wallets.approve(payment.pk, user=request.user if request.user.is_authenticated else None)
+        except wallets.WalletError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         return Response({'status': 'Payment approved'})
     
     @action(detail=['post'], methods=['post'])
     def mark_paid(self, request, pk=None):
         payment = self.get_object()
-        payment.status = 'paid'
-        payment.paid_date = datetime.today().date()
-        payment.save()
-        payment.teacher.wallet.update_balance()
+        try:
+            wallets.mark_paid(payment.pk, timezone.localdate(), user=request.user if request.user.is_authenticated else None)
+        except wallets.WalletError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         return Response({'status': 'Payment marked as paid'})
 
-class StaffPaymentViewSet(viewsets.ModelViewSet):
+class StaffPaymentViewSet(FetchPlanMixin, viewsets.ModelViewSet):
     serializer_class = StaffPaymentSerializer
+    fetch_plan = FetchPlan(select_related=['staff_member'])
     # permission_classes = [IsDirector]
     permission_classes = [AllowAny]
     filter_backends = [filters.OrderingFilter]
@@ -165,9 +278,9 @@ class StaffPaymentViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         user = self.request.user
         if user.role == 'superadmin':
-            return StaffPayment.objects.all()
+            return self.fetch(StaffPayment.objects.all())
         if user.branch:
-            return StaffPayment.objects.filter(branch=user.branch)
+            return self.fetch(StaffPayment.objects.filter(branch=user.branch))
         return StaffPayment.objects.none()
     
     @action(detail=False, methods=['get'])
@@ -189,45 +302,55 @@ class StaffPaymentViewSet(viewsets.ModelViewSet):
         )
         return Response(summary)
 
-class WalletViewSet(viewsets.ReadOnlyModelViewSet):
+class WalletViewSet(FetchPlanMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = WalletSerializer
+    fetch_plan = FetchPlan(select_related=['teacher__user'])
     # permission_classes = [IsAuthenticated]
     permission_classes = [AllowAny]
     
     def get_queryset(self):
         user = self.request.user
+        queryset = self.fetch(Wallet.objects.all())
         if user.role == 'teacher':
-            return Wallet.objects.filter(teacher__user=user)
+            return queryset.filter(teacher__user=user)
         if user.role in ['superadmin', 'director', 'manager']:
             if user.branch:
-                return Wallet.objects.filter(teacher__branch=user.branch)
-            return Wallet.objects.all()
-        return Wallet.objects.none()
+                return queryset.filter(teacher__branch=user.branch)
+            return queryset
+        return queryset.none()
     
     @action(detail=['get'], methods=['get'])
     def balance(self, request, pk=None):
+        return Response(self.get_serializer(self.get_object()).data)
+    
+    @action(detail=True, methods=['get'])
+    def ledger(self, request, pk=None):
         wallet = self.get_object()
-        wallet.update_balance()
-        return Response(self.get_serializer(wallet).data)
+        entries = wallet.entries.select_related('payment').order_by('-created_at', '-id')
+        page = self.paginate_queryset(entries)
+        serializer = WalletEntrySerializer(page if page is not None else entries, many=True)
+        return self.get_paginated_response(serializer.data) if page is not None else Response(serializer.data)
 
-class PaymentDiscountViewSet(viewsets.ModelViewSet):
+class PaymentDiscountViewSet(LockedWritesMixin, FetchPlanMixin, viewsets.ModelViewSet):
     serializer_class = PaymentDiscountSerializer
+    fetch_plan = FetchPlan(select_related=['student__user', 'applied_by'])
     # permission_classes = [IsAdmin]
     permission_classes = [AllowAny]
     
     def get_queryset(self):
         user = self.request.user
         if user.role == 'superadmin':
-            return PaymentDiscount.objects.all()
+            return self.fetch(PaymentDiscount.objects.all())
         if user.branch:
-            return PaymentDiscount.objects.filter(branch=user.branch)
+            return self.fetch(PaymentDiscount.objects.filter(branch=user.branch))
         return PaymentDiscount.objects.none()
     
     def perform_create(self, serializer):
         serializer.save(applied_by=self.request.user)
 
-class IncomeLeadViewSet(viewsets.ModelViewSet):
+class IncomeLeadViewSet(FetchPlanMixin, viewsets.ModelViewSet):
     serializer_class = IncomeLeadSerializer
+    fetch_plan = FetchPlan(select_related=['branch', 'converted_student__user'])
     # permission_classes = [IsManager]
     permission_classes = [AllowAny]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
@@ -237,22 +360,16 @@ class IncomeLeadViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         user = self.request.user
         if user.role == 'superadmin':
-            return IncomeLead.objects.all()
+            return self.fetch(IncomeLead.objects.all())
         if user.branch:
-            return IncomeLead.objects.filter(branch=user.branch)
+            return self.fetch(IncomeLead.objects.filter(branch=user.branch))
         return IncomeLead.objects.none()
     
     @action(detail=False, methods=['get'])
     def conversion_stats(self, request):
         query = self.get_queryset()
-        stats = {
-            'total_leads': query.count(),
-            'new': query.filter(status='new').count(),
-            'contacted': query.filter(status='contacted').count(),
-            'enrolled': query.filter(status='enrolled').count(),
-            'rejected': query.filter(status='rejected').count(),
-            'conversion_rate': (query.filter(status='enrolled').count() / query.count() * 100) if query.count() > 0 else 0
-        }
+        stats = count_by(query, 'status', ['new', 'contacted', 'enrolled', 'rejected'], total='total_leads')
+        stats['conversion_rate'] = (stats['enrolled'] / stats['total_leads'] * 100) if stats['total_leads'] > 0 else 0
         return Response(stats)
     
     @action(detail=False, methods=['get'])
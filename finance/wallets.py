@@ -0,0 +1,172 @@
+# finance/wallets.py
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import DecimalField, F, Func, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .models import TeacherPayment, Wallet, WalletEntry
+
+# Wallet totals each entry type moves, besides the balance
+TOTALS = {
+    'earning': 'total_earned',
+    'payout': 'total_paid',
+}
+# Salary payments that should have a ledger line of each type
+EXPECTED = {
+    'earning': Q(status__in=['approved', 'paid']),
+    'payout': Q(status='paid'),
+}
+
+
+class WalletError(Exception):
+    pass
+
+
+def _post(wallet_id, entry_type, amount, payment=None, user=None, note=''):
+    """Apply ``amount`` to the locked wallet with F() updates and append the ledger line"""
+    changes = {'balance': F('balance') + amount, 'updated_at': timezone.now()}
+    if entry_type in TOTALS:
+        # total_pending is approved salary not paid out yet
+        changes[TOTALS[entry_type]] = F(TOTALS[entry_type]) + abs(amount)
+        changes['total_pending'] = F('total_pending') + amount
+    Wallet.objects.filter(pk=wallet_id).update(**changes)
+    balance = Wallet.objects.filter(pk=wallet_id).values_list('balance', flat=True).get()
+    return WalletEntry.objects.create(
+        wallet_id=wallet_id, payment=payment, entry_type=entry_type, amount=amount,
+        balance_after=balance, created_by=user, note=note,
+    )
+
+
+def _lock_wallet(teacher_id):
+    wallet, _ = Wallet.objects.select_for_update().get_or_create(teacher_id=teacher_id)
+    return wallet
+
+
+def _record(wallet, payment, entry_type, user):
+    """Post the line ``payment`` owes for ``entry_type`` unless it is already in the ledger"""
+    if WalletEntry.objects.filter(payment=payment, entry_type=entry_type).exists():
+        return None
+    amount = payment.total_amount if entry_type == 'earning' else -payment.total_amount
+    return _post(wallet.pk, entry_type, amount, payment, user)
+
+
+def approve(payment_id, user=None):
+    """Approve a pending salary payment and credit the teacher's wallet"""
+    with transaction.atomic():
+        payment = TeacherPayment.objects.select_for_update().get(pk=payment_id)
+        if payment.status not in ('pending', 'approved'):
+            raise WalletError(f'Payment is {payment.status}')
+        wallet = _lock_wallet(payment.teacher_id)
+        payment.status = 'approved'
+        payment.approved_by = user
+        payment.save(update_fields=['status', 'approved_by', 'updated_at'])
+        _record(wallet, payment, 'earning', user)
+    return payment
+
+
+def mark_paid(payment_id, paid_date, user=None):
+    """
+    Mark a salary payment paid and debit the payout from the teacher's wallet. A payment paid
+    without being approved first is credited in the same transaction, so the balance never
+    goes negative for it. Paying twice raises WalletError.
+    """
+    with transaction.atomic():
+        payment = TeacherPayment.objects.select_for_update().get(pk=payment_id)
+        if payment.status == 'paid':
+            raise WalletError('Payment is already paid')
+        if payment.status == 'rejected':
+            raise WalletError('Payment is rejected')
+        wallet = _lock_wallet(payment.teacher_id)
+        payment.status = 'paid'
+        payment.paid_date = paid_date
+        payment.save(update_fields=['status', 'paid_date', 'updated_at'])
+        _record(wallet, payment, 'earning', user)
+        _record(wallet, payment, 'payout', user)
+    return payment
+
+
+def adjust(teacher_id, amount, user=None, note=''):
+    """Post a manual correction; positive amounts credit the wallet"""
+    with transaction.atomic():
+        wallet = _lock_wallet(teacher_id)
+        return _post(wallet.pk, 'adjustment', Decimal(amount), user=user, note=note)
+
+
+def _sum(queryset, field):
+    summed = queryset.order_by().annotate(total=Func(field, function='SUM')).values('total')
+    return Coalesce(Subquery(summed), Value(Decimal(0)), output_field=DecimalField(max_digits=12, decimal_places=2))
+
+
+def reconcile(wallets=None):
+    """
+    Compare every wallet with its ledger and its ledger with the salary payments, in one query.
+    Returns one dict per wallet with a mismatch: the stored totals, what the ledger adds up to
+    and what the payments say they should be.
+    """
+    entries = WalletEntry.objects.filter(wallet=OuterRef('pk'))
+    payments = TeacherPayment.objects.filter(teacher=OuterRef('teacher_id'))
+    rows = (wallets if wallets is not None else Wallet.objects.all()).annotate(
+        ledger_balance=_sum(entries, 'amount'),
+        ledger_earned=_sum(entries.filter(entry_type='earning'), 'amount'),
+        ledger_paid=_sum(entries.filter(entry_type='payout'), 'amount'),
+        expected_earned=_sum(payments.filter(EXPECTED['earning']), 'total_amount'),
+        expected_paid=_sum(payments.filter(EXPECTED['payout']), 'total_amount'),
+    ).values(
+        'id', 'teacher_id', 'balance', 'total_earned', 'total_paid', 'total_pending',
+        'ledger_balance', 'ledger_earned', 'ledger_paid', 'expected_earned', 'expected_paid',
+    ).order_by('id')
+
+    mismatches = []
+    for row in rows:
+        row['ledger_paid'] = -row['ledger_paid']
+        problems = []
+        if row['balance'] != row['ledger_balance']:
+            problems.append('balance differs from ledger')
+        ledger_totals = (row['ledger_earned'], row['ledger_paid'], row['ledger_earned'] - row['ledger_paid'])
+        if (row['total_earned'], row['total_paid'], row['total_pending']) != ledger_totals:
+            problems.append('totals differ from ledger')
+        if (row['ledger_earned'], row['ledger_paid']) != (row['expected_earned'], row['expected_paid']):
+            problems.append('ledger differs from payments')
+        if problems:
+            mismatches.append(dict(row, problems=problems))
+    return mismatches
+
+
+def teachers_without_wallet():
+    """Teachers with approved or paid salary payments but no wallet yet"""
+    return list(TeacherPayment.objects.filter(
+        EXPECTED['earning'], teacher__wallet__isnull=True,
+    ).values_list('teacher_id', flat=True).distinct())
+
+
+def post_missing(teacher_id, user=None):
+    """Post the earning and payout lines missing for the teacher's approved and paid payments"""
+    posted = 0
+    with transaction.atomic():
+        wallet = _lock_wallet(teacher_id)
+        for entry_type, expected in EXPECTED.items():
+            missing = TeacherPayment.objects.filter(expected, teacher_id=teacher_id).exclude(
+                wallet_entries__entry_type=entry_type,
+            ).order_by('month')
+            for payment in missing:
+                _record(wallet, payment, entry_type, user)
+                posted += 1
+    return posted
+
+
+def repair_totals(wallet_id):
+    """Reset a wallet's stored totals to what its ledger adds up to"""
+    with transaction.atomic():
+        Wallet.objects.select_for_update().filter(pk=wallet_id).get()
+        entries = WalletEntry.objects.filter(wallet_id=wallet_id)
+        totals = {
+            column: entries.filter(entry_type=entry_type).aggregate(total=Sum('amount'))['total'] or Decimal(0)
+            for entry_type, column in TOTALS.items()
+        }
+        totals['total_paid'] = -totals['total_paid']
+        Wallet.objects.filter(pk=wallet_id).update(
+            balance=entries.aggregate(total=Sum('amount'))['total'] or Decimal(0),
+            total_pending=totals['total_earned'] - totals['total_paid'],
+            updated_at=timezone.now(),
+            **totals,
+        )
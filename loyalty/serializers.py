@@ -1,8 +1,9 @@
 from rest_framework import serializers
 from .models import LoyaltyBranch, LoyaltyPoint
+from core.serializers import SparseFieldsMixin
 
 
-class LoyaltyBranchSerializer(serializers.ModelSerializer):
+class LoyaltyBranchSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     branch_name = serializers.CharField(source='branch.name', read_only=True)
     organization_name = serializers.CharField(source='organization.name', read_only=True)
     created_by_name = serializers.CharField(source='created_by.get_full_name', read_only=True)
@@ -18,7 +19,7 @@ class LoyaltyBranchSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'updated_at', 'created_by']
 
 
-class LoyaltyPointSerializer(serializers.ModelSerializer):
+class LoyaltyPointSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     user_name = serializers.CharField(source='user.get_full_name', read_only=True)
     loyalty_branch_name = serializers.CharField(source='loyalty_branch.name', read_only=True)
     
@@ -3,12 +3,13 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from django.db.models import Sum
+from core.fetch import FetchPlan, FetchPlanMixin
 from core.models import Branch
 from .models import LoyaltyBranch, LoyaltyPoint
 from .serializers import LoyaltyBranchSerializer, LoyaltyPointSerializer
 
 
-class LoyaltyBranchViewSet(viewsets.ModelViewSet):
+class LoyaltyBranchViewSet(FetchPlanMixin, viewsets.ModelViewSet):
     """
     Loyalty Program Branch Management
     
@@ -24,6 +25,7 @@ class LoyaltyBranchViewSet(viewsets.ModelViewSet):
     
     queryset = LoyaltyBranch.objects.all()
     serializer_class = LoyaltyBranchSerializer
+    fetch_plan = FetchPlan(select_related=['branch', 'organization', 'created_by'])
     # permission_classes = [IsAuthenticated]
     permission_classes = [AllowAny]
     
@@ -33,17 +35,17 @@ class LoyaltyBranchViewSet(viewsets.ModelViewSet):
         
         # Check if user is authenticated
         if not user or not user.is_authenticated:
-            return LoyaltyBranch.objects.all()  # Return all during testing
+            return self.fetch(LoyaltyBranch.objects.all())  # Return all during testing
         
         # Superadmin can see all branches
         if hasattr(user, 'role') and user.role == 'superadmin':
-            return LoyaltyBranch.objects.all()
+            return self.fetch(LoyaltyBranch.objects.all())
         
         # Other users see only their organization's branches
         if hasattr(user, 'organization') and user.organization:
-            return LoyaltyBranch.objects.filter(organization=user.organization)
+            return self.fetch(LoyaltyBranch.objects.filter(organization=user.organization))
         
-        return LoyaltyBranch.objects.all()
+        return self.fetch(LoyaltyBranch.objects.all())
     
     def perform_create(self, serializer):
         """Set organization and created_by on creation - only if authenticated"""
@@ -133,7 +135,7 @@ class LoyaltyBranchViewSet(viewsets.ModelViewSet):
         }, status=status.HTTP_200_OK)
 
 
-class LoyaltyPointViewSet(viewsets.ModelViewSet):
+class LoyaltyPointViewSet(FetchPlanMixin, viewsets.ModelViewSet):
     """
     Loyalty Points Management
     
@@ -148,6 +150,7 @@ class LoyaltyPointViewSet(viewsets.ModelViewSet):
     
     queryset = LoyaltyPoint.objects.all()
     serializer_class = LoyaltyPointSerializer
+    fetch_plan = FetchPlan(select_related=['user', 'loyalty_branch'])
     # permission_classes = [IsAuthenticated]
     permission_classes = [AllowAny]
     
@@ -157,19 +160,19 @@ class LoyaltyPointViewSet(viewsets.ModelViewSet):
         
         # Check if user is authenticated
         if not user or not user.is_authenticated:
-            return LoyaltyPoint.objects.all()  # Return all during testing
+            return self.fetch(LoyaltyPoint.objects.all())  # Return all during testing
         
         # Superadmin can see all points
         if hasattr(user, 'role') and user.role == 'superadmin':
-            return LoyaltyPoint.objects.all()
+            return self.fetch(LoyaltyPoint.objects.all())
         
         # Other users see only their organization's points
         if hasattr(user, 'organization') and user.organization:
-            return LoyaltyPoint.objects.filter(
+            return self.fetch(LoyaltyPoint.objects.filter(
                 loyalty_branch__organization=user.organization
-            )
+            ))
         
-        return LoyaltyPoint.objects.all()
+        return self.fetch(LoyaltyPoint.objects.all())
     
     @action(detail=True, methods=['post'])
     def add_points(self, request, pk=None):
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from .models import PerformanceMetrics, NotificationAlert
 from core.models import Group, Teacher, Student
+from core.serializers import SparseFieldsMixin
 
 class GroupTransferSerializer(serializers.Serializer):
     student_id = serializers.UUIDField()
@@ -14,7 +15,7 @@ class TeacherReassignmentSerializer(serializers.Serializer):
     new_teacher_id = serializers.UUIDField()
     reason = serializers.CharField()
 
-class PerformanceMetricsSerializer(serializers.ModelSerializer):
+class PerformanceMetricsSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     branch_name = serializers.CharField(source='branch.name', read_only=True)
     completion_rate = serializers.SerializerMethodField()
     
@@ -29,7 +30,7 @@ class PerformanceMetricsSerializer(serializers.ModelSerializer):
             return 0
         return (obj.completed_lessons / obj.total_lessons) * 100
 
-class NotificationAlertSerializer(serializers.ModelSerializer):
+class NotificationAlertSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     branch_name = serializers.CharField(source='branch.name', read_only=True)
     
     class Meta:
@@ -0,0 +1,108 @@
+from datetime import date, timedelta
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from attendance.submission import submit_sheets
+from core.models import Organization, Branch, CustomUser, Teacher, Student, Group, Lesson, Attendance
+from director_dashboard.views import DirectorDashboardViewSet
+from finance.models import TeacherPayment
+from .models import NotificationAlert
+from core.performance import teacher_performance
+from .views import ManagerDashboardViewSet
+
+
+class TeacherPerformanceTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        organization = Organization.objects.create(name='Org', address='-', phone='1', email='org@example.com')
+        cls.branch = branch = Branch.objects.create(organization=organization, name='Main', address='-', phone='1')
+        cls.director = CustomUser.objects.create(username='director', role='director', organization=organization)
+        cls.manager = CustomUser.objects.create(username='manager', role='manager', organization=organization, branch=branch)
+        cls.teachers = [cls.create_teacher(branch, f'teacher{i}', f'Teacher{i}') for i in range(3)]
+        student = Student.objects.create(user=CustomUser.objects.create(username='student', role='student'), branch=branch)
+        now = timezone.now()
+
+        first, second, _ = cls.teachers
+        group = Group.objects.create(branch=branch, name='A1', teacher=first)
+        group.students.add(student)
+        cls.lessons = []
+        for day, cancelled, attendance_status in [(1, False, 'present'), (3, False, 'absent'),
+                                                  (5, True, None), (60, False, 'late')]:
+            lesson = Lesson.objects.create(
+                group=group, teacher=first, branch=branch, start_time=now - timedelta(days=day), is_cancelled=cancelled,
+            )
+            if attendance_status:
+                Attendance.objects.create(lesson=lesson, student=student, status=attendance_status)
+            cls.lessons.append(lesson)
+        for lesson in (cls.lessons[0], cls.lessons[3]):
+            NotificationAlert.objects.create(branch=branch, alert_type='teacher_late', related_lesson=lesson, message='-')
+
+        month = date.today().replace(day=1)
+        TeacherPayment.objects.create(teacher=first, branch=branch, month=month, total_amount=300, status='paid')
+        TeacherPayment.objects.create(teacher=second, branch=branch, month=month, total_amount=999, status='pending')
+        TeacherPayment.objects.create(
+            teacher=first, branch=branch, month=month - timedelta(days=200), total_amount=500, status='paid',
+        )
+        Lesson.objects.create(group=group, teacher=second, branch=branch, start_time=now - timedelta(days=2))
+
+    @classmethod
+    def create_teacher(cls, branch, username, last_name):
+        user = CustomUser.objects.create(username=username, role='teacher', last_name=last_name)
+        return Teacher.objects.create(user=user, branch=branch, hourly_rate=10, group_rate=100)
+
+    def call(self, viewset, user, **params):
+        request = APIRequestFactory().get('/', params)
+        force_authenticate(request, user)
+        return viewset.as_view({'get': 'teacher_performance'})(request)
+
+    def test_all_time_figures(self):
+        rows = {row['teacher_id']: row for row in teacher_performance(Teacher.objects.all())}
+        first = rows[self.teachers[0].id]
+        self.assertEqual(first['lessons'], 4)
+        self.assertEqual(first['cancelled_lessons'], 1)
+        self.assertEqual(first['late_arrivals'], 2)
+        self.assertEqual(first['attendance'], {'present': 1, 'absent': 1, 'late': 1, 'excused': 0})
+        self.assertEqual(first['earned_in_period'], 800)
+        self.assertEqual(rows[self.teachers[1].id]['lessons'], 1)
+        self.assertEqual(rows[self.teachers[2].id]['lessons'], 0)
+        self.assertEqual(rows[self.teachers[2].id]['punctuality_rate'], 100)
+
+    def test_period_figures(self):
+        start = timezone.now() - timedelta(days=30)
+        first = teacher_performance(Teacher.objects.filter(id=self.teachers[0].id), start)[0]
+        self.assertEqual(first['lessons'], 3)
+        self.assertEqual(first['late_arrivals'], 1)
+        self.assertEqual(first['punctuality_rate'], 50)
+        self.assertEqual(first['attendance_rate'], 50)
+        self.assertEqual(first['earned_in_period'], 300)
+
+    def test_query_count_does_not_grow_with_teachers(self):
+        with CaptureQueriesContext(connection) as few:
+            teacher_performance(Teacher.objects.all())
+        for i in range(3, 8):
+            self.create_teacher(self.branch, f'teacher{i}', f'Teacher{i}')
+        with CaptureQueriesContext(connection) as many:
+            self.assertEqual(len(teacher_performance(Teacher.objects.all())), 8)
+        self.assertEqual(len(few), 1)
+        self.assertEqual(len(many), 1)
+
+    def test_dashboards_share_the_service(self):
+        director = self.call(DirectorDashboardViewSet, self.director)
+        self.assertEqual(director.status_code, 200)
+        self.assertEqual(director.data[0]['lessons'], 4)
+
+        manager = self.call(ManagerDashboardViewSet, self.manager, days=30)
+        self.assertEqual(manager.status_code, 200)
+        self.assertEqual(manager.data[0]['late_count'], 1)
+        self.assertEqual(manager.data[0]['total_lessons'], 3)
+
+    def test_late_teacher_on_sheet_raises_one_alert(self):
+        lesson = self.lessons[1]
+        sheet = {'lesson_id': lesson.id, 'teacher_status': 'late', 'students_attendance': []}
+        submit_sheets([sheet])
+        submit_sheets([sheet])
+        self.assertEqual(NotificationAlert.objects.filter(alert_type='teacher_late', related_lesson=lesson).count(), 1)
@@ -4,14 +4,23 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from django.db.models import Q, Count, Sum, Avg
 from datetime import datetime, timedelta
+from django.utils import timezone
 from core.models import Group, Teacher, Student, Lesson, Attendance, Branch
+from finance import summary
 from finance.models import FinanceReport
+from attendance.models import AttendanceRollup
 from .models import PerformanceMetrics, NotificationAlert
+from core.performance import teacher_performance
 from .serializers import (
     GroupTransferSerializer, TeacherReassignmentSerializer,
     PerformanceMetricsSerializer, NotificationAlertSerializer
 )
 from auth_system.permissions import IsManager
+from core.cache import versioned_response, branch_scope
+from core.aggregates import count_by
+from core.fetch import FetchPlan, FetchPlanMixin
+from director_dashboard import scoring
+from director_dashboard.models import StudentRiskScore
 
 
 class ManagerDashboardViewSet(viewsets.ViewSet):
@@ -35,6 +44,7 @@ class ManagerDashboardViewSet(viewsets.ViewSet):
         })
 
     @action(detail=False, methods=['get'])
+    @versioned_response(branch_scope)
     def overview(self, request):
         user = request.user
         branch = user.branch if user.branch else None
@@ -60,13 +70,20 @@ class ManagerDashboardViewSet(viewsets.ViewSet):
             start_time__date=today
         )
 
+        statuses = [choice for choice, _ in Attendance.STATUS_CHOICES]
+        counts = count_by(
+            lessons_today, 'attendances__status', statuses, total=None, count='attendances',
+            total_lessons=Count('id', distinct=True),
+            scheduled=Count('id', distinct=True, filter=Q(is_cancelled=False)),
+            cancelled=Count('id', distinct=True, filter=Q(is_cancelled=True)),
+        )
         attendance_stats = {
-            'total_lessons': lessons_today.count(),
-            'scheduled': lessons_today.filter(is_cancelled=False).count(),
-            'cancelled': lessons_today.filter(is_cancelled=True).count(),
-            'student_attendance': Attendance.objects.filter(
-                lesson__in=lessons_today
-            ).values('status').annotate(count=Count('id'))
+            'total_lessons': counts['total_lessons'],
+            'scheduled': counts['scheduled'],
+            'cancelled': counts['cancelled'],
+            'student_attendance': [
+                {'status': choice, 'count': counts[choice]} for choice in statuses if counts[choice]
+            ],
         }
 
         return Response(attendance_stats)
@@ -121,52 +138,34 @@ class ManagerDashboardViewSet(viewsets.ViewSet):
     def teacher_performance(self, request):
         branch = request.user.branch
         period_days = int(request.query_params.get('days', 30))
-        start_date = datetime.today().date() - timedelta(days=period_days)
-
-        teachers = Teacher.objects.filter(branch=branch)
-        performance = []
-
-        for teacher in teachers:
-            late_count = Lesson.objects.filter(
-                teacher=teacher,
-                start_time__date__gte=start_date
-            ).filter(
-                attendance__status='late'
-            ).count()
-
-            total_lessons = Lesson.objects.filter(
-                teacher=teacher,
-                start_time__date__gte=start_date
-            ).count()
-
-            performance.append({
-                'teacher_id': teacher.id,
-                'name': teacher.user.get_full_name(),
-                'late_count': late_count,
-                'total_lessons': total_lessons,
-                'punctuality_rate': ((total_lessons - late_count) / total_lessons * 100) if total_lessons > 0 else 100,
-                'rating': teacher.performance_rating,
-            })
+        start = timezone.now() - timedelta(days=period_days)
 
+        performance = teacher_performance(Teacher.objects.filter(branch=branch), start)
+        for row in performance:
+            # Keys of the original response, kept for existing clients
+            row['late_count'] = row['late_arrivals']
+            row['total_lessons'] = row['lessons']
         return Response(performance)
 
     @action(detail=False, methods=['get'])
     def student_progress(self, request):
         branch = request.user.branch
-        students = Student.objects.filter(branch=branch)
+        students = Student.objects.filter(branch=branch).select_related('user').prefetch_related('groups')
+        rollups = {
+            row['student']: row for row in AttendanceRollup.objects.filter(student__branch=branch).values('student').annotate(
+                present=Sum('present'), total=Sum('total')
+            ).order_by()
+        }
 
         progress = []
         for student in students:
-            total_attendance = Attendance.objects.filter(student=student).count()
-            present = Attendance.objects.filter(student=student, status='present').count()
-
-            groups = student.groups.all()
+            rollup = rollups.get(student.id, {'present': 0, 'total': 0})
 
             progress.append({
                 'student_id': student.id,
                 'name': student.user.get_full_name(),
-                'groups': [g.name for g in groups],
-                'attendance_rate': (present / total_attendance * 100) if total_attendance > 0 else 0,
+                'groups': [g.name for g in student.groups.all()],
+                'attendance_rate': (rollup['present'] / rollup['total'] * 100) if rollup['total'] > 0 else 0,
                 'total_debt': float(student.total_debt),
                 'status': student.status,
             })
@@ -177,18 +176,34 @@ class ManagerDashboardViewSet(viewsets.ViewSet):
     def financial_summary(self, request):
         branch = request.user.branch
         period_days = int(request.query_params.get('days', 30))
-        start_date = datetime.today().date() - timedelta(days=period_days)
+        today = timezone.localdate()
 
-        reports = FinanceReport.objects.filter(
-            branch=branch,
-            report_date__gte=start_date
-        ).aggregate(
-            total_income=Sum('total_student_payments'),
-            total_expenses=Sum('teacher_payments') + Sum('staff_payments'),
-            profit=Sum('profit')
-        )
+        totals = summary.summarize(FinanceReport.objects.filter(branch=branch), today - timedelta(days=period_days), today)
+        return Response({
+            'total_income': totals['income'],
+            'total_expenses': totals['teacher_payments'] + totals['staff_payments'],
+            'profit': totals['profit'],
+        })
 
-        return Response(reports)
+    @action(detail=False, methods=['get'])
+    def risk_scores(self, request):
+        branch = request.user.branch
+        if not branch:
+            return Response({'error': 'Branch not found'}, status=status.HTTP_400_BAD_REQUEST)
+
+        scores = StudentRiskScore.objects.filter(branch=branch)
+        risk_level = request.query_params.get('risk_level')
+        if risk_level:
+            scores = scores.filter(risk_level=risk_level)
+
+        try:
+            limit = int(request.query_params.get('limit', 20))
+            if limit < 1:
+                raise ValueError
+        except ValueError:
+            return Response({'error': 'limit must be a positive integer'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = min(limit, 200)
+        return Response(scoring.score_rows(scoring.top_scores(scores, limit)))
 
     @action(detail=False, methods=['get'])
     def alerts(self, request):
@@ -203,8 +218,10 @@ class ManagerDashboardViewSet(viewsets.ViewSet):
         return Response(serializer.data)
 
 
-class PerformanceMetricsViewSet(viewsets.ReadOnlyModelViewSet):
+class PerformanceMetricsViewSet(FetchPlanMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = PerformanceMetricsSerializer
+    fetch_plan = FetchPlan(select_related=['branch'])
+    field_plans = {'completion_rate': FetchPlan(only=['total_lessons', 'completed_lessons'])}
     # permission_classes = [IsManager]
     permission_classes = [AllowAny]
     filter_backends = [filters.OrderingFilter]
@@ -213,7 +230,7 @@ class PerformanceMetricsViewSet(viewsets.ReadOnlyModelViewSet):
     def get_queryset(self):
         user = self.request.user
         if user.role == 'superadmin':
-            return PerformanceMetrics.objects.all()
+            return self.fetch(PerformanceMetrics.objects.all())
         if user.branch:
-            return PerformanceMetrics.objects.filter(branch=user.branch)
+            return self.fetch(PerformanceMetrics.objects.filter(branch=user.branch))
         return PerformanceMetrics.objects.none()
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-18 02:46
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0002_emailtemplate_alter_notification_notification_type_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notificationlog',
+            index=models.Index(fields=['created_at', 'id'], name='notif_log_keyset_idx'),
+        ),
+    ]
@@ -25,6 +25,10 @@ class Notification(models.Model):
     class Meta:
         app_label = 'notifications'
         ordering = ['-created_at']
+        indexes = [
+            # Unread notifications of a user: the unread badge and unread lists
+            models.Index(fields=['user', '-created_at'], condition=models.Q(is_read=False), name='notif_unread_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.user.email}"
@@ -73,6 +77,12 @@ class NotificationLog(models.Model):
     class Meta:
         app_label = 'notifications'
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination of the log
+            models.Index(fields=['created_at', 'id'], name='notif_log_keyset_idx'),
+            # Failed (or pending) sends, newest first
+            models.Index(fields=['status', '-created_at'], name='notif_log_status_idx'),
+        ]
 
     def __str__(self):
         return f"{self.notification_type} to {self.recipient}"
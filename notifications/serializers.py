@@ -1,7 +1,8 @@
 from rest_framework import serializers
 from .models import Notification, NotificationTemplate, EmailTemplate, NotificationLog
+from core.serializers import SparseFieldsMixin
 
-class NotificationSerializer(serializers.ModelSerializer):
+class NotificationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Notification serializer for managing user notifications"""
     class Meta:
         model = Notification
@@ -10,14 +11,14 @@ class NotificationSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at', 'sent_at', 'status']
 
 
-class NotificationTemplateSerializer(serializers.ModelSerializer):
+class NotificationTemplateSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Template for notification messages"""
     class Meta:
         model = NotificationTemplate
         fields = ['id', 'name', 'subject', 'template_text', 'created_at']
 
 
-class EmailTemplateSerializer(serializers.ModelSerializer):
+class EmailTemplateSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Email template serializer with variables support"""
     class Meta:
         model = EmailTemplate
@@ -25,7 +26,7 @@ class EmailTemplateSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at', 'updated_at']
 
 
-class NotificationLogSerializer(serializers.ModelSerializer):
+class NotificationLogSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Notification log for tracking sent notifications"""
     class Meta:
         model = NotificationLog
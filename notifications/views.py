@@ -4,6 +4,8 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from core.permissions import IsAdmin
+from core.fetch import FetchPlanMixin
+from core.pagination import KeysetPagination
 from .models import Notification, NotificationTemplate, EmailTemplate, NotificationLog
 from .serializers import (
     NotificationSerializer, NotificationTemplateSerializer,
@@ -11,7 +13,7 @@ from .serializers import (
 )
 
 
-class NotificationViewSet(viewsets.ModelViewSet):
+class NotificationViewSet(FetchPlanMixin, viewsets.ModelViewSet):
     serializer_class = NotificationSerializer
     # permission_classes = [IsAuthenticated]
     permission_classes = [AllowAny]
@@ -20,7 +22,7 @@ class NotificationViewSet(viewsets.ModelViewSet):
         user = self.request.user
         if not user.is_authenticated:
             return Notification.objects.none()
-        return Notification.objects.filter(user=user)
+        return self.fetch(Notification.objects.filter(user=user))
 
     @action(detail=False, methods=['get'])
     def unread_count(self, request):
@@ -38,14 +40,14 @@ class NotificationViewSet(viewsets.ModelViewSet):
         return Response({'status': 'notification marked as read'})
 
 
-class NotificationTemplateViewSet(viewsets.ModelViewSet):
+class NotificationTemplateViewSet(FetchPlanMixin, viewsets.ModelViewSet):
     queryset = NotificationTemplate.objects.all()
     serializer_class = NotificationTemplateSerializer
     # permission_classes = [IsAuthenticated, IsAdmin]
     permission_classes = [AllowAny]
 
 
-class EmailTemplateViewSet(viewsets.ModelViewSet):
+class EmailTemplateViewSet(FetchPlanMixin, viewsets.ModelViewSet):
     queryset = EmailTemplate.objects.all()
     serializer_class = EmailTemplateSerializer
     # permission_classes = [IsAuthenticated, IsAdmin]
@@ -66,18 +68,20 @@ class EmailTemplateViewSet(viewsets.ModelViewSet):
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
-class NotificationLogViewSet(viewsets.ModelViewSet):
+class NotificationLogViewSet(FetchPlanMixin, viewsets.ModelViewSet):
     serializer_class = NotificationLogSerializer
     # permission_classes = [IsAuthenticated, IsAdmin]
     permission_classes = [AllowAny]
+    ordering = ['-created_at', '-id']
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         user = self.request.user
         if not user.is_authenticated:
             return NotificationLog.objects.none()
         if user.is_staff or getattr(user, 'role', None) in ['admin', 'superadmin']:
-            return NotificationLog.objects.all()
-        return NotificationLog.objects.filter(user=user)
+            return self.fetch(NotificationLog.objects.all())
+        return self.fetch(NotificationLog.objects.filter(user=user))
 
     @action(detail=False, methods=['get'])
     def recent_logs(self, request):
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 02:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_attendance_keyset_index'),
+        ('payments', '0002_paymentinitiation'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['student', 'created_at', 'id'], name='payments_txn_keyset_idx'),
+        ),
+    ]
@@ -40,6 +40,10 @@ class Transaction(models.Model):
     class Meta:
         app_label = 'payments'
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination of a student's transactions
+            models.Index(fields=['student', 'created_at', 'id'], name='payments_txn_keyset_idx'),
+        ]
 
     def __str__(self):
         return f"Transaction {self.reference_id} - {self.amount}"
@@ -1,13 +1,14 @@
 from rest_framework import serializers
 from .models import PaymentMethod, Transaction, PaymentInitiation
+from core.serializers import SparseFieldsMixin
 
-class PaymentMethodSerializer(serializers.ModelSerializer):
+class PaymentMethodSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = PaymentMethod
         fields = ['id', 'student', 'payment_type', 'is_primary', 'created_at']
 
 
-class TransactionSerializer(serializers.ModelSerializer):
+class TransactionSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Transaction
         fields = ['id', 'student', 'amount', 'status', 'payment_method', 
@@ -15,7 +16,7 @@ class TransactionSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at', 'completed_at']
 
 
-class PaymentInitiationSerializer(serializers.ModelSerializer):
+class PaymentInitiationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = PaymentInitiation
         fields = ['id', 'student', 'amount', 'description', 'payment_gateway', 
@@ -3,28 +3,31 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
+from core.fetch import FetchPlanMixin
+from core.pagination import KeysetPagination
 from datetime import datetime
 from .models import PaymentMethod, Transaction, PaymentInitiation
 from .serializers import PaymentMethodSerializer, TransactionSerializer, PaymentInitiationSerializer
 
 
-class PaymentMethodViewSet(viewsets.ModelViewSet):
+class PaymentMethodViewSet(FetchPlanMixin, viewsets.ModelViewSet):
     serializer_class = PaymentMethodSerializer
     # permission_classes = [IsAuthenticated]
     permission_classes = [AllowAny]
 
     def get_queryset(self):
-        return PaymentMethod.objects.filter(student__user=self.request.user)
+        return self.fetch(PaymentMethod.objects.filter(student__user=self.request.user))
 
 
-class TransactionViewSet(viewsets.ModelViewSet):
+class TransactionViewSet(FetchPlanMixin, viewsets.ModelViewSet):
     serializer_class = TransactionSerializer
     # permission_classes = [IsAuthenticated]
     permission_classes = [AllowAny]
-
+    ordering = ['-created_at', '-id']
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
-        return Transaction.objects.filter(student__user=self.request.user)
+        return self.fetch(Transaction.objects.filter(student__user=self.request.user))
 
     @action(detail=False, methods=['post'])
     def initiate_payment(self, request):
@@ -47,13 +50,13 @@ class TransactionViewSet(viewsets.ModelViewSet):
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
-class PaymentInitiateViewSet(viewsets.ModelViewSet):
+class PaymentInitiateViewSet(FetchPlanMixin, viewsets.ModelViewSet):
     serializer_class = PaymentInitiationSerializer
     # permission_classes = [IsAuthenticated]
     permission_classes = [AllowAny]
 
     def get_queryset(self):
-        return PaymentInitiation.objects.filter(student__user=self.request.user)
+        return self.fetch(PaymentInitiation.objects.filter(student__user=self.request.user))
 
     def perform_create(self, serializer):
         serializer.save()
@@ -0,0 +1,76 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core.models import Organization, Branch, CustomUser, Teacher, Student, Group, Lesson, Attendance
+
+
+class GroupStatisticsTestCase(TestCase):
+    """group_statistics must not issue per-group queries"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organization = Organization.objects.create(name='Org', address='-', phone='1', email='org@example.com')
+        cls.branch = Branch.objects.create(organization=cls.organization, name='Main', address='-', phone='1')
+        cls.director = CustomUser.objects.create_user(
+            username='director', password='x', role='director',
+            organization=cls.organization, branch=cls.branch,
+        )
+        teacher_user = CustomUser.objects.create_user(
+            username='teacher', password='x', role='teacher', first_name='Ali', last_name='Valiyev',
+            organization=cls.organization, branch=cls.branch,
+        )
+        cls.teacher = Teacher.objects.create(user=teacher_user, branch=cls.branch, hourly_rate=10, group_rate=100)
+        cls.students = [
+            Student.objects.create(
+                user=CustomUser.objects.create_user(username=f'student{i}', password='x', role='student'),
+                branch=cls.branch,
+            )
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.director)
+
+    def create_group(self, name):
+        group = Group.objects.create(branch=self.branch, name=name, teacher=self.teacher)
+        group.students.set(self.students)
+        lesson = Lesson.objects.create(
+            group=group, teacher=self.teacher, branch=self.branch,
+            start_time=timezone.now() - timedelta(days=1),
+        )
+        for student, status in zip(self.students, ['present', 'present', 'absent']):
+            Attendance.objects.create(lesson=lesson, student=student, status=status)
+        return group
+
+    def fetch(self):
+        response = self.client.get('/api/statistics/group_statistics/')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_group_statistics_values(self):
+        group = self.create_group('A1')
+        Group.objects.create(branch=self.branch, name='Empty')
+
+        stats = {row['group_id']: row for row in self.fetch()}
+
+        self.assertEqual(stats[group.id]['students'], 3)
+        self.assertEqual(stats[group.id]['attendance_total'], 3)
+        self.assertEqual(stats[group.id]['present'], 2)
+        self.assertEqual(stats[group.id]['attendance_rate'], 66.67)
+        self.assertEqual(stats[group.id]['teacher'], 'Ali Valiyev')
+        empty = next(row for row in stats.values() if row['name'] == 'Empty')
+        self.assertEqual((empty['students'], empty['attendance_total'], empty['attendance_rate']), (0, 0, 0))
+
+    def test_query_count_does_not_grow_with_groups(self):
+        self.create_group('A1')
+        with self.assertNumQueries(1):
+            self.assertEqual(len(self.fetch()), 1)
+
+        for i in range(5):
+            self.create_group(f'B{i}')
+        with self.assertNumQueries(1):
+            self.assertEqual(len(self.fetch()), 6)
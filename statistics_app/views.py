@@ -3,18 +3,25 @@ from rest_framework import viewsets, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from django.db.models import Count, Sum, Avg
+from django.db.models import Count, Sum, Avg, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from datetime import datetime, timedelta
+from django.utils import timezone
 from core.models import Student, Teacher, Group, Attendance
 from exams.models import ExamResult
+from finance import summary
 from finance.models import FinanceReport
+from attendance.models import AttendanceRollup
 from auth_system.permissions import IsDirector, IsManager
+from core.cache import versioned_response, organization_scope
+from core.aggregates import count_by
 
 class StatisticsViewSet(viewsets.ViewSet):
     # permission_classes = [IsAuthenticated]
     permission_classes = [AllowAny]
     
     @action(detail=False, methods=['get'])
+    @versioned_response(organization_scope)
     def student_statistics(self, request):
         user = request.user
         
@@ -25,14 +32,14 @@ class StatisticsViewSet(viewsets.ViewSet):
         else:
             students = Student.objects.filter(branch=user.branch) if user.branch else Student.objects.none()
         
-        stats = {
-            'total_students': students.count(),
-            'active': students.filter(status='active').count(),
-            'inactive': students.filter(status='inactive').count(),
-            'graduated': students.filter(status='graduated').count(),
-            'avg_payment_debt': students.aggregate(Avg('total_debt'))['total_debt__avg'] or 0,
-            'total_debt': students.aggregate(Sum('total_debt'))['total_debt__sum'] or 0,
-        }
+        stats = count_by(
+            students, 'status', ['active', 'inactive', 'graduated'],
+            total='total_students',
+            avg_payment_debt=Avg('total_debt'),
+            total_debt=Sum('total_debt'),
+        )
+        stats['avg_payment_debt'] = stats['avg_payment_debt'] or 0
+        stats['total_debt'] = stats['total_debt'] or 0
         
         return Response(stats)
     
@@ -66,19 +73,17 @@ class StatisticsViewSet(viewsets.ViewSet):
         period_days = int(request.query_params.get('days', 30))
         start_date = datetime.today().date() - timedelta(days=period_days)
         
-        attendance = Attendance.objects.filter(
-            lesson__branch=branch,
-            lesson__start_time__date__gte=start_date
+        stats = AttendanceRollup.objects.filter(
+            branch=branch,
+            day__gte=start_date
+        ).aggregate(
+            total_records=Coalesce(Sum('total'), 0),
+            present=Coalesce(Sum('present'), 0),
+            absent=Coalesce(Sum('absent'), 0),
+            late=Coalesce(Sum('late'), 0),
+            excused=Coalesce(Sum('excused'), 0),
         )
         
-        stats = {
-            'total_records': attendance.count(),
-            'present': attendance.filter(status='present').count(),
-            'absent': attendance.filter(status='absent').count(),
-            'late': attendance.filter(status='late').count(),
-            'excused': attendance.filter(status='excused').count(),
-        }
-        
         if stats['total_records'] > 0:
             stats['attendance_rate'] = round((stats['present'] / stats['total_records']) * 100, 2)
         
@@ -88,23 +93,19 @@ class StatisticsViewSet(viewsets.ViewSet):
     def financial_statistics(self, request):
         branch = request.user.branch
         period_days = int(request.query_params.get('days', 30))
-        start_date = datetime.today().date() - timedelta(days=period_days)
+        start_date = timezone.localdate() - timedelta(days=period_days)
         
         if not branch:
             return Response({'error': 'Branch not found'}, status=400)
         
-        reports = FinanceReport.objects.filter(
-            branch=branch,
-            report_date__gte=start_date
-        ).aggregate(
-            total_income=Sum('total_student_payments'),
-            total_teacher_expenses=Sum('teacher_payments'),
-            total_staff_expenses=Sum('staff_payments'),
-            total_other_expenses=Sum('other_expenses'),
-            total_profit=Sum('profit')
-        )
-        
-        return Response(reports)
+        totals = summary.summarize(FinanceReport.objects.filter(branch=branch), start_date, timezone.localdate())
+        return Response({
+            'total_income': totals['income'],
+            'total_teacher_expenses': totals['teacher_payments'],
+            'total_staff_expenses': totals['staff_payments'],
+            'total_other_expenses': totals['other_expenses'],
+            'total_profit': totals['profit'],
+        })
     
     @action(detail=False, methods=['get'])
     def exam_statistics(self, request):
@@ -138,21 +139,30 @@ class StatisticsViewSet(viewsets.ViewSet):
         else:
             groups = Group.objects.filter(branch=user.branch) if user.branch else Group.objects.none()
         
+        attendance = Attendance.objects.filter(lesson__group=OuterRef('pk')).values('lesson__group')
+        groups = groups.select_related('subject', 'teacher__user').annotate(
+            student_count=Count('students', distinct=True),
+            attendance_total=Coalesce(Subquery(attendance.annotate(c=Count('id')).values('c')), 0),
+            present_count=Coalesce(Subquery(
+                attendance.filter(status='present').annotate(c=Count('id')).values('c')
+            ), 0),
+        )
+        
         group_stats = []
         for group in groups:
-            student_count = group.students.count()
-            attendance_records = Attendance.objects.filter(lesson__group=group)
             present_rate = (
-                attendance_records.filter(status='present').count() / attendance_records.count() * 100
-                if attendance_records.count() > 0 else 0
+                group.present_count / group.attendance_total * 100
+                if group.attendance_total > 0 else 0
             )
             
             group_stats.append({
                 'group_id': group.id,
                 'name': group.name,
-                'subject': group.subject,
-                'students': student_count,
+                'subject': group.subject.name if group.subject else None,
+                'students': group.student_count,
                 'teacher': group.teacher.user.get_full_name() if group.teacher else None,
+                'attendance_total': group.attendance_total,
+                'present': group.present_count,
                 'attendance_rate': round(present_rate, 2),
             })
         
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-18 02:46
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('superadmin_dashboard', '0002_subscriptiontype'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='superadminauditlog',
+            index=models.Index(fields=['timestamp', 'id'], name='superadmin_audit_keyset_idx'),
+        ),
+    ]
@@ -10,6 +10,10 @@ class SuperadminAuditLog(models.Model):
     class Meta:
         app_label = 'superadmin_dashboard'
         ordering = ['-timestamp']
+        indexes = [
+            # Keyset pagination of the audit log
+            models.Index(fields=['timestamp', 'id'], name='superadmin_audit_keyset_idx'),
+        ]
 
     def __str__(self):
         return f"{self.superadmin} - {self.action}"
@@ -1,9 +1,10 @@
 from rest_framework import serializers
 from .models import SuperadminAuditLog, OrganizationSettings, SubscriptionType
 from core.models import User, Organization
+from core.serializers import SparseFieldsMixin
 
 
-class SuperadminAuditLogSerializer(serializers.ModelSerializer):
+class SuperadminAuditLogSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     superadmin_name = serializers.CharField(source='superadmin.full_name', read_only=True)
 
     class Meta:
@@ -12,7 +13,7 @@ class SuperadminAuditLogSerializer(serializers.ModelSerializer):
         read_only_fields = ['timestamp']
 
 
-class OrganizationSettingsSerializer(serializers.ModelSerializer):
+class OrganizationSettingsSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     organization_name = serializers.CharField(source='organization.name', read_only=True)
 
     class Meta:
@@ -24,7 +25,7 @@ class OrganizationSettingsSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at']
 
 
-class SubscriptionTypeSerializer(serializers.ModelSerializer):
+class SubscriptionTypeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = SubscriptionType
         fields = [
@@ -34,14 +35,14 @@ class SubscriptionTypeSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at']
 
 
-class SuperadminOrganizationSerializer(serializers.ModelSerializer):
+class SuperadminOrganizationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Organization
         fields = ['id', 'name', 'address', 'phone', 'email', 'created_at', 'is_active']
         read_only_fields = ['created_at']
 
 
-class SuperadminUserSerializer(serializers.ModelSerializer):
+class SuperadminUserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     full_name = serializers.CharField(read_only=True)
 
     class Meta:
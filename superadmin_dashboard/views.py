@@ -3,6 +3,8 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from core.permissions import IsSuperadmin
+from core.fetch import FetchPlan, FetchPlanMixin
+from core.pagination import KeysetPagination
 from core.models import User, Organization
 from .models import SuperadminAuditLog, OrganizationSettings, SubscriptionType
 from .serializers import (
@@ -12,10 +14,13 @@ from .serializers import (
 )
 
 
-class SuperadminAuditLogViewSet(viewsets.ModelViewSet):
+class SuperadminAuditLogViewSet(FetchPlanMixin, viewsets.ModelViewSet):
     queryset = SuperadminAuditLog.objects.all().order_by('-timestamp')
     serializer_class = SuperadminAuditLogSerializer
+    fetch_plan = FetchPlan(select_related=['superadmin'])
     permission_classes = [AllowAny]
+    ordering = ['-timestamp', '-id']
+    pagination_class = KeysetPagination
 
     @action(detail=False, methods=['get'])
     def recent_activities(self, request):
@@ -24,9 +29,10 @@ class SuperadminAuditLogViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class OrganizationSettingsViewSet(viewsets.ModelViewSet):
+class OrganizationSettingsViewSet(FetchPlanMixin, viewsets.ModelViewSet):
     queryset = OrganizationSettings.objects.all()
     serializer_class = OrganizationSettingsSerializer
+    fetch_plan = FetchPlan(select_related=['organization'])
     # permission_classes = [IsAuthenticated, IsSuperadmin]
     permission_classes = [AllowAny]
 
@@ -53,7 +59,7 @@ class OrganizationSettingsViewSet(viewsets.ModelViewSet):
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
-class SuperadminOrganizationViewSet(viewsets.ModelViewSet):
+class SuperadminOrganizationViewSet(FetchPlanMixin, viewsets.ModelViewSet):
     queryset = Organization.objects.all()
     serializer_class = SuperadminOrganizationSerializer
     # permission_classes = [IsAuthenticated, IsSuperadmin]
@@ -76,7 +82,7 @@ class SuperadminOrganizationViewSet(viewsets.ModelViewSet):
         instance.delete()
 
 
-class SuperadminUserViewSet(viewsets.ModelViewSet):
+class SuperadminUserViewSet(FetchPlanMixin, viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = SuperadminUserSerializer
     # permission_classes = [IsAuthenticated, IsSuperadmin]
@@ -107,7 +113,7 @@ class SuperadminUserViewSet(viewsets.ModelViewSet):
         return Response({'status': 'user deactivated'}, status=status.HTTP_200_OK)
 
 
-class SubscriptionTypeViewSet(viewsets.ModelViewSet):
+class SubscriptionTypeViewSet(FetchPlanMixin, viewsets.ModelViewSet):
     queryset = SubscriptionType.objects.all()
     serializer_class = SubscriptionTypeSerializer
     # permission_classes = [IsAuthenticated, IsSuperadmin]
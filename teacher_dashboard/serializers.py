@@ -1,8 +1,9 @@
 from rest_framework import serializers
 from .models import Homework, HomeworkSubmission, TeacherPortfolio
 from core.models import Group, Attendance, Lesson
+from core.serializers import SparseFieldsMixin
 
-class HomeworkSerializer(serializers.ModelSerializer):
+class HomeworkSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     group_name = serializers.CharField(source='group.name', read_only=True)
     submitted_count = serializers.SerializerMethodField()
     graded_count = serializers.SerializerMethodField()
@@ -13,12 +14,16 @@ class HomeworkSerializer(serializers.ModelSerializer):
                   'due_date', 'status', 'created_date', 'submitted_count', 'graded_count']
     
     def get_submitted_count(self, obj):
+        if hasattr(obj, 'submitted_count'):
+            return obj.submitted_count
         return obj.submissions.count()
     
     def get_graded_count(self, obj):
+        if hasattr(obj, 'graded_count'):
+            return obj.graded_count
         return obj.submissions.filter(grade__isnull=False).count()
 
-class HomeworkSubmissionSerializer(serializers.ModelSerializer):
+class HomeworkSubmissionSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     student_name = serializers.CharField(source='student.user.get_full_name', read_only=True)
     homework_title = serializers.CharField(source='homework.title', read_only=True)
     
@@ -27,7 +32,7 @@ class HomeworkSubmissionSerializer(serializers.ModelSerializer):
         fields = ['id', 'homework', 'homework_title', 'student', 'student_name',
                   'file', 'submitted_date', 'grade', 'feedback']
 
-class TeacherPortfolioSerializer(serializers.ModelSerializer):
+class TeacherPortfolioSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     teacher_name = serializers.CharField(source='teacher.user.get_full_name', read_only=True)
     
     class Meta:
@@ -1,15 +1,28 @@
 from rest_framework import viewsets, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.exceptions import PermissionDenied
 from rest_framework.permissions import AllowAny
-from django.db.models import Count, Avg, Q
+from django.db.models import Count, Avg, OuterRef, Q, Sum
 from datetime import datetime
+from core.aggregates import subquery_count
+from core.fetch import FetchPlan, FetchPlanMixin
 from core.models import Group, Attendance, Lesson, Student
 from .models import Homework, HomeworkSubmission, TeacherPortfolio
 from .serializers import (
     HomeworkSerializer, HomeworkSubmissionSerializer, TeacherPortfolioSerializer
 )
 from finance.models import Wallet
+from attendance.models import AttendanceRollup
+from core.cache import versioned_response, user_scope
+
+def teacher_profile(user):
+    """The Teacher row of ``user``, for writes; reads filter on ``teacher__user`` instead"""
+    teacher = getattr(user, 'teacher_profile', None) if user.is_authenticated else None
+    if teacher is None:
+        raise PermissionDenied('Teacher profile not found')
+    return teacher
+
 
 # -----------------------
 # Teacher Dashboard
@@ -22,13 +35,14 @@ class TeacherDashboardViewSet(viewsets.GenericViewSet):
         return Response({"detail": "Use specific actions like /overview or /my_groups"})
 
     @action(detail=False, methods=['get'])
+    @versioned_response(user_scope)
     def overview(self, request):
         user = request.user
         if not user.is_authenticated or getattr(user, 'role', None) != 'teacher':
             return Response({'error': 'Only teachers can access this'}, status=status.HTTP_403_FORBIDDEN)
 
         try:
-            teacher = user.teacher
+            teacher = user.teacher_profile
             groups = Group.objects.filter(teacher=teacher)
             total_students = sum([group.students.count() for group in groups])
 
@@ -56,8 +70,7 @@ class TeacherDashboardViewSet(viewsets.GenericViewSet):
         if not user.is_authenticated or getattr(user, 'role', None) != 'teacher':
             return Response({'error': 'Only teachers can access this'}, status=status.HTTP_403_FORBIDDEN)
 
-        teacher = user.teacher
-        groups = Group.objects.filter(teacher=teacher)
+        groups = Group.objects.filter(teacher__user=user)
 
         group_data = []
         for group in groups:
@@ -83,19 +96,18 @@ class TeacherDashboardViewSet(viewsets.GenericViewSet):
 
         try:
             group = Group.objects.get(id=group_id)
-            students = group.students.all()
+            students = group.students.select_related('user')
+            rollups = {
+                row['student']: row for row in AttendanceRollup.objects.filter(group=group).values('student').annotate(
+                    present=Sum('present'), total=Sum('total')
+                ).order_by()
+            }
 
             attendance_data = []
             for student in students:
-                attended = Attendance.objects.filter(
-                    student=student,
-                    lesson__group=group,
-                    status='present'
-                ).count()
-                total = Attendance.objects.filter(
-                    student=student,
-                    lesson__group=group
-                ).count()
+                rollup = rollups.get(student.id, {'present': 0, 'total': 0})
+                attended = rollup['present']
+                total = rollup['total']
 
                 attendance_data.append({
                     'student_id': student.id,
@@ -115,19 +127,12 @@ class TeacherDashboardViewSet(viewsets.GenericViewSet):
         if not user.is_authenticated or getattr(user, 'role', None) != 'teacher':
             return Response({'error': 'Only teachers can access this'}, status=status.HTTP_403_FORBIDDEN)
 
-        try:
-            teacher = user.teacher
-            wallet = teacher.wallet
-            wallet.update_balance()
-
-            return Response({
-                'balance': float(wallet.balance),
-                'total_earned': float(wallet.total_earned),
-                'total_paid': float(wallet.total_paid),
-                'total_pending': float(wallet.total_pending),
-            })
-        except Wallet.DoesNotExist:
+        wallet = Wallet.objects.filter(teacher__user=user).values(
+            'balance', 'total_earned', 'total_paid', 'total_pending',
+        ).first()
+        if wallet is None:
             return Response({'error': 'Wallet not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({name: float(value) for name, value in wallet.items()})
 
     @action(detail=False, methods=['get'])
     def upcoming_lessons(self, request):
@@ -135,10 +140,9 @@ class TeacherDashboardViewSet(viewsets.GenericViewSet):
         if not user.is_authenticated or getattr(user, 'role', None) != 'teacher':
             return Response({'error': 'Only teachers can access this'}, status=status.HTTP_403_FORBIDDEN)
 
-        teacher = user.teacher
         now = datetime.now()
         lessons = Lesson.objects.filter(
-            teacher=teacher,
+            teacher__user=user,
             start_time__gte=now,
             is_cancelled=False
         ).order_by('start_time')[:10]
@@ -160,8 +164,17 @@ class TeacherDashboardViewSet(viewsets.GenericViewSet):
 # -----------------------
 # Homework ViewSet
 # -----------------------
-class HomeworkViewSet(viewsets.ModelViewSet):
+class HomeworkViewSet(FetchPlanMixin, viewsets.ModelViewSet):
     serializer_class = HomeworkSerializer
+    field_plans = {
+        'submitted_count': FetchPlan(annotate={
+            'submitted_count': subquery_count(HomeworkSubmission.objects.filter(homework=OuterRef('pk'))),
+        }),
+        'graded_count': FetchPlan(annotate={
+            'graded_count': subquery_count(HomeworkSubmission.objects.filter(homework=OuterRef('pk'), grade__isnull=False)),
+        }),
+    }
+    fetch_plan = FetchPlan.combine([FetchPlan(select_related=['group']), *field_plans.values()])
     permission_classes = [AllowAny]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['title', 'group__name']
@@ -171,18 +184,17 @@ class HomeworkViewSet(viewsets.ModelViewSet):
         user = self.request.user
         if not user.is_authenticated or getattr(user, 'role', None) != 'teacher':
             return Homework.objects.none()
-        teacher = user.teacher
-        return Homework.objects.filter(teacher=teacher)
+        return self.fetch(Homework.objects.filter(teacher__user=user))
 
     def perform_create(self, serializer):
-        teacher = self.request.user.teacher
-        serializer.save(teacher=teacher)
+        serializer.save(teacher=teacher_profile(self.request.user))
 
 # -----------------------
 # Homework Submission
 # -----------------------
-class HomeworkSubmissionViewSet(viewsets.ModelViewSet):
+class HomeworkSubmissionViewSet(FetchPlanMixin, viewsets.ModelViewSet):
     serializer_class = HomeworkSubmissionSerializer
+    fetch_plan = FetchPlan(select_related=['student__user', 'homework'])
     permission_classes = [AllowAny]
     filter_backends = [filters.OrderingFilter]
     ordering_fields = ['submitted_date']
@@ -191,8 +203,7 @@ class HomeworkSubmissionViewSet(viewsets.ModelViewSet):
         user = self.request.user
         if not user.is_authenticated or getattr(user, 'role', None) != 'teacher':
             return HomeworkSubmission.objects.none()
-        teacher = user.teacher
-        return HomeworkSubmission.objects.filter(homework__teacher=teacher)
+        return self.fetch(HomeworkSubmission.objects.filter(homework__teacher__user=user))
 
     @action(detail=True, methods=['post'])
     def grade(self, request, pk=None):
@@ -209,17 +220,16 @@ class HomeworkSubmissionViewSet(viewsets.ModelViewSet):
 # -----------------------
 # Teacher Portfolio
 # -----------------------
-class TeacherPortfolioViewSet(viewsets.ModelViewSet):
+class TeacherPortfolioViewSet(FetchPlanMixin, viewsets.ModelViewSet):
     serializer_class = TeacherPortfolioSerializer
+    fetch_plan = FetchPlan(select_related=['teacher__user'])
     permission_classes = [AllowAny]
 
     def get_queryset(self):
         user = self.request.user
         if not user.is_authenticated or getattr(user, 'role', None) != 'teacher':
             return TeacherPortfolio.objects.none()
-        teacher = user.teacher
-        return TeacherPortfolio.objects.filter(teacher=teacher)
+        return self.fetch(TeacherPortfolio.objects.filter(teacher__user=user))
 
     def perform_create(self, serializer):
-        teacher = self.request.user.teacher
-        serializer.save(teacher=teacher)
+        serializer.save(teacher=teacher_profile(self.request.user))